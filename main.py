@@ -112,5 +112,13 @@ def main():
         input("Press Enter to exit...")
         sys.exit(1)
 
+def main_headless(argv):
+    """Entry point for running a scan without the GUI (--headless)."""
+    setup_paths()
+    from src.headless import main as run_headless
+    sys.exit(run_headless(argv))
+
 if __name__ == "__main__":
+    if "--headless" in sys.argv[1:]:
+        main_headless([arg for arg in sys.argv[1:] if arg != "--headless"])
     main()
@@ -0,0 +1,246 @@
+"""
+Compact storage for per-engine analysis results
+
+VirusTotal reports ~90 engines per IP and the same engine names and
+verdict strings repeat across every cached entry. Each string is stored
+once in a shared table; an entry keeps only pairs of small integer codes,
+tagged with the id of the table they refer to.
+"""
+import json
+import os
+import sys
+import threading
+import uuid
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .config import ANALYSIS_TABLES_FILE
+from .file_utils import atomic_write, file_lock
+from .freshness import EXPIRES_AT
+
+ANALYSIS_RESULTS_FIELD = "Analysis Results"
+
+# Largest code an array("H") holds
+_MAX_SHORT_CODE = 0xFFFF
+
+
+class StringTables:
+    """
+    Append-only tables of engine names and verdict strings, kept in a file
+
+    Codes never change once assigned. New strings are rare after the first
+    scans, so the file is written as soon as one is added. Adding one
+    re-reads the file, appends and saves under a lock shared with other
+    processes, e.g. the GUI and a headless monitor, so two processes never
+    give the same code to different strings.
+
+    The file carries a random id that stored codes are tagged with. Codes
+    whose table was lost or replaced, or that were assigned but never
+    saved, are detected by is_valid() instead of being decoded wrongly.
+    """
+
+    def __init__(self, tables_file: str = ANALYSIS_TABLES_FILE):
+        self.tables_file = tables_file
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._texts: Dict[str, List[str]] = {"engines": [], "verdicts": []}
+        self._codes: Dict[str, Dict[str, int]] = {"engines": {}, "verdicts": {}}
+        self.table_id: Optional[str] = None
+        with self._lock, file_lock(self.tables_file):
+            self._reload()
+            if self.table_id is None:
+                # New file, or one written before tables had ids
+                self.table_id = uuid.uuid4().hex[:12]
+                self._save()
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.tables_file)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _reload(self) -> None:
+        """Pick up strings added by another process (caller holds self._lock)"""
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return
+        try:
+            with open(self.tables_file, "r", encoding="utf-8") as f:
+                tables = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Failed to load analysis tables: {e}")
+            return
+
+        self._signature = signature
+        stored_id = tables.get("id")
+        if self.table_id is None:
+            self.table_id = stored_id
+        elif stored_id != self.table_id:
+            # Replaced under us: its codes mean something else, ours win at the next save
+            print("Warning: Analysis tables were replaced, cached results using them will be fetched again")
+            return
+
+        for kind, texts in self._texts.items():
+            stored = tables.get(kind, [])
+            # Only ever append: our own codes stay valid
+            for text in stored[len(texts):]:
+                self._codes[kind][text] = len(texts)
+                texts.append(sys.intern(text))
+
+    def _save(self) -> None:
+        """Write the tables atomically (caller holds self._lock and the file lock)"""
+        try:
+            atomic_write(self.tables_file, json.dumps({"id": self.table_id, **self._texts}, ensure_ascii=False))
+            self._signature = self._file_signature()
+        except OSError as e:
+            print(f"Warning: Failed to save analysis tables: {e}")
+
+    def code(self, kind: str, text: str) -> int:
+        """Get the code of a string, adding it to the table if it is new"""
+        code = self._codes[kind].get(text)
+        if code is not None:
+            return code
+
+        with self._lock, file_lock(self.tables_file):
+            # Another process may have taken the next codes since the last read
+            self._reload()
+            code = self._codes[kind].get(text)
+            if code is None:
+                code = len(self._texts[kind])
+                self._texts[kind].append(sys.intern(text))
+                self._codes[kind][text] = code
+                self._save()
+            return code
+
+    def is_valid(self, table_id: Optional[str], codes: List[int]) -> bool:
+        """
+        Check that stored codes refer to these tables and to strings they hold
+
+        Args:
+            table_id: Id the codes were tagged with when stored
+            codes: Alternating engine and verdict codes
+        """
+        if table_id != self.table_id:
+            return False
+        needed = {"engines": max(codes[0::2], default=-1), "verdicts": max(codes[1::2], default=-1)}
+        if all(code < len(self._texts[kind]) for kind, code in needed.items()):
+            return True
+        with self._lock:
+            self._reload()
+        return all(code < len(self._texts[kind]) for kind, code in needed.items())
+
+    def text(self, kind: str, code: int) -> str:
+        """Get the string for a code"""
+        texts = self._texts[kind]
+        if code >= len(texts):
+            with self._lock:
+                self._reload()
+        return texts[code]
+
+
+_tables: Optional[StringTables] = None
+_tables_lock = threading.Lock()
+
+
+def get_tables() -> StringTables:
+    """The process-wide string tables, loaded (or created) on first use"""
+    global _tables
+    if _tables is None:
+        with _tables_lock:
+            if _tables is None:
+                _tables = StringTables()
+    return _tables
+
+
+class AnalysisResults(Mapping):
+    """
+    Read-only engine → verdict mapping backed by an array of codes
+
+    Behaves like the dictionary it replaces; strings are only looked up when
+    an engine's verdict is actually read, e.g. in the details view.
+    """
+
+    __slots__ = ("_codes",)
+
+    def __init__(self, codes: Iterable[int] = ()):
+        # Alternating engine and verdict codes, two bytes each unless a table outgrows that
+        codes = list(codes)
+        self._codes = array("H" if max(codes, default=0) <= _MAX_SHORT_CODE else "I", codes)
+
+    @classmethod
+    def encode(cls, results: Iterable[Tuple[str, str]]) -> "AnalysisResults":
+        """Build from (engine, verdict) pairs"""
+        tables = get_tables()
+        codes = []
+        for engine, verdict in results:
+            codes.append(tables.code("engines", engine))
+            codes.append(tables.code("verdicts", verdict))
+        return cls(codes)
+
+    def to_codes(self) -> List[int]:
+        """Codes in their JSON-serializable form"""
+        return self._codes.tolist()
+
+    def __getitem__(self, engine: str) -> str:
+        codes = self._codes
+        tables = get_tables()
+        for i in range(0, len(codes), 2):
+            if tables.text("engines", codes[i]) == engine:
+                return tables.text("verdicts", codes[i + 1])
+        raise KeyError(engine)
+
+    def __iter__(self) -> Iterator[str]:
+        codes = self._codes
+        tables = get_tables()
+        for i in range(0, len(codes), 2):
+            yield tables.text("engines", codes[i])
+
+    def __len__(self) -> int:
+        return len(self._codes) // 2
+
+    def items(self):
+        codes = self._codes
+        tables = get_tables()
+        return [
+            (tables.text("engines", codes[i]), tables.text("verdicts", codes[i + 1]))
+            for i in range(0, len(codes), 2)
+        ]
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+def json_default(value):
+    """json.dump hook that writes AnalysisResults as their table id followed by their codes"""
+    if isinstance(value, AnalysisResults):
+        return [get_tables().table_id] + value.to_codes()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def compact_entry(entry: Dict) -> Dict:
+    """
+    Convert the analysis results of a loaded entry to AnalysisResults
+
+    Accepts the stored code list as well as the plain dictionary of entries
+    cached before results were compacted. Codes that do not match the
+    current tables are dropped and the entry is marked expired, so the
+    next scan fetches it again.
+
+    Returns:
+        The same entry, updated in place
+    """
+    results = entry.get(ANALYSIS_RESULTS_FIELD)
+    if isinstance(results, list):
+        tables = get_tables()
+        # Code lists stored before tables had ids have no id in front
+        table_id = results[0] if results and isinstance(results[0], str) else tables.table_id
+        codes = results[1:] if results and isinstance(results[0], str) else results
+        if tables.is_valid(table_id, codes):
+            entry[ANALYSIS_RESULTS_FIELD] = AnalysisResults(codes)
+        else:
+            del entry[ANALYSIS_RESULTS_FIELD]
+            entry[EXPIRES_AT] = 0
+    elif isinstance(results, dict):
+        entry[ANALYSIS_RESULTS_FIELD] = AnalysisResults.encode(results.items())
+    return entry
@@ -1,108 +1,290 @@
 """
 VirusTotal API client for IP address analysis
 """
+import json
 import requests
-import time
 from datetime import datetime
-from typing import Dict, Tuple, Optional, Callable
-from .config import VIRUSTOTAL_BASE_URL, MAX_RETRIES, RETRY_DELAY
+from typing import Dict, FrozenSet, Iterable, Tuple, Optional, Callable
+from requests.adapters import HTTPAdapter
+from .config import (
+    VIRUSTOTAL_BASE_URL, MAX_RETRIES, MAX_THROTTLE_RETRIES, RETRY_DELAY, REQUEST_TIMEOUT,
+    DEFAULT_POOL_SIZE
+)
+from .analysis_results import AnalysisResults
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON decoding
+    orjson = None
+from .backoff import BackoffController
+from .cancellation import CancelToken
+from .rate_limiter import RateLimiter
 
 
 class VirusTotalClient:
     """Client for interacting with VirusTotal API"""
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        base_url: str = VIRUSTOTAL_BASE_URL,
+        rate_limiter: Optional[RateLimiter] = None,
+        backoff: Optional[BackoffController] = None,
+        on_request: Optional[Callable[[str], None]] = None,
+        cancel_token: Optional[CancelToken] = None
+    ):
         self.api_key = api_key
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.backoff = backoff or BackoffController()
+        self.on_request = on_request
+        # Cuts quota waits and retry delays short when the scan is cancelled
+        self.cancel_token = cancel_token or CancelToken()
         self.headers = {"x-apikey": api_key}
+        self.session = self._create_session(pool_size)
+        
+        # Set when VirusTotal rejects the key or reports its quota as used up
+        self.auth_failed = False
+        self.quota_exceeded = False
+    
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """Create a keep-alive session whose connection pool fits the scan concurrency"""
+        session = requests.Session()
+        session.headers.update(self.headers)
+        # Every lookup goes to the same host, so one pool sized to the number
+        # of concurrent workers lets each worker reuse its own TLS connection
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
     
-    def query_ip(self, ip: str, log_callback: Callable[[str], None]) -> Tuple[Optional[Dict], bool]:
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def query_ip(
+        self,
+        ip: str,
+        log_callback: Callable[[str], None],
+        reserved_wait: Optional[float] = None,
+        projection: Optional[FrozenSet[str]] = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> Tuple[Optional[Dict], bool]:
         """
         Query VirusTotal for IP information
         
         Args:
             ip: IP address to query
             log_callback: Function to call for logging messages
+            reserved_wait: Wait for a rate-limiter token the caller already
+                reserved for the first attempt
+            projection: Result fields to parse (see get_projection), None for all
+            cancel_token: Token of the scan the lookup belongs to (default: self.cancel_token)
             
         Returns:
-            Tuple of (data_dict, is_cached) where is_cached is always False for API calls
+            Tuple of (data_dict, is_cached) where is_cached is always False for
+            API calls; data_dict is None if the lookup failed or was cancelled
         """
         log_callback(f"🌐 Checking VirusTotal for: {ip}")
-        url = f"{VIRUSTOTAL_BASE_URL}/{ip}"
+        url = f"{self.base_url}/{ip}"
+        cancel_token = cancel_token or self.cancel_token
         
-        for attempt in range(MAX_RETRIES):
+        attempt = 0
+        throttles = 0
+        while attempt < MAX_RETRIES:
+            self._wait_for_quota(log_callback, reserved_wait, cancel_token)
+            reserved_wait = None
+            if cancel_token.cancelled:
+                return None, False
             try:
-                response = requests.get(url, headers=self.headers, timeout=30)
+                if self.on_request:
+                    self.on_request(self.api_key)
+                response = self.session.get(url, timeout=REQUEST_TIMEOUT)
                 
-                if response.status_code == 429:
-                    log_callback("⏳ Rate limit hit! Waiting before retry...")
-                    time.sleep(RETRY_DELAY)
+                if response.status_code in (401, 403):
+                    log_callback(f"🔒 API key ...{self.api_key[-4:]} rejected: HTTP {response.status_code}")
+                    self.auth_failed = True
+                    return None, False
+                elif response.status_code == 429 and _is_quota_exceeded(response.content):
+                    log_callback(f"📉 API key ...{self.api_key[-4:]} has used up its quota")
+                    self.quota_exceeded = True
+                    return None, False
+                elif response.status_code == 429:
+                    # Throttling is not a failed attempt; the shared controller
+                    # pauses every worker until the quota has recovered
+                    throttles += 1
+                    delay = self.backoff.on_throttled(response.headers)
+                    if throttles >= MAX_THROTTLE_RETRIES:
+                        log_callback(f"❌ Still rate limited for {ip} after {throttles} retries")
+                        return None, False
+                    log_callback(f"⏳ Rate limit hit! Pausing all requests for {delay:.0f}s...")
                     continue
-                elif response.status_code == 404:
+                
+                self.backoff.observe(response.headers)
+                if response.status_code == 404:
                     log_callback(f"⚠️ IP {ip} not found in VirusTotal database")
                     return self._create_empty_result(), False
                 elif response.status_code != 200:
                     log_callback(f"❌ Error with {ip}: HTTP {response.status_code}")
-                    if attempt == MAX_RETRIES - 1:
-                        return None, False
+                    attempt += 1
                     continue
                 
                 # Success - parse the response
-                data = response.json()["data"]
-                return self._parse_vt_response(data), False
+                data = loads(response.content)["data"]
+                return self._parse_vt_response(data, projection), False
                 
+            except (ValueError, KeyError) as e:
+                log_callback(f"❌ Invalid response for {ip}: {str(e)}")
+                attempt += 1
             except requests.exceptions.RequestException as e:
                 log_callback(f"❌ Network error for {ip}: {str(e)}")
-                if attempt == MAX_RETRIES - 1:
+                attempt += 1
+                if attempt < MAX_RETRIES and cancel_token.sleep(RETRY_DELAY):
                     return None, False
-                time.sleep(RETRY_DELAY)
         
         log_callback(f"❌ Failed to query VirusTotal for {ip} after {MAX_RETRIES} attempts")
         return None, False
     
-    def _parse_vt_response(self, data: Dict) -> Dict:
+    def _wait_for_quota(
+        self,
+        log_callback: Callable[[str], None],
+        reserved_wait: Optional[float] = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> None:
+        """Block until the backoff controller and the rate limiter allow another request, or the scan is cancelled"""
+        cancel_token = cancel_token or self.cancel_token
+        paused = self.backoff.wait(cancel_token)
+        if reserved_wait is not None:
+            # The token was reserved before the pause, whose time counts towards its wait
+            wait = reserved_wait - paused
+        elif self.rate_limiter is None:
+            return
+        else:
+            wait = self.rate_limiter.reserve()
+        if wait > 0:
+            if wait >= 1:
+                log_callback(f"⏳ Quota reached, waiting {wait:.0f}s...")
+            cancel_token.sleep(wait)
+    
+    def _parse_vt_response(self, data: Dict, projection: Optional[FrozenSet[str]] = None) -> Dict:
         """Parse VirusTotal API response into standardized format"""
-        attr = data["attributes"]
-        
-        # Parse last analysis date
-        last_analysis_ts = attr.get("last_analysis_date")
-        last_analysis_date = (
-            datetime.utcfromtimestamp(last_analysis_ts).strftime("%d/%m/%Y") 
-            if last_analysis_ts else "N/A"
-        )
-        
-        # Parse analysis results
-        analysis_results = {}
-        for engine, result in attr.get("last_analysis_results", {}).items():
-            category = result.get('category', 'N/A')
-            result_text = result.get('result', 'Clean')
-            analysis_results[engine] = f"{category} ({result_text})"
-        
-        return {
-            "Reputation Score": attr.get("reputation", "N/A"),
-            "Country": attr.get("country", "N/A"),
-            "ASN": attr.get("asn", "N/A"),
-            "ASN Owner": attr.get("as_owner", "N/A"),
-            "Last Analysis Date": last_analysis_date,
-            "Engines Malicious": attr.get("last_analysis_stats", {}).get("malicious", 0),
-            "Engines Suspicious": attr.get("last_analysis_stats", {}).get("suspicious", 0),
-            "Engines Harmless": attr.get("last_analysis_stats", {}).get("harmless", 0),
-            "Community Malicious Votes": attr.get("total_votes", {}).get("malicious", 0),
-            "Community Harmless Votes": attr.get("total_votes", {}).get("harmless", 0),
-            "Analysis Results": analysis_results
-        }
+        return parse_vt_response(data, projection)
     
     def _create_empty_result(self) -> Dict:
         """Create empty result structure for IPs not found in VirusTotal"""
-        return {
-            "Reputation Score": "N/A",
-            "Country": "N/A",
-            "ASN": "N/A",
-            "ASN Owner": "N/A",
-            "Last Analysis Date": "N/A",
-            "Engines Malicious": 0,
-            "Engines Suspicious": 0,
-            "Engines Harmless": 0,
-            "Community Malicious Votes": 0,
-            "Community Harmless Votes": 0,
-            "Analysis Results": {}
-        }
+        return create_empty_result()
+
+
+def _is_quota_exceeded(body: bytes) -> bool:
+    """Check whether a 429 body is VirusTotal's QuotaExceededError rather than plain throttling"""
+    try:
+        return json.loads(body).get("error", {}).get("code") == "QuotaExceededError"
+    except (ValueError, AttributeError):
+        return False
+
+
+def _parse_last_analysis_date(attr: Dict) -> str:
+    last_analysis_ts = attr.get("last_analysis_date")
+    return (
+        datetime.utcfromtimestamp(last_analysis_ts).strftime("%d/%m/%Y") 
+        if last_analysis_ts else "N/A"
+    )
+
+
+def _parse_analysis_results(attr: Dict) -> AnalysisResults:
+    # Shared engine and verdict codes, see analysis_results.py
+    return AnalysisResults.encode(
+        (engine, f"{result.get('category', 'N/A')} ({result.get('result', 'Clean')})")
+        for engine, result in attr.get("last_analysis_results", {}).items()
+    )
+
+
+# How each result field is read from the report attributes, in output order
+_FIELD_PARSERS: Dict[str, Callable[[Dict], object]] = {
+    "Reputation Score": lambda attr: attr.get("reputation", "N/A"),
+    "Country": lambda attr: attr.get("country", "N/A"),
+    "ASN": lambda attr: attr.get("asn", "N/A"),
+    "ASN Owner": lambda attr: attr.get("as_owner", "N/A"),
+    "Last Analysis Date": _parse_last_analysis_date,
+    "Engines Malicious": lambda attr: attr.get("last_analysis_stats", {}).get("malicious", 0),
+    "Engines Suspicious": lambda attr: attr.get("last_analysis_stats", {}).get("suspicious", 0),
+    "Engines Harmless": lambda attr: attr.get("last_analysis_stats", {}).get("harmless", 0),
+    "Community Malicious Votes": lambda attr: attr.get("total_votes", {}).get("malicious", 0),
+    "Community Harmless Votes": lambda attr: attr.get("total_votes", {}).get("harmless", 0),
+    "Analysis Results": _parse_analysis_results,
+}
+RESULT_FIELDS = tuple(_FIELD_PARSERS)
+
+# Always parsed, cache expiry and scan summaries depend on them
+VERDICT_FIELDS = frozenset({"Last Analysis Date", "Engines Malicious", "Engines Suspicious", "Engines Harmless"})
+
+
+def get_projection(fields: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """
+    Result fields to parse for a set of wanted (e.g. export) fields
+
+    Args:
+        fields: Wanted fields, None for all
+
+    Returns:
+        Fields to parse, or None when every field is needed
+    """
+    if fields is None:
+        return None
+    projection = frozenset(field for field in fields if field in _FIELD_PARSERS) | VERDICT_FIELDS
+    return None if projection.issuperset(RESULT_FIELDS) else projection
+
+
+def has_fields(entry: Dict, projection: Optional[FrozenSet[str]]) -> bool:
+    """Check whether an entry holds every field of a projection (all fields if None)"""
+    return all(field in entry for field in (projection or RESULT_FIELDS))
+
+
+def loads(body: bytes):
+    """Decode a JSON response body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def parse_vt_response(data: Dict, projection: Optional[FrozenSet[str]] = None) -> Dict:
+    """
+    Parse VirusTotal API response into standardized format
+
+    Args:
+        data: The "data" object of the IP report
+        projection: Fields to parse (see get_projection), None for all
+
+    Returns:
+        Dictionary of result fields
+    """
+    attr = data["attributes"]
+    return {
+        field: parse(attr)
+        for field, parse in _FIELD_PARSERS.items()
+        if projection is None or field in projection
+    }
+
+
+def create_empty_result() -> Dict:
+    """Create empty result structure for IPs not found in VirusTotal"""
+    return {
+        "Reputation Score": "N/A",
+        "Country": "N/A",
+        "ASN": "N/A",
+        "ASN Owner": "N/A",
+        "Last Analysis Date": "N/A",
+        "Engines Malicious": 0,
+        "Engines Suspicious": 0,
+        "Engines Harmless": 0,
+        "Community Malicious Votes": 0,
+        "Community Harmless Votes": 0,
+        "Analysis Results": AnalysisResults()
+    }
@@ -0,0 +1,333 @@
+"""
+Asyncio scanning engine using an async HTTP client
+
+Mirrors the threaded engine in scanner.py but keeps every lookup on one event
+loop, so hundreds of concurrent lookups cost one thread instead of hundreds.
+Requires the optional aiohttp package.
+"""
+import asyncio
+from typing import Dict, FrozenSet, List, Tuple, Optional, Callable
+from .api_client import parse_vt_response, create_empty_result, has_fields, loads, _is_quota_exceeded
+from .backoff import BackoffController
+from .cancellation import CancelToken
+from .freshness import is_fresh, stamp_entry
+from .key_pool import ClientPool
+from .config import VIRUSTOTAL_BASE_URL, MAX_RETRIES, MAX_THROTTLE_RETRIES, RETRY_DELAY, REQUEST_TIMEOUT
+from .rate_limiter import RateLimiter
+from .single_flight import lookup_flight
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - depends on the environment
+    aiohttp = None
+
+
+def is_async_engine_available() -> bool:
+    """Check whether the async HTTP client is installed"""
+    return aiohttp is not None
+
+
+class AsyncVirusTotalClient:
+    """Async counterpart of VirusTotalClient, used as an async context manager"""
+
+    def __init__(
+        self,
+        api_key: str,
+        max_in_flight: int,
+        base_url: str = VIRUSTOTAL_BASE_URL,
+        rate_limiter: Optional[RateLimiter] = None,
+        backoff: Optional[BackoffController] = None,
+        on_request: Optional[Callable[[str], None]] = None
+    ):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for the asyncio scanning engine")
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate_limiter = rate_limiter
+        self.backoff = backoff or BackoffController()
+        self.on_request = on_request
+        self.session = None
+
+        # Set when VirusTotal rejects the key or reports its quota as used up
+        self.auth_failed = False
+        self.quota_exceeded = False
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.max_in_flight)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"x-apikey": self.api_key},
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.session.close()
+
+    async def query_ip(
+        self,
+        ip: str,
+        log_callback: Callable[[str], None],
+        reserved_wait: Optional[float] = None,
+        projection: Optional[FrozenSet[str]] = None
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        Query VirusTotal for IP information
+
+        Args:
+            ip: IP address to query
+            log_callback: Function to call for logging messages
+            reserved_wait: Wait for a rate-limiter token the caller already
+                reserved for the first attempt
+            projection: Result fields to parse (see get_projection), None for all
+
+        Returns:
+            Tuple of (data_dict, is_cached) where is_cached is always False for API calls
+        """
+        log_callback(f"🌐 Checking VirusTotal for: {ip}")
+        url = f"{self.base_url}/{ip}"
+
+        attempt = 0
+        throttles = 0
+        while attempt < MAX_RETRIES:
+            await self._wait_for_quota(log_callback, reserved_wait)
+            reserved_wait = None
+            try:
+                if self.on_request:
+                    self.on_request(self.api_key)
+                async with self.session.get(url) as response:
+                    if response.status in (401, 403):
+                        log_callback(f"🔒 API key ...{self.api_key[-4:]} rejected: HTTP {response.status}")
+                        self.auth_failed = True
+                        return None, False
+                    elif response.status == 429 and _is_quota_exceeded(await response.read()):
+                        log_callback(f"📉 API key ...{self.api_key[-4:]} has used up its quota")
+                        self.quota_exceeded = True
+                        return None, False
+                    elif response.status == 429:
+                        # Throttling is not a failed attempt; the shared controller
+                        # pauses every lookup until the quota has recovered
+                        throttles += 1
+                        delay = self.backoff.on_throttled(response.headers)
+                        if throttles >= MAX_THROTTLE_RETRIES:
+                            log_callback(f"❌ Still rate limited for {ip} after {throttles} retries")
+                            return None, False
+                        log_callback(f"⏳ Rate limit hit! Pausing all requests for {delay:.0f}s...")
+                        continue
+
+                    self.backoff.observe(response.headers)
+                    if response.status == 404:
+                        log_callback(f"⚠️ IP {ip} not found in VirusTotal database")
+                        return create_empty_result(), False
+                    elif response.status != 200:
+                        log_callback(f"❌ Error with {ip}: HTTP {response.status}")
+                        attempt += 1
+                        continue
+
+                    # Success - parse the response
+                    data = loads(await response.read())["data"]
+                    return parse_vt_response(data, projection), False
+
+            except (ValueError, KeyError) as e:
+                log_callback(f"❌ Invalid response for {ip}: {str(e)}")
+                attempt += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log_callback(f"❌ Network error for {ip}: {str(e) or type(e).__name__}")
+                attempt += 1
+                if attempt < MAX_RETRIES:
+                    await asyncio.sleep(RETRY_DELAY)
+
+        log_callback(f"❌ Failed to query VirusTotal for {ip} after {MAX_RETRIES} attempts")
+        return None, False
+
+    async def _wait_for_quota(self, log_callback: Callable[[str], None], reserved_wait: Optional[float] = None) -> None:
+        """Suspend until the backoff controller and the rate limiter allow another request"""
+        # Loop because another lookup may extend the pause while we sleep
+        paused = 0.0
+        delay = self.backoff.time_until_resume()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            paused += delay
+            delay = self.backoff.time_until_resume()
+        if reserved_wait is not None:
+            # The token was reserved before the pause, whose time counts towards its wait
+            wait = reserved_wait - paused
+        elif self.rate_limiter is None:
+            return
+        else:
+            wait = self.rate_limiter.reserve()
+        if wait > 0:
+            if wait >= 1:
+                log_callback(f"⏳ Quota reached, waiting {wait:.0f}s...")
+            await asyncio.sleep(wait)
+
+
+class AsyncClientPool:
+    """Async counterpart of ClientPool sharing its keys, limiters and parking state"""
+
+    def __init__(self, pool: ClientPool, max_in_flight: int):
+        self.pool = pool
+        self.clients = [
+            AsyncVirusTotalClient(
+                client.api_key, max_in_flight, pool.base_url,
+                client.rate_limiter, client.backoff, pool.usage.record
+            )
+            for client in pool.clients
+        ]
+
+    async def __aenter__(self):
+        opened = []
+        try:
+            for client in self.clients:
+                await client.__aenter__()
+                opened.append(client)
+        except BaseException:
+            # Close the sessions opened before the failure, nothing else will
+            for client in opened:
+                await client.__aexit__(None, None, None)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        for client in self.clients:
+            await client.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def query_ip(
+        self,
+        ip: str,
+        log_callback: Callable[[str], None],
+        projection: Optional[FrozenSet[str]] = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        Query VirusTotal for IP information, sharing the call with concurrent lookups of the same IP
+
+        cancel_token is the token of the scan the lookup belongs to (default: the pool's)
+        """
+        cancel_token = cancel_token or self.pool.cancel_token
+        return await lookup_flight.do_async(
+            (ip, projection), lambda: self._query_ip(ip, log_callback, projection),
+            lambda: cancel_token.cancelled
+        )
+
+    async def _query_ip(
+        self,
+        ip: str,
+        log_callback: Callable[[str], None],
+        projection: Optional[FrozenSet[str]] = None
+    ) -> Tuple[Optional[Dict], bool]:
+        """Query VirusTotal, moving on to the next key when one gets parked"""
+        for _ in range(len(self.clients)):
+            client, wait = self.pool.acquire(self.clients)
+            if client is None:
+                break
+            result = await client.query_ip(ip, log_callback, reserved_wait=wait, projection=projection)
+            if not self.pool.settle(client, log_callback):
+                return result
+
+        log_callback(f"❌ No usable API key left to query {ip}")
+        return None, False
+
+
+async def scan_ips_async(
+    client: AsyncClientPool,
+    ip_process_map: Dict[str, str],
+    cache: Dict[str, Dict],
+    max_in_flight: int,
+    log_callback: Callable[[str], None],
+    cancel_token: CancelToken,
+    projection: Optional[FrozenSet[str]] = None,
+    on_result: Optional[Callable[[Dict, bool], None]] = None
+) -> List[Dict]:
+    """
+    Scan IPs on the event loop with at most max_in_flight lookups at once
+
+    That many workers take the IPs from a bounded queue, so the tasks and
+    pending IPs held at any time do not grow with the size of the scan.
+
+    Args:
+        client: Open async client pool
+        ip_process_map: Dictionary mapping IP addresses to process names
+        cache: Cache dictionary, updated in place with new results
+        max_in_flight: Maximum number of concurrent lookups
+        log_callback: Function to call for logging
+        cancel_token: Cancelling it stops the scan at once; lookups in
+            flight are cancelled, including their HTTP requests
+        projection: Result fields to fetch (see get_projection), None for all
+        on_result: Called with each result and whether it came from VirusTotal,
+            on a thread of the loop's default executor; results are then not collected
+
+    Returns:
+        List of scan results in the same format as the threaded engine, empty
+        with on_result
+    """
+    results = []
+    loop = asyncio.get_running_loop()
+    worker_count = max(1, min(max_in_flight, len(ip_process_map)))
+    # Bounded, so a scan of any size only holds a few IPs beyond those in flight
+    queue: asyncio.Queue = asyncio.Queue(maxsize=worker_count)
+
+    async def lookup(ip: str, process_name: str):
+        # Check cache first; expired entries are queried again
+        is_new = False
+        cached = cache.get(ip)
+        if is_fresh(cached) and has_fields(cached, projection):
+            entry = cached
+            log_callback(f"✅ Using cached data for {ip}")
+        else:
+            # Query VirusTotal; the client's rate limiter paces the requests
+            vt_data, _ = await client.query_ip(ip, log_callback, projection, cancel_token)
+            if not vt_data and cancel_token.cancelled:
+                # Not a failure: the IP stays in the scan manifest for a resume
+                return
+            if vt_data:
+                entry = stamp_entry({"IP": ip, "Process Name": process_name, **vt_data}, cached)
+                cache[ip] = entry
+                is_new = True
+                log_callback(f"🆕 Successfully scanned: {ip}")
+            else:
+                entry = {"IP": ip, "Process Name": process_name}
+                log_callback(f"⚠️ Failed to scan: {ip}")
+
+        if on_result:
+            # Off the event loop: on_result may block, e.g. on a full stream buffer,
+            # which would otherwise stall every lookup in flight
+            await loop.run_in_executor(None, on_result, entry, is_new)
+        else:
+            results.append(entry)
+
+    async def produce():
+        for item in ip_process_map.items():
+            await queue.put(item)
+        for _ in range(worker_count):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if not cancel_token.cancelled:
+                await lookup(*item)
+
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(worker()) for _ in range(worker_count)]
+
+    def cancel_tasks():
+        for task in tasks:
+            task.cancel()
+
+    # Called from whichever thread cancels the scan
+    unregister = cancel_token.on_cancel(lambda: loop.call_soon_threadsafe(cancel_tasks))
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        if not cancel_token.cancelled:
+            raise
+    finally:
+        unregister()
+        # Let the cancelled lookups, or those left by a failed one, unwind before the session is closed
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return results
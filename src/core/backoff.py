@@ -0,0 +1,180 @@
+"""
+Shared backoff controller for VirusTotal rate-limit (HTTP 429) responses
+"""
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional
+from .cancellation import CancelToken
+from .config import RETRY_DELAY, BACKOFF_MAX_DELAY
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class BackoffController:
+    """
+    Pauses every worker of a scan when the API signals throttling
+
+    A 429 moves a shared resume time forward instead of putting only the
+    failing worker to sleep, so the other workers stop sending requests too
+    and nobody retries before the quota has recovered. The delay honours
+    Retry-After and quota headers when present, otherwise it grows
+    exponentially with jitter across consecutive throttles.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = RETRY_DELAY,
+        max_delay: float = BACKOFF_MAX_DELAY,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self._consecutive_throttles = 0
+
+        # Counters
+        self.throttle_events = 0
+        self.throttled_seconds = 0.0
+
+    def _pause_until(self, resume_at: float, now: float) -> None:
+        """Move the shared resume time forward, counting only newly paused time"""
+        if resume_at <= self._resume_at:
+            return
+        self.throttled_seconds += resume_at - max(self._resume_at, now)
+        self._resume_at = resume_at
+
+    def next_delay(self) -> float:
+        """Exponential delay for the current throttle streak, with equal jitter"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, self._consecutive_throttles - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def on_throttled(self, headers: Mapping[str, str]) -> float:
+        """
+        Record a 429 response and pause the scheduler
+
+        Args:
+            headers: Response headers
+
+        Returns:
+            Seconds until requests may resume
+        """
+        with self._lock:
+            now = self._clock()
+            self.throttle_events += 1
+            self._consecutive_throttles += 1
+
+            delay = parse_retry_after(headers.get("Retry-After"))
+            if delay is None:
+                delay = self._quota_reset_delay(headers)
+            if delay is None:
+                delay = self.next_delay()
+
+            self._pause_until(now + delay, now)
+            return self._resume_at - now
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Record a successful response; pauses early if the quota headers say it is used up"""
+        with self._lock:
+            self._consecutive_throttles = 0
+            remaining = headers.get("X-RateLimit-Remaining")
+            if remaining is not None and remaining.strip() == "0":
+                delay = self._quota_reset_delay(headers)
+                if delay:
+                    now = self._clock()
+                    self._pause_until(now + delay, now)
+
+    def _quota_reset_delay(self, headers: Mapping[str, str]) -> Optional[float]:
+        """Seconds until the quota resets according to X-RateLimit-Reset, if sent"""
+        reset = headers.get("X-RateLimit-Reset")
+        if not reset:
+            return None
+        try:
+            reset_value = float(reset)
+        except ValueError:
+            return None
+        # Either an epoch timestamp or a number of seconds
+        if reset_value > 1_000_000_000:
+            reset_value -= time.time()
+        return min(self.max_delay, max(0.0, reset_value))
+
+    def time_until_resume(self) -> float:
+        """Seconds until the scheduler is allowed to send requests again"""
+        with self._lock:
+            return max(0.0, self._resume_at - self._clock())
+
+    def wait(self, cancel_token: Optional[CancelToken] = None) -> float:
+        """
+        Block until the scheduler is resumed
+
+        Args:
+            cancel_token: Stops waiting as soon as it is cancelled
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        delay = self.time_until_resume()
+        # Loop because another worker may extend the pause while we sleep
+        while delay > 0:
+            if cancel_token is not None:
+                if cancel_token.sleep(delay):
+                    break
+            else:
+                time.sleep(delay)
+            waited += delay
+            delay = self.time_until_resume()
+        return waited
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get throttling counters
+
+        Returns:
+            Dictionary with the number of 429 responses and the total paused time
+        """
+        with self._lock:
+            return {
+                "throttle_events": self.throttle_events,
+                "throttled_seconds": round(self.throttled_seconds, 1)
+            }
+
+
+_controllers: Dict[str, BackoffController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_backoff_controller(api_key: str) -> BackoffController:
+    """Get the process-wide backoff controller for an API key"""
+    with _controllers_lock:
+        if api_key not in _controllers:
+            _controllers[api_key] = BackoffController()
+        return _controllers[api_key]
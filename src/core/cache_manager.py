@@ -3,38 +3,236 @@ Cache management for storing and retrieving IP scan results
 """
 import json
 import os
-from typing import Dict, List, Set, Optional
-from .config import CACHE_FILE, TEMP_RESULTS_FILE
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Set, Optional, Tuple
+from .analysis_results import compact_entry, json_default
+from .cache_store import CacheStore, create_cache_store
+from .config import (
+    TEMP_RESULTS_FILE, CACHE_CHANGE_CHECK_INTERVAL,
+    CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_EVICTION_POLICY, EXPORT_READ_BATCH
+)
+from .eviction import create_eviction_policy
+from .file_utils import atomic_write
+from .freshness import get_fetched_at, is_fresh
+
+
+class CacheIndex:
+    """
+    Process-wide, bounded in-memory copy of a cache store
+
+    The store is read once; after that lookups are dictionary operations and
+    writes update the copy in place. The store's files are stat'ed at most
+    once per CACHE_CHANGE_CHECK_INTERVAL to pick up writes from other
+    processes, which trigger a reload.
+
+    Capacity is limited in entries and in serialized bytes. Every insert
+    evicts entries chosen by the eviction policy until the cache fits again,
+    from memory and from the store, so memory and disk use stay bounded.
+    """
+
+    def __init__(
+        self,
+        store: CacheStore,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        policy: str = CACHE_EVICTION_POLICY
+    ):
+        self.store = store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy_name = policy
+        self.entries: Dict[str, Dict] = {}
+        self._sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self._policy = create_eviction_policy(policy)
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _file_signature(self) -> Tuple:
+        """Modification time and size of every data file of the store"""
+        signature = []
+        for path in self.store.data_files():
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def refresh(self) -> None:
+        """Load the store on first use, reload it if another process changed it"""
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded and now - self._checked_at < CACHE_CHANGE_CHECK_INTERVAL:
+                return
+            self._checked_at = now
+
+            signature = self._file_signature()
+            if not self._loaded or signature != self._signature:
+                # Usage is not persisted: start from fetch order, oldest first
+                cache = self.store.load_all()
+                self._reset(sorted(cache.items(), key=lambda item: get_fetched_at(item[1])))
+                self._loaded = True
+                self._evict()
+                self._signature = self._file_signature()
+
+    def _reset(self, items: Iterable[Tuple[str, Dict]]) -> None:
+        """Rebuild the copy and the usage tracking from scratch"""
+        self.entries = {}
+        self._sizes = {}
+        self.total_bytes = 0
+        self._policy = create_eviction_policy(self.policy_name)
+        for ip, entry in items:
+            self._insert(ip, entry)
+
+    def _insert(self, ip: str, entry: Dict) -> None:
+        """Add or replace one entry without enforcing capacity"""
+        size = len(json.dumps(entry, ensure_ascii=False, default=json_default))
+        self.total_bytes += size - self._sizes.get(ip, 0)
+        self._sizes[ip] = size
+        self.entries[ip] = entry
+        self._policy.add(ip)
+
+    def _discard(self, ip: str) -> None:
+        """Drop one entry from memory"""
+        if self.entries.pop(ip, None) is not None:
+            self.total_bytes -= self._sizes.pop(ip)
+            self._policy.remove(ip)
+
+    def _over_capacity(self) -> bool:
+        return (
+            (self.max_entries > 0 and len(self.entries) > self.max_entries)
+            or (self.max_bytes > 0 and self.total_bytes > self.max_bytes)
+        )
+
+    def _evict(self) -> None:
+        """Evict entries until the cache fits its capacity again"""
+        evicted = []
+        while self._over_capacity():
+            ip = self._policy.victim()
+            if ip is None:
+                break
+            self._discard(ip)
+            evicted.append(ip)
+        if evicted:
+            self.evictions += len(evicted)
+            self.store.delete_many(evicted)
+
+    def _after_write(self) -> None:
+        """Remember the files as we left them, so our own writes do not trigger a reload"""
+        self._signature = self._file_signature()
+        self._checked_at = time.monotonic()
+
+    def get(self, ip: str) -> Optional[Dict]:
+        """Look up an entry, counting the hit or miss and marking it as used"""
+        with self._lock:
+            entry = self.entries.get(ip)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._policy.touch(ip)
+            return entry
+
+    def update(self, entries: Dict[str, Dict]) -> None:
+        with self._lock:
+            for ip, entry in entries.items():
+                self._insert(ip, entry)
+            self._evict()
+            self._after_write()
+
+    def replace(self, cache: Dict[str, Dict]) -> None:
+        with self._lock:
+            self._reset(cache.items())
+            self._evict()
+            self._after_write()
+
+    def get_counters(self) -> Dict[str, int]:
+        """
+        Get cache usage counters
+
+        Returns:
+            Dictionary with hits, misses, evictions and the cached size in bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "cached_bytes": self.total_bytes
+            }
+
+
+_indexes: Dict[Tuple, CacheIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(store: CacheStore, **capacity) -> CacheIndex:
+    """Get the shared index for the files behind a store"""
+    key = (type(store).__name__, tuple(store.data_files()))
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = CacheIndex(store, **capacity)
+        return _indexes[key]
 
 
 class CacheManager:
     """Manages caching of IP scan results"""
     
-    def __init__(self):
-        self.cache_file = CACHE_FILE
+    def __init__(
+        self,
+        store: Optional[CacheStore] = None,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        policy: str = CACHE_EVICTION_POLICY
+    ):
+        self.store = store or create_cache_store()
+        # Capacity applies when the first manager for a store is created
+        self.index = _get_index(self.store, max_entries=max_entries, max_bytes=max_bytes, policy=policy)
         self.temp_file = TEMP_RESULTS_FILE
     
+    def _entries(self) -> Dict[str, Dict]:
+        """Up-to-date in-memory cache entries"""
+        self.index.refresh()
+        return self.index.entries
+    
     def load_cache(self) -> Dict[str, Dict]:
         """
-        Load cached IP data from file
+        Load all cached IP data
         
         Returns:
             Dictionary mapping IP addresses to their scan results
         """
-        if not os.path.exists(self.cache_file):
-            return {}
+        return dict(self._entries())
+    
+    def iter_cache(self, batch_size: int = EXPORT_READ_BATCH) -> Iterator[Dict]:
+        """
+        Yield every stored entry without loading the whole cache
         
-        try:
-            with open(self.cache_file, "r", encoding="utf-8") as f:
-                cache = json.load(f)
-                return cache if isinstance(cache, dict) else {}
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Warning: Failed to load cache file: {e}")
-            return {}
+        Reads the backend directly in batches and leaves the in-memory index
+        untouched, so exporting a large cache neither fills memory nor evicts
+        the entries scans use.
+        
+        Args:
+            batch_size: Entries read from the backend at a time
+            
+        Returns:
+            Iterator over cache entries
+        """
+        for _, entry in self.store.iter_entries(batch_size):
+            yield entry
     
     def save_cache(self, cache: Dict[str, Dict]) -> bool:
         """
-        Save cache data to file
+        Replace the whole cache content
         
         Args:
             cache: Dictionary of IP data to save
@@ -42,13 +240,10 @@ class CacheManager:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            with open(self.cache_file, "w", encoding="utf-8") as f:
-                json.dump(cache, f, indent=4, ensure_ascii=False)
-            return True
-        except IOError as e:
-            print(f"Error: Failed to save cache file: {e}")
+        if not self.store.replace_all(cache):
             return False
+        self.index.replace(cache)
+        return True
     
     def get_cached_ips(self) -> Set[str]:
         """
@@ -57,8 +252,7 @@ class CacheManager:
         Returns:
             Set of IP addresses that are cached
         """
-        cache = self.load_cache()
-        return set(entry.get("IP", "") for entry in cache.values() if "IP" in entry)
+        return set(self._entries())
     
     def is_ip_cached(self, ip: str) -> bool:
         """
@@ -70,7 +264,16 @@ class CacheManager:
         Returns:
             True if IP is cached, False otherwise
         """
-        return ip in self.get_cached_ips()
+        return ip in self._entries()
+    
+    def count(self) -> int:
+        """
+        Get the number of cached entries
+        
+        Returns:
+            Number of cached IP addresses
+        """
+        return len(self._entries())
     
     def get_cached_entry(self, ip: str) -> Optional[Dict]:
         """
@@ -82,8 +285,8 @@ class CacheManager:
         Returns:
             Cached entry dictionary or None if not found
         """
-        cache = self.load_cache()
-        return cache.get(ip)
+        self.index.refresh()
+        return self.index.get(ip)
     
     def add_to_cache(self, ip: str, data: Dict) -> None:
         """
@@ -93,13 +296,28 @@ class CacheManager:
             ip: IP address
             data: Scan result data to cache
         """
-        cache = self.load_cache()
-        cache[ip] = data
-        self.save_cache(cache)
+        self.add_many({ip: data})
+    
+    def add_many(self, entries: Dict[str, Dict]) -> bool:
+        """
+        Add or update several entries in one batch
+        
+        Args:
+            entries: Dictionary mapping IP addresses to scan result data
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not entries:
+            return True
+        if not self.store.put_many(entries):
+            return False
+        self.index.update(entries)
+        return True
     
     def save_temp_results(self, results: List[Dict]) -> bool:
         """
-        Save temporary scan results
+        Save temporary scan results, replacing those saved before
         
         Args:
             results: List of scan results to save
@@ -108,17 +326,47 @@ class CacheManager:
             True if successful, False otherwise
         """
         try:
-            with open(self.temp_file, "w", encoding="utf-8") as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
+            atomic_write(self.temp_file, "".join(self._temp_lines(results)))
             return True
         except IOError as e:
             print(f"Error: Failed to save temp results: {e}")
             return False
     
+    def append_temp_results(self, results: List[Dict]) -> bool:
+        """
+        Add scan results to the temporary results, one JSON line each
+        
+        Only the new results are written, so checkpointing a long scan
+        does not rewrite everything saved before.
+        
+        Args:
+            results: Scan results to add
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with open(self.temp_file, "a", encoding="utf-8") as f:
+                f.write("".join(self._temp_lines(results)))
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+        except IOError as e:
+            print(f"Error: Failed to save temp results: {e}")
+            return False
+    
+    @staticmethod
+    def _temp_lines(results: List[Dict]) -> Iterator[str]:
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n"
+    
     def load_temp_results(self) -> List[Dict]:
         """
         Load temporary scan results
         
+        Reads the JSON Lines file as well as the JSON list written by
+        earlier versions; a torn last line is ignored.
+        
         Returns:
             List of scan results or empty list if file doesn't exist
         """
@@ -127,11 +375,27 @@ class CacheManager:
         
         try:
             with open(self.temp_file, "r", encoding="utf-8") as f:
-                results = json.load(f)
-                return results if isinstance(results, list) else []
-        except (json.JSONDecodeError, IOError) as e:
+                text = f.read()
+        except IOError as e:
             print(f"Warning: Failed to load temp results: {e}")
             return []
+        
+        if text.lstrip().startswith("["):
+            try:
+                results = json.loads(text)
+            except json.JSONDecodeError as e:
+                print(f"Warning: Failed to load temp results: {e}")
+                return []
+            return [compact_entry(result) for result in results] if isinstance(results, list) else []
+        
+        results = []
+        for line in text.splitlines():
+            try:
+                results.append(compact_entry(json.loads(line)))
+            except json.JSONDecodeError:
+                # Torn write from a crash
+                break
+        return results
     
     def clear_temp_results(self) -> bool:
         """
@@ -157,13 +421,16 @@ class CacheManager:
         Returns:
             Dictionary with cache statistics
         """
-        cache = self.load_cache()
+        cache = self._entries()
+        cached_ips = cache.keys()
         temp_results = self.load_temp_results()
         
         return {
-            "cached_ips": len(cache),
+            "cached_ips": len(cached_ips),
+            "expired_ips": sum(1 for entry in cache.values() if not is_fresh(entry)),
             "temp_results": len(temp_results),
-            "total_unique_ips": len(set(cache.keys()) | set(r.get("IP", "") for r in temp_results))
+            "total_unique_ips": len(cached_ips | set(r.get("IP", "") for r in temp_results)),
+            **self.index.get_counters()
         }
     
     def cleanup_cache(self, max_entries: int = 1000) -> int:
@@ -181,11 +448,8 @@ class CacheManager:
         if len(cache) <= max_entries:
             return 0
         
-        # Sort by last analysis date if available, otherwise by IP
-        sorted_items = sorted(
-            cache.items(),
-            key=lambda x: x[1].get("Last Analysis Date", "0000/00/00")
-        )
+        # Sort by fetch time, oldest first
+        sorted_items = sorted(cache.items(), key=lambda x: get_fetched_at(x[1]))
         
         # Keep only the most recent entries
         entries_to_remove = len(cache) - max_entries
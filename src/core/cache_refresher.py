@@ -0,0 +1,146 @@
+"""
+Background revalidation of cache entries that are about to expire
+"""
+import heapq
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from .cache_manager import CacheManager
+from .config import (
+    CACHE_REFRESH_INTERVAL, CACHE_REFRESH_LOOKAHEAD, CACHE_REFRESH_QUOTA_RESERVE, EXPORT_READ_BATCH
+)
+from .freshness import get_expires_at, stamp_entry
+from .key_pool import ClientPool
+
+# Seconds between checks for a key with a free token
+IDLE_POLL_INTERVAL = 1.0
+
+
+class CacheRefresher:
+    """
+    Re-queries the cache entries closest to expiry using leftover quota
+
+    Only sends when a key has a token no scan has reserved, and never dips
+    into the share of the daily quota reserved for scans, so refreshing
+    does not delay a scan. Entries refreshed ahead of time are then found
+    fresh at scan time instead of being re-queried there.
+    """
+
+    def __init__(
+        self,
+        pool: ClientPool,
+        cache_manager: CacheManager,
+        interval: float = CACHE_REFRESH_INTERVAL,
+        lookahead: float = CACHE_REFRESH_LOOKAHEAD,
+        quota_reserve: float = CACHE_REFRESH_QUOTA_RESERVE
+    ):
+        self.pool = pool
+        self.cache_manager = cache_manager
+        self.interval = interval
+        self.lookahead = lookahead
+        self.quota_reserve = quota_reserve
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get_candidates(self, now: Optional[float] = None, limit: int = 0) -> List[str]:
+        """
+        IPs expiring within the lookahead window, soonest first
+
+        The cache is read from the backend in batches and only the due
+        entries are kept, the limit soonest ones in a heap.
+
+        Args:
+            now: Current time, defaults to time.time()
+            limit: Maximum number of IPs to return (0 for no limit)
+
+        Returns:
+            List of IP addresses
+        """
+        now = time.time() if now is None else now
+        horizon = now + self.lookahead
+
+        def due():
+            for ip, entry in self.cache_manager.store.iter_entries(EXPORT_READ_BATCH):
+                expires_at = get_expires_at(entry)
+                if expires_at <= horizon:
+                    yield expires_at, ip
+
+        soonest = heapq.nsmallest(limit, due()) if limit else sorted(due())
+        return [ip for _, ip in soonest]
+
+    def refresh_once(self, log_callback: Callable[[str], None], max_requests: int = 0) -> int:
+        """
+        Revalidate due entries until the spare quota or the candidates run out
+
+        Args:
+            log_callback: Function to call for logging
+            max_requests: Upper bound on requests for this round (0 for no limit)
+
+        Returns:
+            Number of entries refreshed
+        """
+        refreshed = 0
+        requests = 0
+        # No more candidates than this round can send
+        limit = max_requests
+        spare = self.pool.get_spare_requests(self.quota_reserve)
+        if spare is not None:
+            if spare <= 0:
+                return 0
+            limit = min(limit, spare) if limit else spare
+        for ip in self.get_candidates(limit=limit):
+            if self._stop.is_set():
+                break
+            if max_requests and requests >= max_requests:
+                break
+            spare = self.pool.get_spare_requests(self.quota_reserve)
+            if spare is not None and spare <= 0:
+                break
+            if not any(stats["usable"] for stats in self.pool.get_key_stats()):
+                break
+            # Only take tokens no scan is queued for
+            while not self.pool.is_idle():
+                if self._stop.wait(IDLE_POLL_INTERVAL):
+                    break
+            if self._stop.is_set():
+                break
+
+            previous = self.cache_manager.get_cached_entry(ip)
+            if previous is None:
+                continue
+            requests += 1
+            vt_data, _ = self.pool.query_ip(ip, log_callback)
+            if not vt_data:
+                continue
+
+            entry: Dict = stamp_entry({**previous, **vt_data}, previous)
+            if self.cache_manager.add_many({ip: entry}):
+                refreshed += 1
+
+        if refreshed:
+            log_callback(f"🔄 Refreshed {refreshed} cached IPs ahead of expiry")
+        return refreshed
+
+    def start(self, log_callback: Callable[[str], None]) -> None:
+        """Run refresh rounds every interval on a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.refresh_once(log_callback)
+                except Exception as e:
+                    log_callback(f"⚠️ Cache refresh failed: {e}")
+                self._stop.wait(self.interval)
+
+        self._thread = threading.Thread(target=run, name="cache-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the background thread after the request in progress"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
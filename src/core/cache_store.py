@@ -0,0 +1,237 @@
+"""
+Storage backends for the IP scan cache
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .analysis_results import compact_entry, json_default
+from .file_utils import atomic_write
+from .config import CACHE_FILE, CACHE_DB_FILE, CACHE_BACKEND, CACHE_BACKEND_SQLITE
+
+
+def _dumps(entry: Dict) -> str:
+    """Serialize an entry compactly for storage"""
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=json_default)
+
+
+class CacheStore:
+    """Interface of a cache backend mapping IP addresses to scan results"""
+
+    def load_all(self) -> Dict[str, Dict]:
+        """Return every cached entry"""
+        raise NotImplementedError
+
+    def get(self, ip: str) -> Optional[Dict]:
+        """Return the entry for one IP, or None"""
+        raise NotImplementedError
+
+    def iter_entries(self, batch_size: int = 1000) -> Iterator[Tuple[str, Dict]]:
+        """Yield every (ip, entry) pair, reading batch_size entries at a time where the backend allows"""
+        yield from self.load_all().items()
+
+    def contains(self, ip: str) -> bool:
+        """Check whether an IP is cached"""
+        return self.get(ip) is not None
+
+    def ips(self) -> List[str]:
+        """Return every cached IP"""
+        return list(self.load_all().keys())
+
+    def count(self) -> int:
+        """Return the number of cached entries"""
+        return len(self.load_all())
+
+    def put_many(self, entries: Dict[str, Dict]) -> bool:
+        """Insert or update several entries at once"""
+        raise NotImplementedError
+
+    def replace_all(self, cache: Dict[str, Dict]) -> bool:
+        """Replace the whole cache content"""
+        raise NotImplementedError
+
+    def delete_many(self, ips: Iterable[str]) -> None:
+        """Remove several entries"""
+        raise NotImplementedError
+
+    def data_files(self) -> List[str]:
+        """Files whose modification reveals a change made by another process"""
+        return []
+
+    def close(self) -> None:
+        """Release resources held by the backend"""
+
+
+class JsonCacheStore(CacheStore):
+    """Original backend: the whole cache in one JSON file, rewritten on every change"""
+
+    def __init__(self, cache_file: str = CACHE_FILE):
+        self.cache_file = cache_file
+
+    def load_all(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.cache_file):
+            return {}
+
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+                if not isinstance(cache, dict):
+                    return {}
+                return {ip: compact_entry(entry) for ip, entry in cache.items()}
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Failed to load cache file: {e}")
+            return {}
+
+    def get(self, ip: str) -> Optional[Dict]:
+        return self.load_all().get(ip)
+
+    def data_files(self) -> List[str]:
+        return [self.cache_file]
+
+    def put_many(self, entries: Dict[str, Dict]) -> bool:
+        cache = self.load_all()
+        cache.update(entries)
+        return self.replace_all(cache)
+
+    def replace_all(self, cache: Dict[str, Dict]) -> bool:
+        try:
+            atomic_write(self.cache_file, json.dumps(cache, indent=4, ensure_ascii=False, default=json_default))
+            return True
+        except IOError as e:
+            print(f"Error: Failed to save cache file: {e}")
+            return False
+
+    def delete_many(self, ips: Iterable[str]) -> None:
+        cache = self.load_all()
+        for ip in ips:
+            cache.pop(ip, None)
+        self.replace_all(cache)
+
+
+class SqliteCacheStore(CacheStore):
+    """
+    SQLite backend with the IP as indexed primary key
+
+    Lookups and inserts cost O(log N) regardless of cache size, and batches
+    of results are upserted in one transaction. WAL mode lets the GUI read
+    the cache while a scan is writing to it. An existing JSON cache is
+    imported once on first use.
+    """
+
+    def __init__(self, db_file: str = CACHE_DB_FILE, legacy_json_file: Optional[str] = CACHE_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ip_cache ("
+            " ip TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+        if legacy_json_file:
+            self._migrate_json(legacy_json_file)
+
+    def _migrate_json(self, json_file: str) -> None:
+        """Import the old JSON cache once, then rename it so it is not imported again"""
+        if not os.path.exists(json_file):
+            return
+
+        cache = JsonCacheStore(json_file).load_all()
+        if self.put_many(cache):
+            try:
+                os.replace(json_file, json_file + ".migrated")
+            except OSError as e:
+                print(f"Warning: Failed to rename migrated cache file: {e}")
+
+    def load_all(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT ip, data FROM ip_cache").fetchall()
+        return {ip: compact_entry(json.loads(data)) for ip, data in rows}
+
+    def get(self, ip: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM ip_cache WHERE ip = ?", (ip,)).fetchone()
+        return compact_entry(json.loads(row[0])) if row else None
+
+    def iter_entries(self, batch_size: int = 1000) -> Iterator[Tuple[str, Dict]]:
+        # Keyset pagination: the lock is only held per batch, so scans can
+        # keep writing while a large cache is read
+        last_ip = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT ip, data FROM ip_cache WHERE ip > ? ORDER BY ip LIMIT ?", (last_ip, batch_size)
+                ).fetchall()
+            for ip, data in rows:
+                yield ip, compact_entry(json.loads(data))
+            if len(rows) < batch_size:
+                return
+            last_ip = rows[-1][0]
+
+    def data_files(self) -> List[str]:
+        return [self.db_file, self.db_file + "-wal"]
+
+    def contains(self, ip: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM ip_cache WHERE ip = ?", (ip,)).fetchone() is not None
+
+    def ips(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT ip FROM ip_cache")]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ip_cache").fetchone()[0]
+
+    def put_many(self, entries: Dict[str, Dict]) -> bool:
+        rows = [(ip, _dumps(entry)) for ip, entry in entries.items()]
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO ip_cache (ip, data) VALUES (?, ?) "
+                    "ON CONFLICT(ip) DO UPDATE SET data = excluded.data",
+                    rows
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error: Failed to save cache entries: {e}")
+            return False
+
+    def replace_all(self, cache: Dict[str, Dict]) -> bool:
+        rows = [(ip, _dumps(entry)) for ip, entry in cache.items()]
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM ip_cache")
+                self._conn.executemany("INSERT INTO ip_cache (ip, data) VALUES (?, ?)", rows)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error: Failed to save cache: {e}")
+            return False
+
+    def delete_many(self, ips: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM ip_cache WHERE ip = ?", [(ip,) for ip in ips])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_cache_store(backend: str = CACHE_BACKEND) -> CacheStore:
+    """
+    Create the configured cache backend
+
+    Args:
+        backend: "sqlite" or "json"
+
+    Returns:
+        Cache store instance
+    """
+    if backend == CACHE_BACKEND_SQLITE:
+        return SqliteCacheStore()
+    return JsonCacheStore()
@@ -0,0 +1,68 @@
+"""
+Cooperative cancellation shared by everything a scan waits on
+"""
+import threading
+from typing import Callable, List
+
+
+class CancelToken:
+    """
+    Cancellation flag that also wakes up anyone waiting on it
+
+    A token is cancelled for good: every scan gets a new one, so work a
+    stopped scan abandoned never sees a later scan's token.
+
+    Sleeps go through sleep(), which returns as soon as the token is
+    cancelled instead of running to the end. Code that blocks elsewhere, e.g.
+    on an event loop or a set of futures, registers a callback with
+    on_cancel() to be woken up.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Cancel and run the registered callbacks (once)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        Sleep unless the token is cancelled meanwhile
+
+        Returns:
+            True if the sleep was cut short by cancellation
+        """
+        if seconds <= 0:
+            return self.cancelled
+        return self._event.wait(seconds)
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run callback when the token is cancelled, right away if it already is
+
+        Returns:
+            Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
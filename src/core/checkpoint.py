@@ -0,0 +1,385 @@
+"""
+Crash-safe checkpointing of scan results while a scan runs
+"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+from .analysis_results import compact_entry, json_default
+from .api_client import VERDICT_FIELDS, has_fields
+from .cache_manager import CacheManager
+from .config import (
+    SCAN_JOURNAL_DIR, SCAN_JOURNAL_FILE, SCAN_MANIFEST_FILE, CHECKPOINT_COMPACT_EVERY, CHECKPOINT_COMPACT_INTERVAL
+)
+from .file_utils import atomic_write
+
+
+def _is_completed(entry: Dict) -> bool:
+    """Failed lookups only hold the IP and process name and are retried on resume"""
+    return has_fields(entry, VERDICT_FIELDS)
+
+
+def new_journal_file(kind: str, journal_dir: str = SCAN_JOURNAL_DIR) -> str:
+    """
+    Path of the journal of one scan or monitor run
+
+    Named after the process writing it, so journals left behind by a
+    process that died can be told apart from those still in use.
+
+    Args:
+        kind: "scan" or "monitor"
+        journal_dir: Directory holding the journals
+    """
+    os.makedirs(journal_dir, exist_ok=True)
+    return os.path.join(journal_dir, f"{kind}-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+
+
+def _is_running(pid: int) -> bool:
+    """Check whether a process exists; unknown counts as running"""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION; os.kill would terminate the process on Windows
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def find_orphaned_journals(
+    journal_dir: str = SCAN_JOURNAL_DIR,
+    keep: Iterable[str] = (),
+    legacy_journal: Optional[str] = SCAN_JOURNAL_FILE
+) -> List[str]:
+    """
+    Journals whose writer died without moving them into the cache
+
+    Args:
+        journal_dir: Directory holding the journals
+        keep: Journals to leave alone, e.g. the one of a scan that can be resumed
+        legacy_journal: Single journal written by earlier versions
+
+    Returns:
+        Paths of the journals to recover
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    orphans = []
+    for path in sorted(glob.glob(os.path.join(journal_dir, "*.jsonl"))):
+        try:
+            pid = int(os.path.basename(path).split("-")[1])
+        except (IndexError, ValueError):
+            continue
+        if os.path.abspath(path) not in keep and not _is_running(pid):
+            orphans.append(path)
+    if legacy_journal and os.path.exists(legacy_journal) and os.path.abspath(legacy_journal) not in keep:
+        orphans.append(legacy_journal)
+    return orphans
+
+
+class ScanJournal:
+    """
+    Append-only JSONL write-ahead log of scan results
+
+    Every result is written and flushed as soon as a worker finishes; the
+    file is fsync'ed once per batch of sync_every results, so a crash loses
+    at most one batch. A torn last line is ignored on replay.
+    """
+
+    def __init__(self, journal_file: Optional[str] = None, sync_every: int = 1):
+        # A run of its own by default, see new_journal_file
+        self.journal_file = journal_file or new_journal_file("scan")
+        self.sync_every = max(1, sync_every)
+        self._unsynced = 0
+        self._file = None
+
+    def append(self, entry: Dict, is_new: bool) -> None:
+        """
+        Log one result
+
+        Args:
+            entry: Scan result
+            is_new: True if the result came from VirusTotal and belongs in the cache
+        """
+        if self._file is None:
+            self._file = open(self.journal_file, "a", encoding="utf-8")
+        record = {"entry": entry, "new": is_new}
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """Force logged results to disk"""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def replay(self) -> List[Dict]:
+        """
+        Read back every complete record
+
+        Returns:
+            List of {"entry": ..., "new": ...} records in logged order
+        """
+        if not os.path.exists(self.journal_file):
+            return []
+        records = []
+        try:
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write from a crash: nothing after it was synced
+                        break
+                    compact_entry(record["entry"])
+                    records.append(record)
+        except IOError as e:
+            print(f"Warning: Failed to read scan journal: {e}")
+        return records
+
+    def reset(self) -> None:
+        """Empty the journal once its records are safely stored elsewhere"""
+        self.close()
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Failed to reset scan journal: {e}")
+
+    def close(self) -> None:
+        """Sync and close the journal file"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class ScanManifest:
+    """
+    Plan of a scan, saved so an interrupted scan can be resumed
+
+    Holds the target IPs with their process names, the scan parameters,
+    the IPs already done and the scan's journal. Completed IPs are saved at
+    every checkpoint compaction; the file is removed once the scan has finished.
+    """
+
+    def __init__(
+        self,
+        targets: Dict[str, str],
+        params: Dict,
+        completed: Iterable[str] = (),
+        manifest_file: str = SCAN_MANIFEST_FILE,
+        journal_file: str = SCAN_JOURNAL_FILE
+    ):
+        self.targets = targets
+        self.params = params
+        self.completed = set(completed)
+        self.manifest_file = manifest_file
+        self.journal_file = journal_file
+
+    @classmethod
+    def load(cls, manifest_file: str = SCAN_MANIFEST_FILE) -> Optional["ScanManifest"]:
+        """
+        Load the manifest of an unfinished scan
+
+        Returns:
+            The manifest, or None if there is no scan to resume
+        """
+        if not os.path.exists(manifest_file):
+            return None
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(
+                dict(data["targets"]), data.get("params", {}), data.get("completed", []), manifest_file,
+                # Manifests of earlier versions share the single journal
+                data.get("journal", SCAN_JOURNAL_FILE)
+            )
+        except (json.JSONDecodeError, IOError, KeyError, TypeError, ValueError) as e:
+            print(f"Warning: Failed to load scan manifest: {e}")
+            return None
+
+    @staticmethod
+    def exists(manifest_file: str = SCAN_MANIFEST_FILE) -> bool:
+        """Check whether there is an unfinished scan to resume"""
+        return os.path.exists(manifest_file)
+
+    def save(self) -> bool:
+        """Write the manifest atomically"""
+        data = {
+            # Pairs keep the scan order
+            "targets": list(self.targets.items()),
+            "params": self.params,
+            "completed": sorted(self.completed),
+            "journal": self.journal_file
+        }
+        try:
+            atomic_write(self.manifest_file, json.dumps(data, ensure_ascii=False))
+            return True
+        except OSError as e:
+            print(f"Warning: Failed to save scan manifest: {e}")
+            return False
+
+    def mark_completed(self, ips: Iterable[str]) -> None:
+        self.completed.update(ips)
+
+    def remaining(self) -> Dict[str, str]:
+        """Targets not completed yet, in scan order"""
+        return {ip: proc for ip, proc in self.targets.items() if ip not in self.completed}
+
+    def clear(self) -> None:
+        """Remove the manifest of a finished scan"""
+        try:
+            os.remove(self.manifest_file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Failed to remove scan manifest: {e}")
+
+
+class ScanCheckpoint:
+    """
+    Keeps the results of a running scan safe against crashes and kills
+
+    Each finished lookup is appended to the journal right away. Every
+    compact_every results or compact_interval seconds the new entries are
+    moved into the cache and the results since the last compaction are
+    appended to the temp results file, after which the journal starts over;
+    a compaction costs the same however long the scan has run. A journal
+    left behind by a crashed scan is replayed into the cache by recover().
+
+    With a manifest, successfully looked up IPs are marked completed in it
+    at the same points. Without keep_results, results are not held in memory
+    and no temp results file is written; streaming consumers keep what they
+    need themselves.
+    """
+
+    def __init__(
+        self,
+        cache_manager: CacheManager,
+        journal: Optional[ScanJournal] = None,
+        compact_every: int = CHECKPOINT_COMPACT_EVERY,
+        compact_interval: float = CHECKPOINT_COMPACT_INTERVAL,
+        manifest: Optional[ScanManifest] = None,
+        results: Optional[List[Dict]] = None,
+        keep_results: bool = True
+    ):
+        self.cache_manager = cache_manager
+        self.journal = journal or ScanJournal()
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.manifest = manifest
+        # Results so far, including those of the run being resumed
+        self.results: List[Dict] = results if results is not None else []
+        self.keep_results = keep_results
+        self.saved_entries = 0
+        # Results before this index are in the temp results file
+        self._results_saved = 0
+        self._pending: Dict[str, Dict] = {}
+        self._completed: List[str] = []
+        self._since_compaction = 0
+        self._compacted_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def recover(self, log_callback: Callable[[str], None]) -> int:
+        """
+        Move results journaled by an interrupted scan into the cache
+
+        Returns:
+            Number of recovered cache entries
+        """
+        records = self.journal.replay()
+        if not records:
+            # Nothing but possibly an empty file
+            self.journal.reset()
+            return 0
+        new_entries = {r["entry"]["IP"]: r["entry"] for r in records if r["new"]}
+        if not self.cache_manager.add_many(new_entries):
+            return 0
+        if self.manifest:
+            self.manifest.mark_completed(r["entry"]["IP"] for r in records if _is_completed(r["entry"]))
+            if not self.manifest.save():
+                return len(new_entries)
+        self.journal.reset()
+        log_callback(f"♻️ Recovered {len(new_entries)} results from an interrupted scan")
+        return len(new_entries)
+
+    def record(self, entry: Dict, is_new: bool) -> None:
+        """
+        Checkpoint one finished lookup (safe to call from any worker)
+
+        Args:
+            entry: Scan result
+            is_new: True if the result came from VirusTotal and belongs in the cache
+        """
+        with self._lock:
+            if self._closed:
+                # Late result of a lookup abandoned by a stopped scan
+                return
+            try:
+                self.journal.append(entry, is_new)
+            except OSError as e:
+                print(f"Warning: Failed to write scan journal: {e}")
+            if self.keep_results:
+                self.results.append(entry)
+            if is_new:
+                self._pending[entry["IP"]] = entry
+            if _is_completed(entry):
+                self._completed.append(entry["IP"])
+            self._since_compaction += 1
+            if (
+                self._since_compaction >= self.compact_every
+                or time.monotonic() - self._compacted_at >= self.compact_interval
+            ):
+                self._compact()
+
+    def _compact(self) -> bool:
+        """Store pending entries and results, then empty the journal (caller holds the lock)"""
+        self._since_compaction = 0
+        self._compacted_at = time.monotonic()
+        if not self.cache_manager.add_many(self._pending):
+            # Keep the journal, it is the only durable copy
+            return False
+        self.saved_entries += len(self._pending)
+        self._pending = {}
+        if self.manifest:
+            self.manifest.mark_completed(self._completed)
+            if not self.manifest.save():
+                return False
+        self._completed = []
+        if self.keep_results:
+            unsaved = self.results[self._results_saved:]
+            if unsaved and not self.cache_manager.append_temp_results(unsaved):
+                return False
+            self._results_saved += len(unsaved)
+        self.journal.reset()
+        return True
+
+    def close(self) -> bool:
+        """
+        Final compaction at the end of a scan
+
+        Returns:
+            True if every result reached the cache and the temp results file
+        """
+        with self._lock:
+            self._closed = True
+            saved = self._compact()
+            self.journal.close()
+            return saved
@@ -0,0 +1,368 @@
+"""
+Columnar export of scan results and the cache to Parquet or Arrow IPC files
+
+Needs the optional pyarrow package. Columns are typed for analytics: integer
+engine counts, dictionary-encoded (categorical) country and ASN owner and
+timestamps for the analysis and fetch dates. Partitioned exports write a
+Hive-style directory tree (scan_date=2024-05-01/...) that query engines and
+pandas can prune by date.
+"""
+import os
+import uuid
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, columnar export
+    pa = None
+from .config import COLUMNAR_FIELDS, EXPORT_READ_BATCH
+
+# Columnar formats
+EXPORT_PARQUET = "parquet"
+EXPORT_ARROW = "arrow"
+COLUMNAR_FORMATS = [EXPORT_PARQUET, EXPORT_ARROW]
+
+# Partition key of datasets: the date of the scan or export that wrote the files
+PARTITION_COLUMN = "scan_date"
+
+# Columns stored as integers, missing values ("N/A") become nulls
+_INT_COLUMNS = {
+    "Reputation Score", "ASN",
+    "Engines Malicious", "Engines Suspicious", "Engines Harmless",
+    "Community Malicious Votes", "Community Harmless Votes"
+}
+# Columns with few distinct values, dictionary-encoded
+_CATEGORY_COLUMNS = {"Country", "ASN Owner", "Process Name"}
+
+
+def columnar_available() -> bool:
+    """Check whether pyarrow is installed"""
+    return pa is not None
+
+
+def detect_columnar_format(path: str) -> Optional[str]:
+    """
+    Columnar format implied by a file name
+
+    Returns:
+        "parquet" for .parquet/.pq, "arrow" for .arrow/.feather/.ipc, otherwise None
+    """
+    name = path.lower().rstrip("/\\")
+    if name.endswith((".parquet", ".pq")):
+        return EXPORT_PARQUET
+    if name.endswith((".arrow", ".feather", ".ipc")):
+        return EXPORT_ARROW
+    return None
+
+
+def _to_int(value) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def _to_timestamp(epoch) -> Optional[datetime]:
+    if not isinstance(epoch, (int, float)) or epoch <= 0:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def _parse_analysis_date(value) -> Optional[datetime]:
+    """Parse the dd/mm/yyyy "Last Analysis Date" of an entry"""
+    try:
+        return datetime.strptime(value, "%d/%m/%Y").replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def _column_type(field: str):
+    if field in _INT_COLUMNS:
+        return pa.int64()
+    if field in _CATEGORY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if field in ("Last Analysis Date", "Fetched At"):
+        return pa.timestamp("s", tz="UTC")
+    if field == "Analysis Results":
+        return pa.map_(pa.string(), pa.string())
+    return pa.string()
+
+
+def _column_value(field: str, entry: Dict):
+    value = entry.get(field)
+    if field in _INT_COLUMNS:
+        return _to_int(value)
+    if field == "Last Analysis Date":
+        return _parse_analysis_date(value)
+    if field == "Fetched At":
+        return _to_timestamp(value)
+    if field == "Analysis Results":
+        return list(value.items()) if value is not None else None
+    if value is None or value == "N/A":
+        return None
+    return str(value)
+
+
+class _Categories:
+    """
+    Dictionary of one categorical column that only ever grows
+
+    Every batch references the same dictionary extended with the new values,
+    which Arrow IPC files can store as deltas; a different dictionary per
+    batch is not allowed there.
+    """
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def encode(self, values: List[Optional[str]]):
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self._values)
+                self._values.append(value)
+            indices.append(code)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(self._values, pa.string()))
+
+
+class ColumnarBatcher:
+    """Turns result dictionaries into typed Arrow record batches"""
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = list(fields)
+        self.schema = pa.schema([(field, _column_type(field)) for field in self.fields])
+        self._categories = {field: _Categories() for field in self.fields if field in _CATEGORY_COLUMNS}
+
+    def batch(self, entries: List[Dict]):
+        """Build one record batch from a list of entries"""
+        arrays = []
+        for field in self.fields:
+            values = [_column_value(field, entry) for entry in entries]
+            if field in self._categories:
+                arrays.append(self._categories[field].encode(values))
+            else:
+                arrays.append(pa.array(values, _column_type(field)))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def batches(self, entries: Iterable[Dict], batch_rows: int = EXPORT_READ_BATCH) -> Iterator:
+        """Consume entries lazily, yielding a record batch every batch_rows entries"""
+        pending: List[Dict] = []
+        for entry in entries:
+            pending.append(entry)
+            if len(pending) >= batch_rows:
+                yield self.batch(pending)
+                pending = []
+        if pending:
+            yield self.batch(pending)
+
+
+class ColumnarWriter:
+    """
+    Parquet or Arrow IPC file fed one entry at a time
+
+    Entries are written as a record batch (a Parquet row group) every
+    batch_rows entries, so memory use stays flat however long the scan.
+    A plain file is opened up front: without entries it still carries the
+    schema, like a CSV header. A partitioned writer adds one file to the
+    scan_date=YYYY-MM-DD directory of its scan date once it has entries,
+    next to the files of earlier exports. That file is named with a leading
+    dot, which dataset readers skip, until close() completes it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        partitioned: bool = False,
+        scan_date: Optional[date] = None,
+        batch_rows: int = EXPORT_READ_BATCH
+    ):
+        """
+        Args:
+            path: Output file, or the dataset directory when partitioned
+            fmt: "parquet" or "arrow", detected from the file name if None
+            fields: Columns to write (default: COLUMNAR_FIELDS)
+            partitioned: Write into the partition of scan_date under path
+            scan_date: Date of the scan or export, the partition key (default: today, UTC)
+            batch_rows: Entries per record batch (and Parquet row group)
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+            ValueError: If the format is unsupported
+        """
+        if pa is None:
+            raise RuntimeError("Columnar export needs pyarrow (pip install pyarrow)")
+        self.fmt = fmt or detect_columnar_format(path) or EXPORT_PARQUET
+        if self.fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unsupported columnar format: {self.fmt}")
+        self.path = path
+        self.partitioned = partitioned
+        self.scan_date = scan_date or datetime.now(timezone.utc).date()
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._batcher = ColumnarBatcher(fields or COLUMNAR_FIELDS)
+        self._pending: List[Dict] = []
+        self._writer = None
+        # Final and in-progress name of a partition file
+        self._file_path: Optional[str] = None
+        self._temp_path: Optional[str] = None
+        if not partitioned:
+            self._open()
+
+    def _open(self) -> None:
+        if self.partitioned:
+            extension = "parquet" if self.fmt == EXPORT_PARQUET else "arrow"
+            directory = os.path.join(self.path, f"{PARTITION_COLUMN}={self.scan_date.isoformat()}")
+            # Unique names keep the files of earlier exports
+            self._file_path = os.path.join(directory, f"part-{uuid.uuid4().hex[:12]}.{extension}")
+            self._temp_path = path = os.path.join(directory, "." + os.path.basename(self._file_path))
+        else:
+            directory = os.path.dirname(self.path)
+            path = self.path
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.fmt == EXPORT_PARQUET:
+            self._writer = pq.ParquetWriter(path, self._batcher.schema)
+        else:
+            self._writer = pa.ipc.new_file(
+                path, self._batcher.schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            )
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        if self._writer is None:
+            self._open()
+        self._writer.write_batch(self._batcher.batch(self._pending))
+        self.rows += len(self._pending)
+        self._pending = []
+
+    def write(self, entry: Dict) -> None:
+        """Add one entry, writing a record batch once batch_rows are pending"""
+        self._pending.append(entry)
+        if len(self._pending) >= self.batch_rows:
+            self._flush()
+
+    def close(self) -> int:
+        """
+        Write the pending entries and complete the file
+
+        Returns:
+            Number of rows written
+        """
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            if self._temp_path:
+                os.replace(self._temp_path, self._file_path)
+        return self.rows
+
+    def abort(self) -> None:
+        """Give up the file after an error; a partition never shows an incomplete one"""
+        self._pending = []
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+            if self._temp_path:
+                try:
+                    os.remove(self._temp_path)
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_columnar(
+    entries: Iterable[Dict],
+    path: str,
+    fmt: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    partitioned: bool = False,
+    scan_date: Optional[date] = None,
+    batch_rows: int = EXPORT_READ_BATCH
+) -> int:
+    """
+    Write entries to a Parquet or Arrow IPC file, or to the partition of a scan date
+
+    Entries are consumed lazily and written one record batch at a time.
+    A partitioned export adds a file next to those of earlier exports, so
+    a directory can accumulate the history of many scans. Without entries
+    no partition is added.
+
+    Args:
+        entries: Results or cache entries
+        path: Output file, or the dataset directory when partitioned
+        fmt: "parquet" or "arrow", detected from the file name if None
+        fields: Columns to write (default: COLUMNAR_FIELDS)
+        partitioned: Write into the scan_date=YYYY-MM-DD directory of scan_date
+        scan_date: Date of the scan or export, the partition key (default: today, UTC)
+        batch_rows: Entries per record batch (and Parquet row group)
+
+    Returns:
+        Number of rows written
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+        ValueError: If the format is unsupported
+    """
+    with ColumnarWriter(path, fmt, fields, partitioned, scan_date, batch_rows) as writer:
+        for entry in entries:
+            writer.write(entry)
+    return writer.rows
+
+
+def log_columnar_export(writer: ColumnarWriter, log_callback: Callable[[str], None]) -> None:
+    """Report what a closed writer wrote"""
+    if writer.partitioned:
+        if not writer.rows:
+            log_callback(f"📄 No results to export, nothing added to: {writer.path}")
+            return
+        layout = f" ({PARTITION_COLUMN}={writer.scan_date.isoformat()})"
+    else:
+        layout = ""
+    log_callback(f"📄 {writer.fmt.upper()} exported to: {writer.path}{layout}, {writer.rows} rows")
+
+
+def export_columnar(
+    entries: Iterable[Dict],
+    path: str,
+    log_callback: Callable[[str], None],
+    fmt: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    partitioned: bool = False,
+    scan_date: Optional[date] = None
+) -> bool:
+    """
+    Write entries with a ColumnarWriter, logging the outcome instead of raising
+
+    Returns:
+        True if the export succeeded, even without entries; False otherwise
+    """
+    if pa is None:
+        log_callback("❌ Parquet/Arrow export needs pyarrow: pip install pyarrow")
+        return False
+    fmt = fmt or detect_columnar_format(path) or EXPORT_PARQUET
+    try:
+        with ColumnarWriter(path, fmt, fields, partitioned, scan_date) as writer:
+            for entry in entries:
+                writer.write(entry)
+    except Exception as e:
+        log_callback(f"❌ Failed to export {fmt.upper()}: {str(e)}")
+        return False
+    log_columnar_export(writer, log_callback)
+    return True
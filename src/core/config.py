@@ -10,13 +10,21 @@ if os.name == 'nt':  # Windows
 else:  # Linux/Unix - use XDG Base Directory specification
     APPDATA_DIR = os.path.join(os.getenv("XDG_CONFIG_HOME", os.path.expanduser("~/.config")), "vt-ip-analyzer")
 TEMP_RESULTS_FILE = os.path.join(APPDATA_DIR, "temp_scan_results.json")
+# One journal per scan or monitor run; the single journal of earlier versions is still recovered
+SCAN_JOURNAL_DIR = os.path.join(APPDATA_DIR, "journals")
+SCAN_JOURNAL_FILE = os.path.join(APPDATA_DIR, "scan_journal.jsonl")
+SCAN_MANIFEST_FILE = os.path.join(APPDATA_DIR, "scan_manifest.json")
 CACHE_FILE = os.path.join(APPDATA_DIR, "ip_cache.json")
+CACHE_DB_FILE = os.path.join(APPDATA_DIR, "ip_cache.db")
 API_KEY_FILE = os.path.join(APPDATA_DIR, "api_key.enc")
+API_KEY_RING_FILE = os.path.join(APPDATA_DIR, "api_keys.enc")
+KEY_USAGE_FILE = os.path.join(APPDATA_DIR, "key_usage.json")
+ANALYSIS_TABLES_FILE = os.path.join(APPDATA_DIR, "analysis_tables.json")
 FERNET_KEY_FILE = os.path.join(APPDATA_DIR, "fernet.key")
 
 # Default settings
 DEFAULT_FIELDS = [
-    "IP", "Process Name", "Reputation Score", "Country", "ASN Owner",
+    "IP", "Process Name", "Processes", "Reputation Score", "Country", "ASN Owner",
     "Engines Malicious", "Engines Suspicious", "Engines Harmless",
     "Community Malicious Votes", "Community Harmless Votes"
 ]
@@ -31,11 +39,92 @@ COLOR_DISABLED = "#555555"
 VIRUSTOTAL_BASE_URL = "https://www.virustotal.com/api/v3/ip_addresses"
 MAX_RETRIES = 3
 RETRY_DELAY = 10
+MAX_THROTTLE_RETRIES = 8  # 429 responses tolerated per lookup
+BACKOFF_MAX_DELAY = 15 * 60
+REQUEST_TIMEOUT = 30
+
+# API quota (public API defaults, 0 means no limit for that window)
+DEFAULT_REQUESTS_PER_MINUTE = 4
+DEFAULT_REQUESTS_PER_DAY = 500
+DEFAULT_REQUESTS_PER_MONTH = 15500
 
 # Scanning defaults
 DEFAULT_BATCH_SIZE = 4
-DEFAULT_BATCH_DELAY = 60
 DEFAULT_MAX_IPS = 0  # 0 means no limit
+DEFAULT_POOL_SIZE = DEFAULT_BATCH_SIZE  # keep-alive connections, one per concurrent worker
+SCAN_STOP_TIMEOUT = 2.0  # seconds to wait for a stopped scan to save its results on exit
+
+# Scan prioritization: connections from processes outside this list or to
+# ports outside COMMON_PORTS are looked up first (process names compare case-insensitively)
+TRUSTED_PROCESSES = [
+    "chrome", "chrome.exe", "firefox", "firefox.exe", "msedge.exe", "safari",
+    "svchost.exe", "systemd-resolved", "NetworkManager", "apt", "apt-get", "dnf",
+    "Dropbox", "OneDrive.exe", "Teams.exe", "slack", "code", "Code.exe"
+]
+COMMON_PORTS = [22, 53, 80, 123, 443, 853, 993, 995, 5228]
+
+# Scan checkpointing: results are journaled as they arrive and moved into
+# the cache every CHECKPOINT_COMPACT_EVERY results or CHECKPOINT_COMPACT_INTERVAL seconds
+CHECKPOINT_COMPACT_EVERY = 50
+CHECKPOINT_COMPACT_INTERVAL = 5 * 60
+
+# Result export
+EXPORT_BUFFER_ROWS = 500  # rows held in memory before they are written out
+EXPORT_FLUSH_INTERVAL = 5.0  # seconds after which buffered rows are written out anyway
+EXPORT_ROTATE_BYTES = 0  # start a new file at this size (0 means a single file)
+EXPORT_READ_BATCH = 1000  # cache entries read at a time when exporting the whole cache
+# Default columns of Parquet/Arrow exports (needs pyarrow)
+COLUMNAR_FIELDS = [
+    "IP", "Process Name", "Reputation Score", "Country", "ASN", "ASN Owner", "Last Analysis Date",
+    "Engines Malicious", "Engines Suspicious", "Engines Harmless",
+    "Community Malicious Votes", "Community Harmless Votes", "Fetched At"
+]
+
+# Scanning engines
+SCAN_ENGINE_THREADED = "threaded"
+SCAN_ENGINE_ASYNCIO = "asyncio"
+SCAN_ENGINES = [SCAN_ENGINE_THREADED, SCAN_ENGINE_ASYNCIO]
+DEFAULT_SCAN_ENGINE = SCAN_ENGINE_THREADED
+
+# Connection collection on Linux: "netlink" asks the kernel over sock_diag,
+# "proc" reads /proc/net directly, "command" runs ss or netstat; each one
+# falls back to the next when it is not available
+NETWORK_BACKEND_NETLINK = "netlink"
+NETWORK_BACKEND_PROC = "proc"
+NETWORK_BACKEND_COMMAND = "command"
+NETWORK_BACKENDS = [NETWORK_BACKEND_NETLINK, NETWORK_BACKEND_PROC, NETWORK_BACKEND_COMMAND]
+DEFAULT_NETWORK_BACKEND = NETWORK_BACKEND_NETLINK
+
+# Monitor mode: connections are snapshotted every MONITOR_INTERVAL seconds
+# and peers not seen in the previous snapshot are looked up in batches once
+# MONITOR_DEBOUNCE seconds have passed since they first showed up
+MONITOR_INTERVAL = 10.0
+MONITOR_DEBOUNCE = 5.0
+MONITOR_REPORT_TTL = 60 * 60  # a peer is not looked up again within this time
+
+# Cache storage backends
+CACHE_BACKEND_SQLITE = "sqlite"
+CACHE_BACKEND_JSON = "json"
+CACHE_BACKEND = CACHE_BACKEND_SQLITE
+CACHE_CHANGE_CHECK_INTERVAL = 1.0  # seconds between checks for changes by other processes
+
+# Cache capacity (0 means no limit); entries beyond it are evicted on insert
+CACHE_MAX_ENTRIES = 50000
+CACHE_MAX_BYTES = 128 * 1024 * 1024  # serialized size of all entries
+CACHE_EVICTION_POLICY = "lru"  # "lru" or "lfu"
+
+# Cache expiry per verdict (seconds)
+CACHE_TTL_MALICIOUS = 6 * 3600
+CACHE_TTL_SUSPICIOUS = 24 * 3600
+CACHE_TTL_UNANALYZED = 3 * 24 * 3600  # IPs VirusTotal has no analysis for
+CACHE_TTL_CLEAN = 7 * 24 * 3600
+CACHE_TTL_LONGSTANDING_CLEAN = 30 * 24 * 3600
+LONGSTANDING_CLEAN_AFTER = 30 * 24 * 3600  # clean for this long across lookups
+
+# Background cache refresh
+CACHE_REFRESH_INTERVAL = 15 * 60  # seconds between refresh rounds
+CACHE_REFRESH_LOOKAHEAD = 24 * 3600  # refresh entries expiring within this window
+CACHE_REFRESH_QUOTA_RESERVE = 0.2  # share of the daily quota left untouched for scans
 
 # Create AppData directory
 os.makedirs(APPDATA_DIR, exist_ok=True)
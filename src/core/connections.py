@@ -0,0 +1,153 @@
+"""
+Compact table of the connections found by a network scan
+"""
+from array import array
+from typing import Dict, Iterator, List, NamedTuple
+
+# Row that ends the chain of an IP's connections
+_END = -1
+
+
+class Connection(NamedTuple):
+    """One connection to a remote IP"""
+    process_name: str
+    pid: int  # 0 if unknown
+    local_port: int  # 0 if unknown
+    remote_port: int  # 0 if unknown
+    protocol: str
+
+
+class ConnectionTable:
+    """
+    Every connection of a scan, grouped by remote IP
+
+    Rows are stored column by column in typed arrays, with process names,
+    protocols and IPs interned, so a connection costs about 20 bytes instead
+    of a tuple of Python objects; 100k sockets fit in about 2 MB. The rows
+    of one IP are chained through a "next row" column, which keeps appends
+    O(1) and needs no list per IP. Connection tuples are only built when an
+    IP's connections are asked for.
+    """
+
+    def __init__(self):
+        # Interned values and their codes
+        self._ips: List[str] = []
+        self._ip_codes: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._name_codes: Dict[str, int] = {}
+        self._protocols: List[str] = []
+        self._protocol_codes: Dict[str, int] = {}
+        # Per IP: first and last row, number of rows
+        self._head = array("i")
+        self._tail = array("i")
+        self._counts = array("I")
+        # Per row
+        self._name = array("I")
+        self._pid = array("I")
+        self._local_port = array("H")
+        self._remote_port = array("H")
+        self._protocol = array("B")
+        self._next = array("i")
+
+    def add(
+        self,
+        ip: str,
+        process_name: str = "Unknown",
+        pid: int = 0,
+        local_port: int = 0,
+        remote_port: int = 0,
+        protocol: str = "tcp"
+    ) -> None:
+        """Record one connection to ip"""
+        # Called once per socket, so the interning is inlined
+        row = len(self._next)
+        name = self._name_codes.get(process_name)
+        if name is None:
+            name = self._name_codes[process_name] = len(self._names)
+            self._names.append(process_name)
+        protocol_code = self._protocol_codes.get(protocol)
+        if protocol_code is None:
+            protocol_code = self._protocol_codes[protocol] = len(self._protocols)
+            self._protocols.append(protocol)
+        self._name.append(name)
+        self._pid.append(pid)
+        self._local_port.append(local_port)
+        self._remote_port.append(remote_port)
+        self._protocol.append(protocol_code)
+        self._next.append(_END)
+
+        code = self._ip_codes.get(ip)
+        if code is None:
+            self._ip_codes[ip] = len(self._ips)
+            self._ips.append(ip)
+            self._head.append(row)
+            self._tail.append(row)
+            self._counts.append(1)
+        else:
+            self._next[self._tail[code]] = row
+            self._tail[code] = row
+            self._counts[code] += 1
+
+    def __len__(self) -> int:
+        """Number of connections"""
+        return len(self._next)
+
+    def __contains__(self, ip) -> bool:
+        return ip in self._ip_codes
+
+    def __iter__(self) -> Iterator[str]:
+        """Remote IPs in discovery order"""
+        return iter(self._ips)
+
+    @property
+    def ip_count(self) -> int:
+        """Number of distinct remote IPs"""
+        return len(self._ips)
+
+    def _rows(self, ip: str) -> Iterator[int]:
+        code = self._ip_codes.get(ip)
+        row = self._head[code] if code is not None else _END
+        next_row = self._next
+        while row != _END:
+            yield row
+            row = next_row[row]
+
+    def connections(self, ip: str) -> List[Connection]:
+        """Every connection to an IP, in discovery order"""
+        return [
+            Connection(
+                self._names[self._name[row]], self._pid[row], self._local_port[row],
+                self._remote_port[row], self._protocols[self._protocol[row]]
+            )
+            for row in self._rows(ip)
+        ]
+
+    def count(self, ip: str) -> int:
+        """Number of connections to an IP"""
+        code = self._ip_codes.get(ip)
+        return self._counts[code] if code is not None else 0
+
+    def remote_ports(self, ip: str) -> List[int]:
+        """Remote port of every connection to an IP"""
+        return [self._remote_port[row] for row in self._rows(ip)]
+
+    def processes(self, ip: str) -> Dict[str, int]:
+        """Number of connections to an IP by process name, the most connected first"""
+        counts: Dict[str, int] = {}
+        for row in self._rows(ip):
+            name = self._names[self._name[row]]
+            counts[name] = counts.get(name, 0) + 1
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def process_names(self, ip: str) -> List[str]:
+        """Names of the processes connected to an IP, the most connected first, ["Unknown"] if there are none"""
+        names = [name for name in self.processes(ip) if name != "Unknown"]
+        return names or ["Unknown"]
+
+    def process_name(self, ip: str) -> str:
+        """Name of the process with the most connections to an IP, "Unknown" if there is none"""
+        return self.process_names(ip)[0]
+
+    def to_process_map(self) -> Dict[str, str]:
+        """Dictionary mapping each remote IP to its primary process, in discovery order"""
+        return {ip: self.process_name(ip) for ip in self._ips}
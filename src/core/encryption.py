@@ -1,9 +1,11 @@
 """
 API key encryption and decryption utilities
 """
+import json
 import os
+from typing import List
 from cryptography.fernet import Fernet
-from .config import FERNET_KEY_FILE, API_KEY_FILE
+from .config import FERNET_KEY_FILE, API_KEY_FILE, API_KEY_RING_FILE
 
 
 class EncryptionManager:
@@ -36,12 +38,23 @@ class EncryptionManager:
         encrypted_key = self.encrypt_api_key(api_key)
         with open(API_KEY_FILE, "wb") as f:
             f.write(encrypted_key)
+        
+        # Keep the primary key first in the key ring
+        if os.path.exists(API_KEY_RING_FILE):
+            keys = [k for k in self.load_api_keys() if k != api_key]
+            self.save_api_keys([api_key] + keys)
     
     def load_api_key(self) -> str:
         """Load and decrypt API key from file"""
         if not self.is_api_key_defined():
             raise FileNotFoundError("API key file not found")
         
+        if not os.path.exists(API_KEY_FILE):
+            keys = self.load_api_keys()
+            if not keys:
+                raise FileNotFoundError("Key ring is empty")
+            return keys[0]
+        
         with open(API_KEY_FILE, "rb") as f:
             encrypted_key = f.read()
         
@@ -49,4 +62,29 @@ class EncryptionManager:
     
     def is_api_key_defined(self) -> bool:
         """Check if API key file exists"""
-        return os.path.exists(API_KEY_FILE)
+        return os.path.exists(API_KEY_FILE) or os.path.exists(API_KEY_RING_FILE)
+    
+    def save_api_keys(self, api_keys: List[str]) -> None:
+        """Save the encrypted key ring to file"""
+        encrypted_ring = self.fernet.encrypt(json.dumps(api_keys).encode())
+        with open(API_KEY_RING_FILE, "wb") as f:
+            f.write(encrypted_ring)
+    
+    def load_api_keys(self) -> List[str]:
+        """Load and decrypt all API keys, falling back to the single saved key"""
+        if os.path.exists(API_KEY_RING_FILE):
+            with open(API_KEY_RING_FILE, "rb") as f:
+                return json.loads(self.fernet.decrypt(f.read()).decode())
+        if os.path.exists(API_KEY_FILE):
+            return [self.load_api_key()]
+        return []
+    
+    def add_api_key(self, api_key: str) -> None:
+        """Add an API key to the key ring"""
+        keys = self.load_api_keys()
+        if api_key not in keys:
+            self.save_api_keys(keys + [api_key])
+    
+    def remove_api_key(self, api_key: str) -> None:
+        """Remove an API key from the key ring"""
+        self.save_api_keys([k for k in self.load_api_keys() if k != api_key])
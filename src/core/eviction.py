@@ -0,0 +1,132 @@
+"""
+Eviction policies for the bounded IP cache
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+
+EVICTION_LRU = "lru"
+EVICTION_LFU = "lfu"
+
+
+class EvictionPolicy:
+    """Tracks key usage and names the next key to evict, all in O(1)"""
+
+    def add(self, key: str) -> None:
+        """Start tracking a newly inserted key"""
+        raise NotImplementedError
+
+    def touch(self, key: str) -> None:
+        """Record a read or update of a tracked key"""
+        raise NotImplementedError
+
+    def remove(self, key: str) -> None:
+        """Stop tracking a key"""
+        raise NotImplementedError
+
+    def victim(self) -> Optional[str]:
+        """Key to evict next, or None if nothing is tracked"""
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """Evicts the least recently used key"""
+
+    def __init__(self):
+        self._order: "OrderedDict[str, None]" = OrderedDict()
+
+    def add(self, key: str) -> None:
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def touch(self, key: str) -> None:
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def remove(self, key: str) -> None:
+        self._order.pop(key, None)
+
+    def victim(self) -> Optional[str]:
+        return next(iter(self._order), None)
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Evicts the least frequently used key, the least recently used among equals
+
+    Keys are kept in one insertion-ordered bucket per use count, and the
+    counts that have a bucket are chained in increasing order, so the lowest
+    one is always at hand and every operation is constant time, removals
+    included.
+    """
+
+    # Sentinel of the chain of counts; its successor is the lowest count
+    _HEAD = 0
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._next: Dict[int, int] = {self._HEAD: self._HEAD}
+        self._prev: Dict[int, int] = {self._HEAD: self._HEAD}
+
+    def _unlink(self, key: str) -> int:
+        count = self._counts.pop(key)
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            prev, following = self._prev.pop(count), self._next.pop(count)
+            self._next[prev] = following
+            self._prev[following] = prev
+        return count
+
+    def _link(self, key: str, count: int, prev: int) -> None:
+        """Put key in the bucket of count, which follows prev in the chain if it has to be created"""
+        self._counts[key] = count
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = self._buckets[count] = OrderedDict()
+            following = self._next[prev]
+            self._next[prev] = count
+            self._prev[count] = prev
+            self._next[count] = following
+            self._prev[following] = count
+        bucket[key] = None
+
+    def add(self, key: str) -> None:
+        if key in self._counts:
+            self.touch(key)
+        else:
+            self._link(key, 1, self._HEAD)
+
+    def touch(self, key: str) -> None:
+        count = self._counts.get(key)
+        if count is None:
+            return
+        # The next count goes right after this one, or in its place if the key was alone in it
+        prev = count if len(self._buckets[count]) > 1 else self._prev[count]
+        self._unlink(key)
+        self._link(key, count + 1, prev)
+
+    def remove(self, key: str) -> None:
+        if key in self._counts:
+            self._unlink(key)
+
+    def victim(self) -> Optional[str]:
+        if not self._counts:
+            return None
+        return next(iter(self._buckets[self._next[self._HEAD]]))
+
+
+def create_eviction_policy(name: str) -> EvictionPolicy:
+    """
+    Create an eviction policy by name
+
+    Args:
+        name: "lru" or "lfu"
+
+    Returns:
+        Eviction policy instance
+    """
+    if name == EVICTION_LFU:
+        return LFUPolicy()
+    return LRUPolicy()
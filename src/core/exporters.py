@@ -0,0 +1,408 @@
+"""
+Streaming export of scan results to CSV and JSON Lines files
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from .analysis_results import AnalysisResults
+from .columnar import (
+    COLUMNAR_FORMATS, ColumnarWriter, columnar_available, detect_columnar_format, export_columnar,
+    log_columnar_export
+)
+from .config import DEFAULT_FIELDS, EXPORT_BUFFER_ROWS, EXPORT_FLUSH_INTERVAL, EXPORT_ROTATE_BYTES
+
+# Export formats
+EXPORT_CSV = "csv"
+EXPORT_JSONL = "jsonl"
+EXPORT_FORMATS = [EXPORT_CSV, EXPORT_JSONL]
+
+
+def detect_format(path: str) -> Tuple[str, bool]:
+    """
+    Export format and compression implied by a file name
+
+    Returns:
+        Tuple of (format, gzip-compressed), e.g. ("jsonl", True) for scan.jsonl.gz
+    """
+    name = path.lower()
+    compressed = name.endswith(".gz")
+    if compressed:
+        name = name[:-3]
+    fmt = EXPORT_JSONL if name.endswith((".jsonl", ".ndjson")) else EXPORT_CSV
+    return fmt, compressed
+
+
+def _split_extension(path: str) -> Tuple[str, str]:
+    """Split scan.csv.gz into ("scan", ".csv.gz")"""
+    suffix = ""
+    if path.lower().endswith(".gz"):
+        path, suffix = path[:-3], path[-3:]
+    base, ext = os.path.splitext(path)
+    return base, ext + suffix
+
+
+def _json_default(value):
+    """json.dumps hook writing analysis results as a readable engine → verdict object"""
+    if isinstance(value, AnalysisResults):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultExporter:
+    """
+    Writes results to a file as they come in
+
+    Formatted rows are buffered and written out every buffer_rows rows, or
+    once flush_interval seconds have passed so a slow scan still shows up in
+    the file; memory use does not grow with the number of rows. With rotate_bytes, a
+    new part is started once the current one has reached that size on disk
+    (compressed size for gzip); parts are named scan.000.csv, scan.001.csv,
+    ... and may exceed the limit by one buffer of rows. The file is created
+    with the first row, or on close() if there was none, so an export
+    without results still leaves a CSV with its header row.
+
+    Use as a context manager, or call close() to write out the last rows.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fields: Optional[Sequence[str]] = None,
+        compress: bool = False,
+        rotate_bytes: int = EXPORT_ROTATE_BYTES,
+        buffer_rows: int = EXPORT_BUFFER_ROWS,
+        flush_interval: float = EXPORT_FLUSH_INTERVAL
+    ):
+        self.path = path
+        self.fields = list(fields) if fields else None
+        self.compress = compress
+        self.rotate_bytes = rotate_bytes
+        self.buffer_rows = max(1, buffer_rows)
+        self.flush_interval = flush_interval
+        self._flushed_at = time.monotonic()
+        self.rows_written = 0
+        self.files: List[str] = []
+        self._buffer: List[str] = []
+        self._raw = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _header(self) -> str:
+        """Text written at the start of every part"""
+        return ""
+
+    def _format(self, entry: Dict) -> str:
+        """One result as a line of text"""
+        raise NotImplementedError
+
+    def _part_path(self, index: int) -> str:
+        if not self.rotate_bytes:
+            return self.path
+        base, ext = _split_extension(self.path)
+        return f"{base}.{index:03d}{ext}"
+
+    def _open_part(self) -> None:
+        path = self._part_path(len(self.files))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._raw = open(path, "wb")
+        stream = gzip.GzipFile(fileobj=self._raw, mode="wb") if self.compress else self._raw
+        self._file = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        self.files.append(path)
+        self._file.write(self._header())
+
+    def _close_part(self) -> None:
+        if self._file is None:
+            return
+        # Closes the gzip stream too; GzipFile leaves the file it wraps open
+        self._file.close()
+        self._raw.close()
+        self._file = None
+        self._raw = None
+
+    def write(self, entry: Dict) -> None:
+        """Add one result"""
+        self._buffer.append(self._format(entry))
+        self.rows_written += 1
+        if len(self._buffer) >= self.buffer_rows or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def write_many(self, entries: Iterable[Dict]) -> int:
+        """
+        Add results, consuming an iterable lazily
+
+        Returns:
+            Number of results written
+        """
+        count = 0
+        for entry in entries:
+            self.write(entry)
+            count += 1
+        return count
+
+    def flush(self) -> None:
+        """Write buffered rows to disk"""
+        self._flushed_at = time.monotonic()
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._open_part()
+        elif self.rotate_bytes and self._raw.tell() >= self.rotate_bytes:
+            self._close_part()
+            self._open_part()
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        self._buffer = []
+
+    def close(self) -> None:
+        """Write the remaining rows and close the current part"""
+        try:
+            self.flush()
+            if not self.files:
+                self._open_part()
+        finally:
+            self._close_part()
+
+
+class CsvExporter(ResultExporter):
+    """CSV with one column per field; every part starts with the header row"""
+
+    def __init__(self, path: str, fields: Optional[Sequence[str]] = None, **kwargs):
+        super().__init__(path, fields or DEFAULT_FIELDS, **kwargs)
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line)
+
+    def _row(self, values: List) -> str:
+        self._line.seek(0)
+        self._line.truncate()
+        self._writer.writerow(values)
+        return self._line.getvalue()
+
+    def _header(self) -> str:
+        return self._row(self.fields)
+
+    def _format(self, entry: Dict) -> str:
+        return self._row([entry.get(field, "") for field in self.fields])
+
+
+class JsonlExporter(ResultExporter):
+    """One JSON object per line, holding the selected fields or the whole entry"""
+
+    def _format(self, entry: Dict) -> str:
+        if self.fields:
+            entry = {field: entry[field] for field in self.fields if field in entry}
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=_json_default) + "\n"
+
+
+def create_exporter(
+    path: str,
+    fields: Optional[Sequence[str]] = None,
+    fmt: Optional[str] = None,
+    compress: Optional[bool] = None,
+    rotate_bytes: int = EXPORT_ROTATE_BYTES,
+    buffer_rows: int = EXPORT_BUFFER_ROWS,
+    flush_interval: float = EXPORT_FLUSH_INTERVAL
+) -> ResultExporter:
+    """
+    Create the exporter for a file
+
+    Args:
+        path: Output file, e.g. scan.csv, scan.jsonl or scan.csv.gz
+        fields: Fields to export; all fields for JSON Lines if None
+        fmt: "csv" or "jsonl", detected from the file name if None
+        compress: Write gzip, detected from a .gz file name if None
+        rotate_bytes: Start a new part at this size (0 for a single file)
+        buffer_rows: Rows buffered before they are written
+        flush_interval: Seconds after which buffered rows are written anyway
+
+    Returns:
+        Exporter, to be closed when done
+    """
+    detected_fmt, detected_compress = detect_format(path)
+    fmt = fmt or detected_fmt
+    compress = detected_compress if compress is None else compress
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    exporter_class = JsonlExporter if fmt == EXPORT_JSONL else CsvExporter
+    return exporter_class(
+        path, fields, compress=compress, rotate_bytes=rotate_bytes,
+        buffer_rows=buffer_rows, flush_interval=flush_interval
+    )
+
+
+def export_results(
+    results: Iterable[Dict],
+    fields: Optional[Sequence[str]],
+    path: str,
+    log_callback: Callable[[str], None],
+    fmt: Optional[str] = None,
+    rotate_bytes: int = EXPORT_ROTATE_BYTES,
+    partitioned: bool = False,
+    scan_date: Optional[date] = None
+) -> bool:
+    """
+    Write results to a file, logging the outcome instead of raising
+
+    Parquet and Arrow files (.parquet, .arrow) are written by the columnar
+    exporter, which needs pyarrow; rotation does not apply to them.
+
+    Args:
+        results: Results to write, consumed lazily
+        fields: Fields to export; all fields for JSON Lines if None
+        path: Output file; the format and compression follow its name
+        log_callback: Function to call for logging
+        fmt: "csv", "jsonl", "parquet" or "arrow" to override the format implied by the name
+        rotate_bytes: Start a new part at this size (0 for a single file)
+        partitioned: Write a Parquet/Arrow dataset directory partitioned by scan date
+        scan_date: Partition to write into (default: today, UTC)
+
+    Returns:
+        True if the file was written, even without results; False otherwise
+    """
+    columnar_fmt = fmt if fmt in COLUMNAR_FORMATS else None if fmt else detect_columnar_format(path)
+    if partitioned and not columnar_fmt:
+        log_callback("❌ Partitioned export needs a .parquet or .arrow path")
+        return False
+    if columnar_fmt:
+        return export_columnar(results, path, log_callback, columnar_fmt, fields, partitioned, scan_date)
+
+    try:
+        exporter = create_exporter(path, fields, fmt, rotate_bytes=rotate_bytes)
+        fmt = EXPORT_JSONL if isinstance(exporter, JsonlExporter) else EXPORT_CSV
+        with exporter:
+            exporter.write_many(results)
+        return _log_exported(exporter, log_callback)
+
+    except Exception as e:
+        log_callback(f"❌ Failed to export {(fmt or 'results').upper()}: {str(e)}")
+        return False
+
+
+def _log_exported(exporter: ResultExporter, log_callback: Callable[[str], None]) -> bool:
+    """Report the files a closed exporter wrote, False if it wrote none"""
+    if not exporter.files:
+        return False
+    fmt = EXPORT_JSONL if isinstance(exporter, JsonlExporter) else EXPORT_CSV
+    if not exporter.rows_written:
+        log_callback(f"📄 No results to export, {fmt.upper()} written without rows to: {exporter.path}")
+    elif len(exporter.files) > 1:
+        log_callback(
+            f"📄 {fmt.upper()} exported to: {exporter.files[0]} ... {exporter.files[-1]} "
+            f"({exporter.rows_written} rows in {len(exporter.files)} files)"
+        )
+    else:
+        log_callback(f"📄 {fmt.upper()} exported to: {exporter.path}")
+    return True
+
+
+class ResultSink:
+    """
+    Export of a running scan, fed one result at a time
+
+    write() never raises: an export error, e.g. an unwritable output path,
+    is logged once and the file is given up, while the scan feeding the
+    sink goes on and its results still reach the cache. Parquet and Arrow
+    results are written a record batch at a time, into the partition of
+    scan_date when partitioned (by default the day the sink is created).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fields: Optional[Sequence[str]],
+        log_callback: Callable[[str], None],
+        fmt: Optional[str] = None,
+        rotate_bytes: int = EXPORT_ROTATE_BYTES,
+        partitioned: bool = False,
+        buffer_rows: int = EXPORT_BUFFER_ROWS,
+        scan_date: Optional[date] = None
+    ):
+        self.path = path
+        self.fields = fields
+        self.log_callback = log_callback
+        self.partitioned = partitioned
+        self.failed = False
+        self.rows = 0
+        self._columnar_fmt = fmt if fmt in COLUMNAR_FORMATS else None if fmt else detect_columnar_format(path)
+        self._fmt = self._columnar_fmt or fmt or detect_format(path)[0]
+        self._columnar: Optional[ColumnarWriter] = None
+        self._exporter: Optional[ResultExporter] = None
+        if partitioned and not self._columnar_fmt:
+            self.failed = True
+            log_callback("❌ Partitioned export needs a .parquet or .arrow path")
+        elif self._columnar_fmt and not columnar_available():
+            self.failed = True
+            log_callback("❌ Parquet/Arrow export needs pyarrow: pip install pyarrow")
+        elif self._columnar_fmt:
+            try:
+                self._columnar = ColumnarWriter(path, self._columnar_fmt, fields, partitioned, scan_date)
+            except Exception as e:
+                self._fail(e)
+        else:
+            try:
+                self._exporter = create_exporter(path, fields, fmt, rotate_bytes=rotate_bytes, buffer_rows=buffer_rows)
+            except Exception as e:
+                self._fail(e)
+
+    def _fail(self, error: Exception) -> None:
+        self.failed = True
+        self.log_callback(
+            f"❌ Failed to export {self._fmt.upper()}: {str(error)}; the scan goes on and its results are cached"
+        )
+        if self._exporter is not None:
+            try:
+                self._exporter._close_part()
+            except Exception:
+                pass
+            self._exporter = None
+        if self._columnar is not None:
+            self._columnar.abort()
+            self._columnar = None
+
+    def write(self, entry: Dict) -> None:
+        """Add one result, unless the export has failed"""
+        if self.failed:
+            return
+        try:
+            (self._columnar or self._exporter).write(entry)
+        except Exception as e:
+            self._fail(e)
+            return
+        self.rows += 1
+
+    def close(self) -> bool:
+        """
+        Write out what is left
+
+        Returns:
+            True if every result was exported, even if there were none;
+            False if the export failed
+        """
+        if self.failed:
+            return False
+        try:
+            (self._columnar or self._exporter).close()
+        except Exception as e:
+            self._fail(e)
+            return False
+        if self._columnar is not None:
+            log_columnar_export(self._columnar, self.log_callback)
+            return True
+        return _log_exported(self._exporter, self.log_callback)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,90 @@
+"""
+Crash-safe file writing helpers
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:  # pragma: no cover - POSIX
+    msvcrt = None
+
+
+def atomic_write(path: str, text: str) -> None:
+    """
+    Replace a file's content so readers see either the old or the new version
+
+    The text goes to a temporary file next to the target, is flushed to disk
+    and then renamed over the target; a crash never leaves a truncated file.
+
+    Args:
+        path: File to write
+        text: New content
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    # A unique temporary file per call: threads and processes may write the same target
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive lock on a file against other processes (and threads)
+
+    The lock is taken on a companion file, path + ".lock", so the file
+    itself can still be replaced with atomic_write() while it is held. If
+    the lock file cannot be created, e.g. in a read-only directory where
+    writing the file would fail anyway, the block runs unlocked.
+
+    Args:
+        path: File to lock
+    """
+    try:
+        lock_file = open(f"{path}.lock", "a+b")
+    except OSError:
+        yield
+        return
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            lock_file.seek(0)
+            while True:
+                try:
+                    # Retries for about 10 seconds before giving up with OSError
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        yield
+    finally:
+        if fcntl is None and msvcrt is not None:
+            lock_file.seek(0)
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+        # Closing the file releases an flock
+        lock_file.close()
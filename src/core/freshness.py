@@ -0,0 +1,117 @@
+"""
+Expiry policy for cached IP scan results
+"""
+import time
+from typing import Dict, Optional
+from .config import (
+    CACHE_TTL_MALICIOUS, CACHE_TTL_SUSPICIOUS, CACHE_TTL_CLEAN,
+    CACHE_TTL_LONGSTANDING_CLEAN, LONGSTANDING_CLEAN_AFTER, CACHE_TTL_UNANALYZED
+)
+
+# Epoch timestamps stored in every cache entry
+FETCHED_AT = "Fetched At"
+EXPIRES_AT = "Expires At"
+CLEAN_SINCE = "Clean Since"
+
+
+def get_verdict(entry: Dict) -> str:
+    """
+    Classify an entry the same way the scan summary does
+
+    Returns:
+        "malicious", "suspicious", "clean" or "unanalyzed"
+    """
+    malicious = entry.get("Engines Malicious", 0)
+    suspicious = entry.get("Engines Suspicious", 0)
+    if isinstance(malicious, int) and malicious > 0:
+        return "malicious"
+    if isinstance(suspicious, int) and suspicious > 0:
+        return "suspicious"
+    if entry.get("Last Analysis Date", "N/A") == "N/A":
+        return "unanalyzed"
+    return "clean"
+
+
+def get_ttl(entry: Dict, now: float) -> float:
+    """
+    Seconds an entry stays fresh, depending on its verdict
+
+    Malicious IPs are rechecked often; IPs that have stayed clean over
+    several lookups are trusted for longer.
+    """
+    verdict = get_verdict(entry)
+    if verdict == "malicious":
+        return CACHE_TTL_MALICIOUS
+    if verdict == "suspicious":
+        return CACHE_TTL_SUSPICIOUS
+    if verdict == "unanalyzed":
+        return CACHE_TTL_UNANALYZED
+    clean_since = entry.get(CLEAN_SINCE, now)
+    if now - clean_since >= LONGSTANDING_CLEAN_AFTER:
+        return CACHE_TTL_LONGSTANDING_CLEAN
+    return CACHE_TTL_CLEAN
+
+
+def stamp_entry(entry: Dict, previous: Optional[Dict] = None, now: Optional[float] = None) -> Dict:
+    """
+    Record when an entry was fetched and when it expires
+
+    The expiry is computed once here, so checking it on lookup is a single
+    comparison.
+
+    Args:
+        entry: Freshly fetched entry, updated in place
+        previous: Entry it replaces, used to carry over how long the IP has been clean
+        now: Fetch time, defaults to the current time
+
+    Returns:
+        The stamped entry
+    """
+    now = time.time() if now is None else now
+    entry[FETCHED_AT] = int(now)
+
+    if get_verdict(entry) == "clean":
+        was_clean = previous is not None and get_verdict(previous) == "clean"
+        entry[CLEAN_SINCE] = previous.get(CLEAN_SINCE, int(now)) if was_clean else int(now)
+    else:
+        entry.pop(CLEAN_SINCE, None)
+
+    entry[EXPIRES_AT] = int(now + get_ttl(entry, now))
+    return entry
+
+
+def is_fresh(entry: Optional[Dict], now: Optional[float] = None) -> bool:
+    """Check whether a cached entry can be used without asking VirusTotal again"""
+    if entry is None:
+        return False
+    now = time.time() if now is None else now
+    return get_expires_at(entry) > now
+
+
+def get_expires_at(entry: Dict) -> float:
+    """
+    When an entry expires
+
+    Entries cached before expiry times were recorded get the TTL of their
+    verdict, counted from when they were fetched (see get_fetched_at).
+    """
+    expires_at = entry.get(EXPIRES_AT)
+    if expires_at is not None:
+        return expires_at
+    fetched_at = get_fetched_at(entry)
+    return fetched_at + get_ttl(entry, fetched_at) if fetched_at else 0
+
+
+def get_fetched_at(entry: Dict) -> float:
+    """
+    When an entry was fetched, for ordering entries by age
+
+    Falls back to the "Last Analysis Date" (dd/mm/yyyy) of entries cached
+    before fetch times were recorded.
+    """
+    if FETCHED_AT in entry:
+        return entry[FETCHED_AT]
+    try:
+        return time.mktime(time.strptime(entry.get("Last Analysis Date", ""), "%d/%m/%Y"))
+    except (ValueError, OverflowError):
+        return 0
@@ -0,0 +1,337 @@
+"""
+Multi-key client pool that spreads VirusTotal requests across several API keys
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from .api_client import VirusTotalClient
+from .backoff import get_backoff_controller
+from .cancellation import CancelToken
+from .file_utils import atomic_write
+from .config import (
+    VIRUSTOTAL_BASE_URL, DEFAULT_POOL_SIZE, KEY_USAGE_FILE,
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_DAY, DEFAULT_REQUESTS_PER_MONTH
+)
+from .rate_limiter import get_rate_limiter
+from .single_flight import lookup_flight
+
+# Persist usage counters after this many requests
+USAGE_SAVE_INTERVAL = 10
+
+
+def mask_key(api_key: str) -> str:
+    """Short, log-safe label for an API key"""
+    return f"...{api_key[-4:]}"
+
+
+class KeyUsage:
+    """Per-key request counters for the current UTC day and month, kept across runs"""
+
+    def __init__(self, usage_file: str = KEY_USAGE_FILE):
+        self.usage_file = usage_file
+        self._lock = threading.Lock()
+        # One save at a time, so an older snapshot never replaces a newer one
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self._usage = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Load counters from file"""
+        if not os.path.exists(self.usage_file):
+            return {}
+        try:
+            with open(self.usage_file, "r", encoding="utf-8") as f:
+                usage = json.load(f)
+                return usage if isinstance(usage, dict) else {}
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Failed to load key usage file: {e}")
+            return {}
+
+    def save(self) -> None:
+        """Save counters to file"""
+        with self._save_lock:
+            with self._lock:
+                usage = json.dumps(self._usage)
+                self._unsaved = 0
+            try:
+                atomic_write(self.usage_file, usage)
+            except IOError as e:
+                print(f"Warning: Failed to save key usage file: {e}")
+
+    @staticmethod
+    def _fingerprint(api_key: str) -> str:
+        """Identify a key without storing it in plain text"""
+        return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+    def _entry(self, api_key: str) -> Dict:
+        """Counters for a key, reset when the UTC day or month rolls over"""
+        now = datetime.now(timezone.utc)
+        day, month = now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+        entry = self._usage.setdefault(self._fingerprint(api_key), {})
+        if entry.get("month") != month:
+            entry.update(month=month, month_count=0)
+        if entry.get("day") != day:
+            entry.update(day=day, day_count=0)
+        return entry
+
+    def record(self, api_key: str) -> None:
+        """Count one request sent with this key"""
+        with self._lock:
+            entry = self._entry(api_key)
+            entry["day_count"] += 1
+            entry["month_count"] += 1
+            self._unsaved += 1
+            save_now = self._unsaved >= USAGE_SAVE_INTERVAL
+        if save_now:
+            self.save()
+
+    def requests_today(self, api_key: str) -> int:
+        """Requests sent with this key since UTC midnight"""
+        with self._lock:
+            return self._entry(api_key)["day_count"]
+
+    def requests_this_month(self, api_key: str) -> int:
+        """Requests sent with this key this UTC month"""
+        with self._lock:
+            return self._entry(api_key)["month_count"]
+
+
+class ClientPool:
+    """
+    Spreads lookups across several API keys
+
+    Every key gets its own VirusTotalClient, rate limiter, backoff controller
+    and usage counters, so aggregate throughput grows with the number of keys.
+    Each lookup goes to the key that can send soonest. A key that VirusTotal
+    rejects is parked for the rest of the run; a key that has used up its
+    daily or monthly quota is parked until the quota resets.
+    """
+
+    def __init__(
+        self,
+        api_keys: Sequence[str],
+        pool_size: int = DEFAULT_POOL_SIZE,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        requests_per_day: int = DEFAULT_REQUESTS_PER_DAY,
+        requests_per_month: int = DEFAULT_REQUESTS_PER_MONTH,
+        base_url: str = VIRUSTOTAL_BASE_URL,
+        usage: Optional[KeyUsage] = None,
+        cancel_token: Optional[CancelToken] = None
+    ):
+        if not api_keys:
+            raise ValueError("At least one API key is required")
+        self.base_url = base_url
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_day = requests_per_day
+        self.requests_per_month = requests_per_month
+        self.usage = usage or KeyUsage()
+        # Used by lookups that are not given the token of their scan
+        self.cancel_token = cancel_token or CancelToken()
+        self._lock = threading.Lock()
+        self._parked: Dict[str, str] = {}
+        self._exhausted_on: Dict[str, str] = {}
+
+        self.clients = [
+            VirusTotalClient(
+                key,
+                pool_size=pool_size,
+                base_url=base_url,
+                rate_limiter=get_rate_limiter(key, requests_per_minute, requests_per_day, requests_per_month),
+                backoff=get_backoff_controller(key),
+                on_request=self.usage.record,
+                cancel_token=self.cancel_token
+            )
+            for key in dict.fromkeys(api_keys)
+        ]
+
+    @property
+    def api_keys(self) -> List[str]:
+        return [client.api_key for client in self.clients]
+
+    def _is_usable(self, api_key: str) -> bool:
+        """Check whether a key may be used right now (caller holds the lock)"""
+        if api_key in self._parked:
+            return False
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        exhausted_on = self._exhausted_on.get(api_key)
+        if exhausted_on == today:
+            return False
+        elif exhausted_on:
+            # A new UTC day: give the key another chance
+            del self._exhausted_on[api_key]
+        if 0 < self.requests_per_day <= self.usage.requests_today(api_key):
+            return False
+        if 0 < self.requests_per_month <= self.usage.requests_this_month(api_key):
+            return False
+        return True
+
+    def acquire(self, clients: Sequence) -> Tuple[Optional[object], Optional[float]]:
+        """
+        Pick the client whose key can send soonest and reserve a token for it
+
+        Selection and reservation happen under one lock, so concurrent
+        workers are spread across keys instead of queueing on the same one.
+        No token is reserved for a key paused by its backoff controller: the
+        client takes it once the pause is over, instead of holding a token
+        that would only be used after the pause.
+
+        Args:
+            clients: Clients to choose from (sync or async, one per key)
+
+        Returns:
+            Tuple of (client, seconds to wait for the reserved token, None if
+            none was reserved), or (None, 0) if every key is parked
+        """
+        with self._lock:
+            usable = [c for c in clients if self._is_usable(c.api_key)]
+            if not usable:
+                return None, 0.0
+            # Soonest available first; ties go to the least used key
+            client = min(
+                usable,
+                key=lambda c: (
+                    max(c.rate_limiter.time_until_available(), c.backoff.time_until_resume()),
+                    self.usage.requests_today(c.api_key)
+                )
+            )
+            if client.backoff.time_until_resume() > 0:
+                return client, None
+            return client, client.rate_limiter.reserve()
+
+    def settle(self, client, log_callback: Callable[[str], None]) -> bool:
+        """
+        Park the client's key if the last lookup showed it is unusable
+
+        Returns:
+            True if the key was parked and the lookup should go to another key
+        """
+        with self._lock:
+            if client.auth_failed:
+                self._parked[client.api_key] = "rejected by VirusTotal"
+                log_callback(f"🅿️ Parking API key {mask_key(client.api_key)} for this run")
+                return True
+            if client.quota_exceeded:
+                client.quota_exceeded = False
+                self._exhausted_on[client.api_key] = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+                log_callback(f"🅿️ Parking API key {mask_key(client.api_key)} until its quota resets")
+                return True
+            return False
+
+    def query_ip(
+        self,
+        ip: str,
+        log_callback: Callable[[str], None],
+        projection: Optional[FrozenSet[str]] = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        Query VirusTotal for IP information using the best available key
+
+        Concurrent lookups of the same IP, from this pool or any other in the
+        process, share one API call.
+
+        Args:
+            ip: IP address to query
+            log_callback: Function to call for logging messages
+            projection: Result fields to parse (see get_projection), None for all
+            cancel_token: Token of the scan the lookup belongs to (default: self.cancel_token)
+
+        Returns:
+            Tuple of (data_dict, is_cached) where is_cached is always False for API calls
+        """
+        cancel_token = cancel_token or self.cancel_token
+        return lookup_flight.do(
+            (ip, projection), lambda: self._query_ip(ip, log_callback, projection, cancel_token),
+            lambda: cancel_token.cancelled
+        )
+
+    def _query_ip(
+        self,
+        ip: str,
+        log_callback: Callable[[str], None],
+        projection: Optional[FrozenSet[str]] = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> Tuple[Optional[Dict], bool]:
+        """Query VirusTotal, moving on to the next key when one gets parked"""
+        for _ in range(len(self.clients)):
+            client, wait = self.acquire(self.clients)
+            if client is None:
+                break
+            result = client.query_ip(
+                ip, log_callback, reserved_wait=wait, projection=projection, cancel_token=cancel_token
+            )
+            if not self.settle(client, log_callback):
+                return result
+
+        log_callback(f"❌ No usable API key left to query {ip}")
+        return None, False
+
+    def get_spare_requests(self, reserve_fraction: float) -> Optional[int]:
+        """
+        Requests left today beyond a share of the daily quota kept in reserve
+
+        Args:
+            reserve_fraction: Share of each key's daily quota not to touch
+
+        Returns:
+            Spare requests summed over usable keys, or None if there is no daily limit
+        """
+        if self.requests_per_day <= 0:
+            return None
+        budget = int(self.requests_per_day * (1 - reserve_fraction))
+        with self._lock:
+            return sum(
+                max(0, budget - self.usage.requests_today(client.api_key))
+                for client in self.clients
+                if self._is_usable(client.api_key)
+            )
+
+    def is_idle(self) -> bool:
+        """Check whether some usable key could send a request right now without waiting"""
+        with self._lock:
+            return any(
+                self._is_usable(client.api_key)
+                and client.rate_limiter.time_until_available() <= 0
+                and client.backoff.time_until_resume() <= 0
+                for client in self.clients
+            )
+
+    def get_key_stats(self) -> List[Dict]:
+        """
+        Get per-key usage and parking state
+
+        Returns:
+            List with one dictionary per key
+        """
+        with self._lock:
+            return [
+                {
+                    "key": mask_key(client.api_key),
+                    "requests_today": self.usage.requests_today(client.api_key),
+                    "requests_this_month": self.usage.requests_this_month(client.api_key),
+                    "usable": self._is_usable(client.api_key)
+                }
+                for client in self.clients
+            ]
+
+    def get_throttle_stats(self) -> Dict[str, float]:
+        """
+        Get rate-limit counters summed over all keys
+
+        Returns:
+            Dictionary with the number of 429 responses and the total paused time
+        """
+        totals = {"throttle_events": 0, "throttled_seconds": 0.0}
+        for client in self.clients:
+            for name, value in client.backoff.get_stats().items():
+                totals[name] += value
+        return totals
+
+    def close(self) -> None:
+        """Close pooled connections and persist usage counters"""
+        for client in self.clients:
+            client.close()
+        self.usage.save()
@@ -0,0 +1,183 @@
+"""
+Continuous connection monitoring: periodic snapshots diffed against the previous one
+"""
+import time
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Callable, Dict, List, Optional
+from .config import MONITOR_DEBOUNCE, MONITOR_REPORT_TTL
+from .connections import Connection, ConnectionTable
+from .network_scanner import NetworkScanner
+from .proc_net import UNATTRIBUTED, ProcSocket
+
+_inode = attrgetter("inode")
+
+# Memoized external-address checks, bounded for long-running monitors
+_EXTERNAL_CACHE_SIZE = 65536
+
+
+class _PendingPeer:
+    """A new peer waiting for its debounce period to pass"""
+
+    __slots__ = ("process_name", "first_seen", "connections")
+
+    def __init__(self, process_name: str, first_seen: float):
+        self.process_name = process_name
+        self.first_seen = first_seen
+        self.connections: List[Connection] = []
+
+
+class ConnectionMonitor:
+    """
+    Finds remote peers that were not connected in the previous snapshot
+
+    On Linux snapshots are keyed by socket inode: the set difference of two
+    snapshots is computed by the interpreter's set operations, and only the
+    sockets that were opened or closed since are looked at in Python
+    (external check, process attribution, per-peer socket counts), so a
+    short interval stays cheap however many long-lived sockets the host
+    has. Elsewhere the IP → process maps of two scans are diffed instead.
+
+    A peer counts as new when it had no socket in the previous snapshot.
+    New peers are held back until debounce seconds after they first showed
+    up, so a burst of connections is reported as one batch and a peer that
+    reconnects meanwhile is reported once. A reported peer is not reported
+    again within report_ttl seconds.
+    """
+
+    def __init__(
+        self,
+        network_scanner: NetworkScanner,
+        debounce: float = MONITOR_DEBOUNCE,
+        report_ttl: float = MONITOR_REPORT_TTL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.network_scanner = network_scanner
+        self.debounce = debounce
+        self.report_ttl = report_ttl
+        self._clock = clock
+        # Connections of the peers returned by the last poll()
+        self.connections = ConnectionTable()
+        self._snapshots = 0
+        # Previous snapshot: socket inode -> external peer (Linux) or peer -> process
+        self._socket_peers: Dict[int, str] = {}
+        self._sockets: Dict[int, ProcSocket] = {}
+        self._peer_sockets: Dict[str, int] = {}
+        self._peers: Dict[str, str] = {}
+        self._external: Dict[str, bool] = {}
+        self._pending: Dict[str, _PendingPeer] = {}
+        self._reported: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def peer_count(self) -> int:
+        """Number of external peers connected at the last snapshot"""
+        return len(self._peer_sockets) + len(self._peers)
+
+    def poll(self, log_callback: Callable[[str], None]) -> Dict[str, str]:
+        """
+        Take a snapshot and collect the new peers whose debounce period is over
+
+        Args:
+            log_callback: Function to call for logging; only the first
+                snapshot logs its progress, later ones stay quiet
+
+        Returns:
+            Dictionary mapping the peers to look up now to their process names
+        """
+        log = log_callback if not self._snapshots else (lambda _: None)
+        self._snapshots += 1
+        now = self._clock()
+
+        sockets = self.network_scanner.read_sockets(log)
+        if sockets is not None:
+            self._diff_sockets(sockets, now)
+        else:
+            self._diff_peers(self.network_scanner.get_external_ips(log), now)
+        return self._due(now)
+
+    def _is_external(self, ip: str) -> bool:
+        external = self._external.get(ip)
+        if external is None:
+            if len(self._external) >= _EXTERNAL_CACHE_SIZE:
+                self._external.clear()
+            external = self._external[ip] = self.network_scanner._is_external_ip(ip)
+        return external
+
+    def _diff_sockets(self, sockets: List[ProcSocket], now: float) -> None:
+        current = dict(zip(map(_inode, sockets), sockets))
+        previous = self._sockets
+        closed = previous.keys() - current.keys()
+        opened = current.keys() - previous.keys()
+        self._sockets = current
+
+        for inode in closed:
+            ip = self._socket_peers.pop(inode, None)
+            if ip is None:
+                continue
+            remaining = self._peer_sockets[ip] - 1
+            if remaining:
+                self._peer_sockets[ip] = remaining
+            else:
+                del self._peer_sockets[ip]
+
+        opened = [current[inode] for inode in opened if self._is_external(current[inode].remote_ip)]
+        if not opened:
+            return
+        socket_index = self.network_scanner.socket_index
+        owners = socket_index.resolve(sock.inode for sock in opened)
+        for sock in opened:
+            ip = sock.remote_ip
+            inode = sock.inode
+            self._socket_peers[inode] = ip
+            count = self._peer_sockets.get(ip, 0)
+            self._peer_sockets[ip] = count + 1
+            socket_owners = owners.get(inode, UNATTRIBUTED)
+            if not count:
+                self._add_pending(ip, socket_owners[0][1], now)
+            pending = self._pending.get(ip)
+            if pending is not None:
+                pending.connections.extend(
+                    Connection(process_name, pid, sock.local_port, sock.remote_port, sock.protocol)
+                    for pid, process_name in socket_owners
+                )
+
+    def _diff_peers(self, peers: Dict[str, str], now: float) -> None:
+        for ip in peers.keys() - self._peers.keys():
+            self._add_pending(ip, peers[ip], now)
+            pending = self._pending.get(ip)
+            if pending is not None:
+                pending.connections.extend(self.network_scanner.connections.connections(ip))
+        self._peers = peers
+
+    def _add_pending(self, ip: str, process_name: str, now: float) -> None:
+        if ip in self._pending or ip in self._reported:
+            return
+        self._pending[ip] = _PendingPeer(process_name, now)
+
+    def _due(self, now: float) -> Dict[str, str]:
+        # Reported peers expire oldest first
+        while self._reported:
+            ip, reported_at = next(iter(self._reported.items()))
+            if now - reported_at < self.report_ttl:
+                break
+            del self._reported[ip]
+
+        due = {}
+        self.connections = ConnectionTable()
+        if not self._pending:
+            return due
+        for ip, pending in list(self._pending.items()):
+            if now - pending.first_seen >= self.debounce:
+                for connection in pending.connections:
+                    self.connections.add(ip, *connection)
+                # The most connected of the processes seen while the peer was pending
+                due[ip] = self.connections.process_name(ip) if pending.connections else pending.process_name
+                del self._pending[ip]
+                self._reported[ip] = now
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """Clock time at which the oldest pending peer becomes due, None if there is none"""
+        if not self._pending:
+            return None
+        return min(pending.first_seen for pending in self._pending.values()) + self.debounce
@@ -4,14 +4,26 @@ Network scanning utilities for finding external IP connections
 import subprocess
 import ipaddress
 import platform
-from typing import Dict, Callable
+from typing import Dict, Callable, Iterable, List, Optional, Tuple
+from .config import DEFAULT_NETWORK_BACKEND, NETWORK_BACKEND_NETLINK, NETWORK_BACKEND_PROC
+from .connections import ConnectionTable
+from .proc_net import UNATTRIBUTED, ProcSocket, SocketOwnerIndex, read_established
+from .sock_diag import read_established_netlink
 
 
 class NetworkScanner:
     """Scans for external IP connections on the system"""
     
-    def __init__(self):
+    def __init__(self, backend: str = DEFAULT_NETWORK_BACKEND):
         self.system = platform.system()
+        # How connections are collected on Linux, see NETWORK_BACKENDS;
+        # netlink is not retried once it failed
+        self.backend = backend
+        self._netlink_failed = False
+        # Kept across scans so each one only looks at new processes and sockets
+        self.socket_index = SocketOwnerIndex()
+        # Every connection found by the last scan, by IP
+        self.connections = ConnectionTable()
     
     def get_external_ips(self, log_callback: Callable[[str], None]) -> Dict[str, str]:
         """
@@ -21,13 +33,19 @@ class NetworkScanner:
             log_callback: Function to call for logging messages
             
         Returns:
-            Dictionary mapping IP addresses to process names
+            Dictionary mapping IP addresses to the name of the process with
+            the most connections to them. Every connection, with its own
+            process, is left in self.connections
         """
         log_callback("🔍 Fetching all remote IP connections...")
+        self.connections = ConnectionTable()
         
         if self.system == "Windows":
             return self._get_external_ips_windows(log_callback)
         elif self.system in ["Linux", "Darwin"]:  # Darwin is macOS
+            ip_process_map = self._get_external_ips_kernel(log_callback)
+            if ip_process_map is not None:
+                return ip_process_map
             return self._get_external_ips_unix(log_callback)
         else:
             log_callback(f"❌ Unsupported operating system: {self.system}")
@@ -54,6 +72,64 @@ class NetworkScanner:
             log_callback(f"❌ Error running netstat: {str(e)}")
             return {}
     
+    def _get_external_ips_kernel(self, log_callback: Callable[[str], None]) -> Optional[Dict[str, str]]:
+        """Get external IPs on Linux from netlink or /proc/net, None if neither can be read"""
+        sockets = self.read_sockets(log_callback)
+        if sockets is None:
+            return None
+        
+        owners = self.socket_index.resolve(sock.inode for sock in sockets)
+        ip_process_map = self._map_sockets(sockets, owners)
+        log_callback(f"🌐 Found {len(ip_process_map)} external IPs ({len(self.connections)} connections)")
+        return ip_process_map
+    
+    def read_sockets(self, log_callback: Callable[[str], None]) -> Optional[List[ProcSocket]]:
+        """
+        Get every established socket on Linux, from netlink sock_diag or from /proc/net if that fails
+        
+        Args:
+            log_callback: Function to call for logging messages
+            
+        Returns:
+            Established sockets (local ones included), or None on other
+            systems, with the "command" backend or if neither can be read
+        """
+        if self.system != "Linux" or self.backend not in (NETWORK_BACKEND_NETLINK, NETWORK_BACKEND_PROC):
+            return None
+        if self.backend == NETWORK_BACKEND_NETLINK and not self._netlink_failed:
+            try:
+                return read_established_netlink()
+            except OSError as e:
+                self._netlink_failed = True
+                log_callback(f"⚠️ Netlink sock_diag unavailable ({e}), reading /proc/net instead")
+        try:
+            return read_established()
+        except OSError as e:
+            log_callback(f"⚠️ Cannot read /proc/net ({e}), falling back to ss/netstat")
+            return None
+    
+    def _map_sockets(
+        self, sockets: Iterable[ProcSocket], owners: Dict[int, List[Tuple[int, str]]]
+    ) -> Dict[str, str]:
+        """Map the external peers of /proc/net sockets to the processes owning them"""
+        connections = self.connections = ConnectionTable()
+        # Many sockets share a peer; check each address once
+        external: Dict[str, bool] = {}
+        
+        for sock in sockets:
+            raw_ip = sock.remote_ip
+            is_external = external.get(raw_ip)
+            if is_external is None:
+                is_external = external[raw_ip] = self._is_external_ip(raw_ip)
+            if not is_external:
+                continue
+            
+            # A socket inherited by child processes is a connection of each
+            for pid, process_name in owners.get(sock.inode, UNATTRIBUTED):
+                connections.add(raw_ip, process_name, pid, sock.local_port, sock.remote_port, sock.protocol)
+        
+        return connections.to_process_map()
+    
     def _get_external_ips_unix(self, log_callback: Callable[[str], None]) -> Dict[str, str]:
         """Get external IPs on Unix-like systems using netstat or ss"""
         try:
@@ -85,7 +161,9 @@ class NetworkScanner:
     
     def _parse_netstat_output(self, output: str, log_callback: Callable[[str], None]) -> Dict[str, str]:
         """Parse Windows netstat output"""
-        ip_process_map = {}
+        self.connections = ConnectionTable()
+        # tasklist is run once per PID
+        process_names: Dict[str, str] = {}
         
         for line in output.splitlines():
             line = line.strip()
@@ -97,6 +175,7 @@ class NetworkScanner:
                 continue
             
             try:
+                local_addr = parts[1]
                 foreign_addr = parts[2]
                 pid = parts[-1]
                 
@@ -111,18 +190,23 @@ class NetworkScanner:
                     continue
                 
                 # Get process name
-                proc_name = self._get_process_name_windows(pid)
-                ip_process_map[raw_ip] = proc_name
+                proc_name = process_names.get(pid)
+                if proc_name is None:
+                    proc_name = process_names[pid] = self._get_process_name_windows(pid)
+                self._record_connection(
+                    raw_ip, proc_name, int(pid) if pid.isdigit() else 0, local_addr, foreign_addr, parts[0]
+                )
                 
             except (ValueError, IndexError):
                 continue
         
-        log_callback(f"🌐 Found {len(ip_process_map)} external IPs")
+        ip_process_map = self.connections.to_process_map()
+        log_callback(f"🌐 Found {len(ip_process_map)} external IPs ({len(self.connections)} connections)")
         return ip_process_map
     
     def _parse_unix_output(self, output: str, log_callback: Callable[[str], None], is_ss: bool = False) -> Dict[str, str]:
         """Parse Unix netstat/ss output"""
-        ip_process_map = {}
+        self.connections = ConnectionTable()
         
         for line in output.splitlines():
             line = line.strip()
@@ -147,6 +231,7 @@ class NetworkScanner:
                     
                     foreign_addr = parts[4]
                     proc_name = self._extract_process_from_ss(parts[5:]) if len(parts) > 5 else "Unknown"
+                    pid = self._extract_pid_from_ss(parts[5:]) if len(parts) > 5 else 0
                     
                 else:
                     # netstat output format: Proto Recv-Q Send-Q Local_Address Foreign_Address State [PID/Program]
@@ -159,6 +244,7 @@ class NetworkScanner:
                     
                     foreign_addr = parts[4]
                     proc_name = self._extract_process_from_netstat(parts[6:]) if len(parts) > 6 else "Unknown"
+                    pid = self._extract_pid_from_netstat(parts[6:]) if len(parts) > 6 else 0
                 
                 # Extract IP from address:port format
                 if ":" not in foreign_addr:
@@ -176,14 +262,29 @@ class NetworkScanner:
                 if not self._is_external_ip(raw_ip):
                     continue
                 
-                ip_process_map[raw_ip] = proc_name
+                self._record_connection(raw_ip, proc_name, pid, parts[3], foreign_addr, parts[0])
                 
             except (ValueError, IndexError):
                 continue
         
-        log_callback(f"🌐 Found {len(ip_process_map)} external IPs")
+        ip_process_map = self.connections.to_process_map()
+        log_callback(f"🌐 Found {len(ip_process_map)} external IPs ({len(self.connections)} connections)")
         return ip_process_map
     
+    def _record_connection(
+        self, ip: str, proc_name: str, pid: int, local_addr: str, foreign_addr: str, protocol: str
+    ) -> None:
+        """Add a connection parsed from command output; ports that are not numbers are recorded as 0"""
+        local_port = local_addr.rsplit(":", 1)[-1]
+        remote_port = foreign_addr.rsplit(":", 1)[-1]
+        self.connections.add(
+            ip, proc_name, pid,
+            int(local_port) if local_port.isdigit() else 0,
+            int(remote_port) if remote_port.isdigit() else 0,
+            # tcp6/TCP/udp6 as reported by /proc/net and netlink
+            "udp" if protocol.lower().startswith("udp") else "tcp"
+        )
+    
     def _is_external_ip(self, ip_str: str) -> bool:
         """Check if IP is external (not private, loopback, etc.)"""
         try:
@@ -238,6 +339,20 @@ class NetworkScanner:
         except Exception:
             return "Unknown"
     
+    def _extract_pid_from_ss(self, process_parts: list) -> int:
+        """Extract the first PID from ss output, 0 if there is none"""
+        process_info = ' '.join(process_parts)
+        start = process_info.find('pid=')
+        if start < 0:
+            return 0
+        digits = process_info[start + 4:].split(',', 1)[0].rstrip(')')
+        return int(digits) if digits.isdigit() else 0
+    
+    def _extract_pid_from_netstat(self, process_parts: list) -> int:
+        """Extract the PID from netstat output, 0 if there is none"""
+        pid = process_parts[0].split('/', 1)[0] if process_parts else ""
+        return int(pid) if pid.isdigit() else 0
+    
     def _extract_process_from_netstat(self, process_parts: list) -> str:
         """Extract process name from netstat output"""
         if not process_parts:
@@ -0,0 +1,189 @@
+"""
+Risk ranking of candidate IPs so quota is spent on the riskiest connections first
+"""
+import ipaddress
+import math
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from .config import TRUSTED_PROCESSES, COMMON_PORTS
+from .connections import ConnectionTable
+from .freshness import get_verdict
+
+# Score weights
+WEIGHT_UNTRUSTED_PROCESS = 3.0
+WEIGHT_UNUSUAL_PORT = 2.0
+WEIGHT_KNOWN_MALICIOUS = 6.0  # the IP itself was malicious at its last lookup
+WEIGHT_KNOWN_SUSPICIOUS = 3.0
+WEIGHT_MALICIOUS_PREFIX = 4.0  # shares a prefix with an IP cached as malicious
+WEIGHT_MALICIOUS_ASN = 2.0  # its last lookup placed it in an AS hosting malicious IPs
+WEIGHT_CONNECTIONS = 1.0  # per doubling of the number of connections
+WEIGHT_NEW_IP = 1.0  # never looked up before
+
+# Prefix lengths that make two IPs neighbours
+IPV4_PREFIX = 24
+IPV6_PREFIX = 48
+
+
+def get_prefix(ip: str) -> Optional[str]:
+    """
+    Network prefix an IP belongs to, e.g. "203.0.113.0/24"
+
+    Returns:
+        The prefix, or None if ip is not a valid address
+    """
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    length = IPV4_PREFIX if address.version == 4 else IPV6_PREFIX
+    return str(ipaddress.ip_network(f"{address}/{length}", strict=False))
+
+
+class ScanPrioritizer:
+    """
+    Orders candidate IPs by how likely a lookup is to reveal something
+
+    Each IP gets a score from cheap local signals: every process connected
+    to it, the remote ports and number of its connections, whether the IP
+    was malicious or suspicious before, whether it sits in a prefix or AS
+    that already holds malicious cache entries, and whether it has never
+    been looked up. The highest scores are scanned first, so with a tight
+    quota the valuable lookups finish early in the scan.
+    """
+
+    def __init__(
+        self,
+        trusted_processes: Iterable[str] = TRUSTED_PROCESSES,
+        common_ports: Iterable[int] = COMMON_PORTS
+    ):
+        self.trusted_processes = {name.lower() for name in trusted_processes}
+        self.common_ports = set(common_ports)
+        # Number of malicious cache entries per prefix and per ASN
+        self.malicious_prefixes: Counter = Counter()
+        self.malicious_asns: Counter = Counter()
+        # Prefix and ASN each malicious IP was counted under, to take it back when the IP changes
+        self._malicious: Dict[str, Tuple[Optional[str], object]] = {}
+        self._lock = threading.Lock()
+
+    def learn(self, cache: Dict[str, Dict]) -> None:
+        """
+        Collect the prefixes and ASNs of IPs cached as malicious
+
+        Called once with the whole cache; observe() then keeps the counts
+        up to date as lookups complete.
+
+        Args:
+            cache: Cache entries by IP, expired ones included
+        """
+        for ip, entry in cache.items():
+            self.observe(ip, entry)
+
+    def observe(self, ip: str, entry: Dict) -> None:
+        """
+        Account for a new or updated cache entry, e.g. a lookup that just completed
+
+        Safe to call from several worker threads.
+
+        Args:
+            ip: IP address
+            entry: Its cache entry; an IP no longer malicious stops counting
+        """
+        counted = None
+        if get_verdict(entry) == "malicious":
+            asn = entry.get("ASN", "N/A")
+            counted = (get_prefix(ip), asn if asn != "N/A" else None)
+        with self._lock:
+            previous = self._malicious.pop(ip, None)
+            if previous is not None:
+                self._count(previous, -1)
+            if counted is not None:
+                self._malicious[ip] = counted
+                self._count(counted, 1)
+
+    def _count(self, counted: Tuple[Optional[str], object], delta: int) -> None:
+        """Add delta to the counts of a prefix and ASN, dropping counts that reach 0 (caller holds the lock)"""
+        prefix, asn = counted
+        for counter, key in ((self.malicious_prefixes, prefix), (self.malicious_asns, asn)):
+            if key is None:
+                continue
+            counter[key] += delta
+            if counter[key] <= 0:
+                del counter[key]
+
+    def score(
+        self,
+        ip: str,
+        process_name: str,
+        cached: Optional[Dict] = None,
+        ports: Sequence[int] = (),
+        processes: Iterable[str] = ()
+    ) -> float:
+        """
+        Risk score of one IP, higher is scanned sooner
+
+        Args:
+            ip: IP address
+            process_name: Process owning the connection
+            cached: Cache entry of the IP, fresh or expired
+            ports: Remote port of every connection to the IP
+            processes: Every process connected to the IP, when there may be
+                several; process_name is used if empty
+
+        Returns:
+            Score, 0 for trusted processes on common ports with a clean history
+        """
+        score = 0.0
+        # One untrusted process among trusted ones is enough
+        if any(name.lower() not in self.trusted_processes for name in (processes or [process_name])):
+            score += WEIGHT_UNTRUSTED_PROCESS
+        if any(port not in self.common_ports for port in ports):
+            score += WEIGHT_UNUSUAL_PORT
+        if len(ports) > 1:
+            score += WEIGHT_CONNECTIONS * math.log2(len(ports))
+
+        # An IP cached as malicious already scores for that; only other IPs
+        # count towards its prefix and ASN
+        own_prefix, own_asn = self._malicious.get(ip, (None, None))
+        if cached is None:
+            score += WEIGHT_NEW_IP
+        else:
+            verdict = get_verdict(cached)
+            if verdict == "malicious":
+                score += WEIGHT_KNOWN_MALICIOUS
+            elif verdict == "suspicious":
+                score += WEIGHT_KNOWN_SUSPICIOUS
+            asn = cached.get("ASN", "N/A")
+            if self.malicious_asns.get(asn, 0) - (asn == own_asn) > 0:
+                score += WEIGHT_MALICIOUS_ASN
+
+        prefix = get_prefix(ip)
+        if self.malicious_prefixes.get(prefix, 0) - (prefix is not None and prefix == own_prefix) > 0:
+            score += WEIGHT_MALICIOUS_PREFIX
+        return score
+
+    def rank(
+        self,
+        ip_process_map: Dict[str, str],
+        cache: Dict[str, Dict],
+        connections: Optional[ConnectionTable] = None
+    ) -> Dict[str, str]:
+        """
+        Reorder IPs from the highest score to the lowest
+
+        Args:
+            ip_process_map: Dictionary mapping IP addresses to process names
+            cache: Cache entries of those IPs
+            connections: Connections to those IPs, for their processes and ports
+
+        Returns:
+            The same mapping in scan order; equal scores keep their discovery order
+        """
+        connections = connections if connections is not None else ConnectionTable()
+        scores = {
+            ip: self.score(
+                ip, process_name, cache.get(ip), connections.remote_ports(ip), connections.processes(ip)
+            )
+            for ip, process_name in ip_process_map.items()
+        }
+        return {ip: ip_process_map[ip] for ip in sorted(ip_process_map, key=lambda ip: -scores[ip])}
@@ -0,0 +1,157 @@
+"""
+Sliding-window rate limiting for VirusTotal API requests
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+from .config import (
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_DAY, DEFAULT_REQUESTS_PER_MONTH
+)
+
+SECONDS_PER_MINUTE = 60
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_MONTH = 31 * SECONDS_PER_DAY
+
+
+class SlidingWindow:
+    """
+    Grant times of the last `limit` requests of one quota window
+
+    A request may be sent once the request `limit` grants before it is
+    `period` seconds old, so no span of `period` seconds ever holds more
+    than `limit` requests, however they are spread.
+    """
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        # Grant times, oldest first; they may lie in the future for reserved requests
+        self.grants: Deque[float] = deque(maxlen=limit)
+
+    def available_at(self) -> Optional[float]:
+        """Time from which the next request may be sent, None if the window has room now"""
+        if len(self.grants) < self.limit:
+            return None
+        return self.grants[0] + self.period
+
+
+class RateLimiter:
+    """
+    Shared limiter that every VirusTotal request passes through
+
+    Keeps one sliding window per quota (minute, day, month). A request is
+    granted at the earliest time every window has room for it, and the
+    grant is recorded in all of them. Grants are reserved in arrival order,
+    so concurrent callers are spaced out at exactly the quota ceiling
+    instead of all waking at once, and no rolling minute, day or month
+    exceeds its limit, not even right after start. A limit of 0 disables
+    that window.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        requests_per_day: int = DEFAULT_REQUESTS_PER_DAY,
+        requests_per_month: int = DEFAULT_REQUESTS_PER_MONTH,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_day = requests_per_day
+        self.requests_per_month = requests_per_month
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._windows: List[SlidingWindow] = [
+            SlidingWindow(limit, period)
+            for limit, period in (
+                (requests_per_minute, SECONDS_PER_MINUTE),
+                (requests_per_day, SECONDS_PER_DAY),
+                (requests_per_month, SECONDS_PER_MONTH),
+            )
+            if limit > 0
+        ]
+        # Grants never go back in time, which keeps every window's log in order
+        self._last_grant = float("-inf")
+
+    def _next_grant(self, now: float) -> float:
+        """Earliest time a request may be sent (caller holds the lock)"""
+        grant = max(now, self._last_grant)
+        for window in self._windows:
+            available_at = window.available_at()
+            if available_at is not None and available_at > grant:
+                grant = available_at
+        return grant
+
+    def _record(self, grant: float) -> None:
+        self._last_grant = grant
+        for window in self._windows:
+            window.grants.append(grant)
+
+    def time_until_available(self) -> float:
+        """Seconds until a request could be sent, without reserving anything"""
+        with self._lock:
+            now = self._clock()
+            return self._next_grant(now) - now
+
+    def reserve(self) -> float:
+        """
+        Reserve the next slot for one request
+
+        Returns:
+            Seconds the caller must wait before sending the request
+        """
+        with self._lock:
+            now = self._clock()
+            grant = self._next_grant(now)
+            self._record(grant)
+            return grant - now
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is available right now"""
+        with self._lock:
+            now = self._clock()
+            if self._next_grant(now) > now:
+                return False
+            self._record(now)
+            return True
+
+    def acquire(self) -> float:
+        """
+        Block until a request may be sent
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    api_key: str,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+    requests_per_day: int = DEFAULT_REQUESTS_PER_DAY,
+    requests_per_month: int = DEFAULT_REQUESTS_PER_MONTH
+) -> RateLimiter:
+    """
+    Get the process-wide limiter for an API key
+
+    Every scanner using the same key shares one limiter, so back-to-back or
+    concurrent scans cannot exceed the key's quota together. The limiter is
+    replaced if the quota figures change.
+    """
+    limits = (requests_per_minute, requests_per_day, requests_per_month)
+    with _limiters_lock:
+        limiter: Optional[RateLimiter] = _limiters.get(api_key)
+        if limiter is None or (
+            limiter.requests_per_minute, limiter.requests_per_day, limiter.requests_per_month
+        ) != limits:
+            limiter = RateLimiter(*limits)
+            _limiters[api_key] = limiter
+        return limiter
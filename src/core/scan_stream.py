@@ -0,0 +1,95 @@
+"""
+Progress tracking for scans whose results are consumed as they arrive
+"""
+import time
+from typing import Callable, Dict, Optional
+from .api_client import VERDICT_FIELDS, has_fields
+
+
+class ScanProgress:
+    """
+    Running counters of a scan
+
+    The ETA extrapolates from the lookups that went to VirusTotal so far,
+    since cache hits complete instantly and say nothing about the quota.
+    """
+
+    __slots__ = ("total", "done", "cache_hits", "new", "failed", "started_at", "_clock")
+
+    def __init__(self, total: int, clock: Callable[[], float] = time.monotonic):
+        self.total = total
+        self.done = 0
+        self.cache_hits = 0
+        self.new = 0
+        self.failed = 0
+        self._clock = clock
+        self.started_at = clock()
+
+    def record(self, entry: Dict, is_new: bool) -> None:
+        """Count one finished lookup"""
+        self.done += 1
+        if is_new:
+            self.new += 1
+        elif has_fields(entry, VERDICT_FIELDS):
+            self.cache_hits += 1
+        else:
+            self.failed += 1
+
+    @property
+    def elapsed(self) -> float:
+        return self._clock() - self.started_at
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds until the scan should finish, None until a lookup has gone to VirusTotal"""
+        remaining = self.total - self.done
+        if remaining <= 0:
+            return 0.0
+        looked_up = self.new + self.failed
+        if not looked_up:
+            return None
+        return self.elapsed / looked_up * remaining
+
+    def snapshot(self) -> Dict:
+        """
+        Current counters
+
+        Returns:
+            Dictionary with done, total, cache_hits, new, failed, elapsed and eta
+        """
+        return {
+            "done": self.done,
+            "total": self.total,
+            "cache_hits": self.cache_hits,
+            "new": self.new,
+            "failed": self.failed,
+            "elapsed": round(self.elapsed, 1),
+            "eta": None if self.eta is None else round(self.eta, 1)
+        }
+
+
+def format_progress(progress: Dict) -> str:
+    """One-line summary of a progress snapshot, e.g. for a status label"""
+    eta = "--:--" if progress["eta"] is None else format_duration(progress["eta"])
+    return f"{progress['done']}/{progress['total']} IPs · {progress['cache_hits']} cached · ETA {eta}"
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as m:ss or h:mm:ss"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ScanUpdate:
+    """One result of a streaming scan with the scan's progress at that point"""
+
+    __slots__ = ("entry", "is_new", "progress")
+
+    def __init__(self, entry: Dict, is_new: bool, progress: Dict):
+        self.entry = entry
+        self.is_new = is_new
+        self.progress = progress
+
+    def __repr__(self) -> str:
+        return f"ScanUpdate({self.entry.get('IP')!r}, is_new={self.is_new}, progress={self.progress!r})"
@@ -1,75 +1,224 @@
 """
 Main scanning coordinator that orchestrates IP scanning with VirusTotal
 """
+import asyncio
+import queue
 import threading
 import time
-import csv
-import os
-from typing import Dict, List, Callable
-from .api_client import VirusTotalClient
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Callable, Optional, Sequence, Tuple, Union
+from .api_client import get_projection, has_fields
+from .cancellation import CancelToken
+from .key_pool import ClientPool
+from .monitor import ConnectionMonitor
 from .network_scanner import NetworkScanner
 from .cache_manager import CacheManager
+from .cache_refresher import CacheRefresher
+from .connections import ConnectionTable
+from .checkpoint import ScanCheckpoint, ScanJournal, ScanManifest, find_orphaned_journals, new_journal_file
+from .exporters import EXPORT_CSV, export_results
+from .freshness import is_fresh, stamp_entry
+from .prioritizer import ScanPrioritizer
+from .scan_stream import ScanProgress, ScanUpdate
+from .single_flight import lookup_flight
+from .worker_pool import WorkerPool
+from .async_scanner import AsyncClientPool, scan_ips_async, is_async_engine_available
+from .config import (
+    DEFAULT_POOL_SIZE, DEFAULT_SCAN_ENGINE, SCAN_ENGINE_ASYNCIO,
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_DAY, DEFAULT_REQUESTS_PER_MONTH,
+    EXPORT_ROTATE_BYTES, MONITOR_INTERVAL, MONITOR_DEBOUNCE, SCAN_JOURNAL_DIR, SCAN_MANIFEST_FILE
+)
+
+# Results buffered between a streaming scan and its consumer
+STREAM_BUFFER_SIZE = 256
+STREAM_POLL_INTERVAL = 0.1
+
+# Marks the end of a streaming scan's results
+_END_OF_SCAN = object()
 
 
 class IPScanner:
     """Coordinates IP scanning operations"""
     
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.vt_client = VirusTotalClient(api_key)
+    def __init__(
+        self,
+        api_key: Union[str, Sequence[str]],
+        pool_size: int = DEFAULT_POOL_SIZE,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        requests_per_day: int = DEFAULT_REQUESTS_PER_DAY,
+        requests_per_month: int = DEFAULT_REQUESTS_PER_MONTH
+    ):
+        # One key or a key ring; requests are spread across all keys
+        api_keys = [api_key] if isinstance(api_key, str) else list(api_key)
+        self.api_key = api_keys[0]
+        # Token of the current scan, shared with every wait of it so stopping
+        # takes effect at once; each scan gets a new one (see _new_cancel_token)
+        self._cancel_token = CancelToken()
+        self.vt_client = ClientPool(
+            api_keys,
+            pool_size=pool_size,
+            requests_per_minute=requests_per_minute,
+            requests_per_day=requests_per_day,
+            requests_per_month=requests_per_month,
+            cancel_token=self._cancel_token
+        )
         self.network_scanner = NetworkScanner()
         self.cache_manager = CacheManager()
-        self._stop_scanning = False
+        # Plan of the scan that can be resumed, and where runs journal their results
+        self.manifest_file = SCAN_MANIFEST_FILE
+        self.journal_dir = SCAN_JOURNAL_DIR
+        self._worker_pool: Optional[WorkerPool] = None
+        # Learns the cache once, then follows the lookups of every scan
+        self._prioritizer: Optional[ScanPrioritizer] = None
+    
+    def _new_cancel_token(self) -> CancelToken:
+        """
+        Start a scan with a token of its own
+
+        Lookups a stopped scan abandoned keep its cancelled token, so they
+        stay cancelled while the next scan runs. The pool falls back to the
+        current token for lookups not given one, e.g. of the cache refresher.
+        """
+        self._cancel_token = self.vt_client.cancel_token = CancelToken()
+        return self._cancel_token
+    
+    def close(self) -> None:
+        """Stop the worker threads, release pooled HTTP connections and save per-key usage"""
+        if self._worker_pool is not None:
+            # Lookups abandoned by a stopped scan are not waited for
+            self._worker_pool.shutdown(wait=not self._cancel_token.cancelled)
+            self._worker_pool = None
+        self.vt_client.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
     
     def scan_network_ips(
         self,
         ignore_cache: bool,
         max_ips: int,
         batch_size: int,
-        batch_delay: int,
-        log_callback: Callable[[str], None]
+        log_callback: Callable[[str], None],
+        engine: str = DEFAULT_SCAN_ENGINE,
+        fields: Optional[Sequence[str]] = None
     ) -> List[Dict]:
         """
         Scan network IPs and return results
         
         Args:
             ignore_cache: Whether to ignore cached results
-            max_ips: Maximum number of IPs to scan (0 for no limit)
+            max_ips: Maximum number of IPs to scan, the riskiest first (0 for no limit)
             batch_size: Number of IPs to scan in parallel
-            batch_delay: Delay between batches in seconds
             log_callback: Function to call for logging
+            engine: Scanning engine, "threaded" or "asyncio"
+            fields: Only parse these result fields (plus the verdict fields)
+                from VirusTotal reports, e.g. the export fields; None for all
             
         Returns:
             List of scan results
         """
-        self._stop_scanning = False
+        plan = self._plan_scan(ignore_cache, max_ips, batch_size, log_callback, engine, fields)
+        if plan is None:
+            return []
+        ip_process_map, cache, checkpoint = plan
+        return self._run_scan(
+            ip_process_map, cache, batch_size, log_callback, engine, fields, checkpoint, self._cancel_token
+        )
+    
+    def iter_scan(
+        self,
+        ignore_cache: bool,
+        max_ips: int,
+        batch_size: int,
+        log_callback: Callable[[str], None],
+        engine: str = DEFAULT_SCAN_ENGINE,
+        fields: Optional[Sequence[str]] = None
+    ) -> Iterator[ScanUpdate]:
+        """
+        Scan network IPs, yielding each result as soon as its lookup completes
+        
+        Takes the same arguments as scan_network_ips. Results are checkpointed
+        into the cache as usual but not collected, so memory stays flat however
+        many IPs are scanned; no temp results file is written. Lookups wait
+        while the consumer falls behind. Closing the iterator early stops the scan.
+        
+        Yields:
+            ScanUpdate with the result, whether it came from VirusTotal and the
+            progress of the scan
+        """
+        plan = self._plan_scan(ignore_cache, max_ips, batch_size, log_callback, engine, fields, keep_results=False)
+        if plan is None:
+            return
+        ip_process_map, cache, checkpoint = plan
+        cancel_token = self._cancel_token
+        yield from self._stream(
+            lambda on_result: self._run_scan(
+                ip_process_map, cache, batch_size, log_callback, engine, fields, checkpoint, cancel_token, on_result
+            ),
+            len(ip_process_map),
+            cancel_token
+        )
+    
+    def _plan_scan(
+        self,
+        ignore_cache: bool,
+        max_ips: int,
+        batch_size: int,
+        log_callback: Callable[[str], None],
+        engine: str,
+        fields: Optional[Sequence[str]],
+        keep_results: bool = True
+    ) -> Optional[Tuple[Dict[str, str], Dict[str, Dict], ScanCheckpoint]]:
+        """
+        Discover, filter and rank the IPs to scan and save the scan manifest
+        
+        Returns:
+            Tuple of (IPs to scan, their cache entries, checkpoint), or None if there is nothing to scan
+        """
+        # Checked before anything else: recovering its journal or saving a new
+        # manifest would lose the interrupted scan's progress
+        if ScanManifest.exists(self.manifest_file):
+            manifest = ScanManifest.load(self.manifest_file)
+            left = f" with {len(manifest.remaining())} IPs left" if manifest else ""
+            log_callback(f"⏸️ An interrupted scan{left} is pending, resume or discard it before starting a new one")
+            return None
+        self._new_cancel_token()
         log_callback("🚀 Starting IP scan...")
+        if len(self.vt_client.clients) > 1:
+            log_callback(f"🔑 Spreading requests across {len(self.vt_client.clients)} API keys")
         
         # Clear any existing temp results
         self.cache_manager.clear_temp_results()
         
-        # Load cache
-        cache = self.cache_manager.load_cache()
-        log_callback(f"📂 Loaded {len(cache)} cached IPs")
+        # Results are journaled as they arrive, fsync'ed once per batch
+        self._recover_orphaned_journals(log_callback)
+        journal = ScanJournal(new_journal_file("scan", self.journal_dir), sync_every=batch_size)
+        checkpoint = ScanCheckpoint(self.cache_manager, journal, keep_results=keep_results)
         
         # Get external IPs
         ip_process_map = self.network_scanner.get_external_ips(log_callback)
         
         if not ip_process_map:
             log_callback("❌ No external IPs found")
-            return []
+            return None
+        
+        cache = self._lookup_cached(ip_process_map, log_callback)
         
         # Filter cached IPs if requested
         original_count = len(ip_process_map)
         if ignore_cache:
-            cached_ips = self.cache_manager.get_cached_ips()
             ip_process_map = {
                 ip: proc for ip, proc in ip_process_map.items() 
-                if ip not in cached_ips
+                if not is_fresh(cache.get(ip))
             }
             filtered_count = len(ip_process_map)
             log_callback(f"🧹 Ignored {original_count - filtered_count} cached IPs. {filtered_count} remaining")
         
+        # Riskiest connections first, so a limited scan spends its quota on them
+        ip_process_map = self._prioritize(ip_process_map, cache, log_callback)
+        
         # Apply IP limit
         if max_ips > 0 and len(ip_process_map) > max_ips:
             ip_items = list(ip_process_map.items())[:max_ips]
@@ -78,103 +227,560 @@ class IPScanner:
         
         if not ip_process_map:
             log_callback("ℹ️ No IPs to scan after filtering")
+            return None
+        
+        # Save the plan so the scan can be resumed if it is interrupted
+        checkpoint.manifest = ScanManifest(
+            ip_process_map, {"batch_size": batch_size, "engine": engine, "fields": fields},
+            manifest_file=self.manifest_file, journal_file=journal.journal_file
+        )
+        checkpoint.manifest.save()
+        return ip_process_map, cache, checkpoint
+    
+    def monitor(
+        self,
+        batch_size: int,
+        log_callback: Callable[[str], None],
+        interval: float = MONITOR_INTERVAL,
+        debounce: float = MONITOR_DEBOUNCE,
+        engine: str = DEFAULT_SCAN_ENGINE,
+        fields: Optional[Sequence[str]] = None,
+        on_result: Optional[Callable[[Dict, bool], None]] = None,
+        refresh_cache: bool = False
+    ) -> int:
+        """
+        Watch the connections and look up new remote peers until stopped
+        
+        Every interval seconds the connections are snapshotted and diffed
+        against the previous snapshot; peers that were not connected before
+        are looked up in one batch once debounce seconds have passed since
+        they showed up. Results are checkpointed into the cache and passed to
+        on_result but not collected, so memory stays flat however long it
+        runs. Returns when stop_scanning() is called.
+        
+        Args:
+            batch_size: Number of IPs to scan in parallel
+            log_callback: Function to call for logging
+            interval: Seconds between two snapshots
+            debounce: Seconds a new peer waits before it is looked up
+            engine: Scanning engine, "threaded" or "asyncio"
+            fields: Only parse these result fields from VirusTotal reports; None for all
+            on_result: Called with each result and whether it came from VirusTotal
+            refresh_cache: Meanwhile revalidate cached IPs close to expiry on a
+                background thread, with quota no lookup is waiting for
+            
+        Returns:
+            Number of peers looked up
+        """
+        cancel_token = self._new_cancel_token()
+        monitor = ConnectionMonitor(self.network_scanner, debounce=debounce)
+        log_callback(f"👀 Monitoring connections every {interval:g}s, Ctrl+C or stop to end")
+        refresher = CacheRefresher(self.vt_client, self.cache_manager) if refresh_cache else None
+        if refresher:
+            refresher.start(log_callback)
+        try:
+            looked_up = self._monitor_loop(
+                monitor, batch_size, log_callback, interval, engine, fields, on_result, cancel_token
+            )
+        finally:
+            if refresher:
+                refresher.stop()
+        log_callback(f"🛑 Monitoring stopped, {looked_up} peers looked up")
+        return looked_up
+    
+    def _monitor_loop(
+        self,
+        monitor: ConnectionMonitor,
+        batch_size: int,
+        log_callback: Callable[[str], None],
+        interval: float,
+        engine: str,
+        fields: Optional[Sequence[str]],
+        on_result: Optional[Callable[[Dict, bool], None]],
+        cancel_token: CancelToken
+    ) -> int:
+        """Poll and look up new peers until the scan is stopped, returning the number looked up"""
+        self._recover_orphaned_journals(log_callback)
+        # Every batch of this run uses the same journal, emptied when the batch is saved
+        journal_file = new_journal_file("monitor", self.journal_dir)
+        looked_up = 0
+        # Per-batch bookkeeping stays out of the log, lookups still report their own progress
+        quiet = lambda _: None
+        while True:
+            new_peers = monitor.poll(log_callback)
+            if new_peers:
+                log_callback(f"🆕 {len(new_peers)} new peers ({monitor.peer_count} connected)")
+                cache = self._lookup_cached(new_peers, quiet)
+                ranked = self._prioritize(new_peers, cache, quiet, monitor.connections)
+                journal = ScanJournal(journal_file, sync_every=batch_size)
+                checkpoint = ScanCheckpoint(self.cache_manager, journal, keep_results=False)
+                if self._lookup_ips(ranked, cache, batch_size, log_callback, engine, fields, checkpoint,
+                                    cancel_token, on_result, monitor.connections):
+                    if checkpoint.saved_entries:
+                        log_callback(f"💾 {checkpoint.saved_entries} new entries cached")
+                looked_up += len(ranked)
+            # Wake up early when a pending peer becomes due
+            wait = interval
+            due = monitor.next_due()
+            if due is not None:
+                wait = min(wait, max(0.0, due - time.monotonic()))
+            if cancel_token.sleep(wait) or cancel_token.cancelled:
+                return looked_up
+    
+    def resume_scan(self, log_callback: Callable[[str], None]) -> List[Dict]:
+        """
+        Continue an interrupted scan with the IPs it had not completed
+        
+        Uses the parameters of the original scan. IPs completed before the
+        interruption are not looked up again; their results come from the cache.
+        
+        Args:
+            log_callback: Function to call for logging
+            
+        Returns:
+            List of scan results, including those of the interrupted run
+        """
+        plan = self._plan_resume(log_callback)
+        if plan is None:
             return []
+        ip_process_map, cache, checkpoint, previous = plan
+        checkpoint.results.extend(previous)
+        if not ip_process_map:
+            checkpoint.manifest.clear()
+            return checkpoint.results
+        
+        params = checkpoint.manifest.params
+        return self._run_scan(
+            ip_process_map, cache, params.get("batch_size", DEFAULT_POOL_SIZE), log_callback,
+            params.get("engine", DEFAULT_SCAN_ENGINE), params.get("fields"), checkpoint, self._cancel_token
+        )
+    
+    def iter_resume_scan(self, log_callback: Callable[[str], None]) -> Iterator[ScanUpdate]:
+        """
+        Streaming counterpart of resume_scan, see iter_scan
+        
+        Yields:
+            ScanUpdate for every result of the interrupted run first, then for
+            each new result as it completes
+        """
+        plan = self._plan_resume(log_callback, keep_results=False)
+        if plan is None:
+            return
+        ip_process_map, cache, checkpoint, previous = plan
+        cancel_token = self._cancel_token
+        if not ip_process_map:
+            checkpoint.manifest.clear()
+            yield from self._stream(None, 0, cancel_token, previous)
+            return
+        
+        params = checkpoint.manifest.params
+        yield from self._stream(
+            lambda on_result: self._run_scan(
+                ip_process_map, cache, params.get("batch_size", DEFAULT_POOL_SIZE), log_callback,
+                params.get("engine", DEFAULT_SCAN_ENGINE), params.get("fields"), checkpoint, cancel_token, on_result
+            ),
+            len(ip_process_map),
+            cancel_token,
+            previous
+        )
+    
+    def _plan_resume(
+        self,
+        log_callback: Callable[[str], None],
+        keep_results: bool = True
+    ) -> Optional[Tuple[Dict[str, str], Dict[str, Dict], ScanCheckpoint, List[Dict]]]:
+        """
+        Load the manifest of an interrupted scan and recover its journal
+        
+        Returns:
+            Tuple of (IPs left to scan, their cache entries, checkpoint, results
+            of the interrupted run), or None if there is no scan to resume
+        """
+        manifest = ScanManifest.load(self.manifest_file)
+        if manifest is None:
+            log_callback("ℹ️ No interrupted scan to resume")
+            return None
+        self._new_cancel_token()
+        
+        batch_size = manifest.params.get("batch_size", DEFAULT_POOL_SIZE)
+        if keep_results:
+            # Rebuilt from the results of the interrupted run onwards
+            self.cache_manager.clear_temp_results()
+        journal = ScanJournal(manifest.journal_file, sync_every=batch_size)
+        checkpoint = ScanCheckpoint(self.cache_manager, journal, manifest=manifest, keep_results=keep_results)
+        checkpoint.recover(log_callback)
+        
+        # Results of the interrupted run
+        previous = []
+        for ip in manifest.targets:
+            entry = self.cache_manager.get_cached_entry(ip) if ip in manifest.completed else None
+            if entry is not None:
+                previous.append(entry)
+        
+        ip_process_map = manifest.remaining()
+        log_callback(f"⏯️ Resuming scan: {len(ip_process_map)} of {len(manifest.targets)} IPs left")
+        cache = self._lookup_cached(ip_process_map, log_callback) if ip_process_map else {}
+        return ip_process_map, cache, checkpoint, previous
+    
+    def _stream(
+        self,
+        run: Optional[Callable[[Callable[[Dict, bool], None]], object]],
+        total: int,
+        cancel_token: CancelToken,
+        previous: Sequence[Dict] = ()
+    ) -> Iterator[ScanUpdate]:
+        """
+        Run a scan on a background thread and hand its results over one by one
+        
+        Args:
+            run: Runs the scan, calling its argument with every result
+            total: Number of IPs the scan looks up
+            cancel_token: Token of the scan
+            previous: Results completed earlier, yielded first
+        """
+        progress = ScanProgress(total + len(previous))
+        for entry in previous:
+            progress.record(entry, False)
+            yield ScanUpdate(entry, False, progress.snapshot())
+        if run is None:
+            return
+        
+        # Bounded, so a slow consumer holds back the lookups instead of piling up results
+        updates: "queue.Queue" = queue.Queue(maxsize=STREAM_BUFFER_SIZE)
+        failure: List[BaseException] = []
+        
+        def publish(entry: Dict, is_new: bool):
+            # Gives up once the scan is stopped, the consumer may be gone
+            while not cancel_token.cancelled:
+                try:
+                    updates.put((entry, is_new), timeout=STREAM_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    continue
+        
+        def produce():
+            try:
+                run(publish)
+            except BaseException as e:
+                failure.append(e)
+            finally:
+                updates.put(_END_OF_SCAN)
+        
+        producer = threading.Thread(target=produce, name="scan-stream", daemon=True)
+        producer.start()
+        finished = False
+        try:
+            while True:
+                item = updates.get()
+                if item is _END_OF_SCAN:
+                    finished = True
+                    break
+                entry, is_new = item
+                progress.record(entry, is_new)
+                yield ScanUpdate(entry, is_new, progress.snapshot())
+        finally:
+            if not finished:
+                # The consumer stopped early: stop the scan and let it save its results
+                cancel_token.cancel()
+                while producer.is_alive():
+                    try:
+                        updates.get(timeout=STREAM_POLL_INTERVAL)
+                    except queue.Empty:
+                        pass
+        producer.join()
+        if failure:
+            raise failure[0]
+    
+    def has_resumable_scan(self) -> bool:
+        """Check whether an interrupted scan can be resumed"""
+        return ScanManifest.exists(self.manifest_file)
+    
+    def discard_resumable_scan(self, log_callback: Callable[[str], None]) -> None:
+        """
+        Give up an interrupted scan so that a new one can start
+        
+        Results it had journaled are still moved into the cache.
         
-        # Perform threaded scanning
-        results = self._scan_ips_threaded(
-            ip_process_map, cache, batch_size, batch_delay, log_callback
+        Args:
+            log_callback: Function to call for logging
+        """
+        manifest = ScanManifest.load(self.manifest_file)
+        if manifest is not None:
+            journal = ScanJournal(manifest.journal_file)
+            ScanCheckpoint(self.cache_manager, journal, manifest=manifest, keep_results=False).recover(log_callback)
+        (manifest or ScanManifest({}, {}, manifest_file=self.manifest_file)).clear()
+        log_callback("🗑️ Interrupted scan discarded")
+    
+    def _recover_orphaned_journals(self, log_callback: Callable[[str], None]) -> None:
+        """Move the results of runs that died before saving them into the cache"""
+        manifest = ScanManifest.load(self.manifest_file) if ScanManifest.exists(self.manifest_file) else None
+        # The journal of a scan that can be resumed is recovered by resuming it
+        keep = [manifest.journal_file] if manifest else []
+        for journal_file in find_orphaned_journals(self.journal_dir, keep):
+            ScanCheckpoint(self.cache_manager, ScanJournal(journal_file), keep_results=False).recover(log_callback)
+    
+    def _lookup_cached(self, ip_process_map: Dict[str, str], log_callback: Callable[[str], None]) -> Dict[str, Dict]:
+        """Look up only the IPs seen now; each lookup counts as a cache hit or miss"""
+        cache = {}
+        for ip in ip_process_map:
+            entry = self.cache_manager.get_cached_entry(ip)
+            if entry is not None:
+                cache[ip] = entry
+        expired = sum(1 for entry in cache.values() if not is_fresh(entry))
+        log_callback(f"📂 Found {len(cache)} IPs in cache ({expired} expired)")
+        return cache
+    
+    def _prioritize(
+        self,
+        ip_process_map: Dict[str, str],
+        cache: Dict[str, Dict],
+        log_callback: Callable[[str], None],
+        connections: Optional[ConnectionTable] = None
+    ) -> Dict[str, str]:
+        """Order IPs by risk score, using the malicious entries of the whole cache as context"""
+        if self._prioritizer is None:
+            prioritizer = ScanPrioritizer()
+            prioritizer.learn(self.cache_manager.load_cache())
+            self._prioritizer = prioritizer
+        prioritizer = self._prioritizer
+        if connections is None:
+            connections = self.network_scanner.connections
+        ranked = prioritizer.rank(ip_process_map, cache, connections)
+        log_callback(f"🎯 Ranked {len(ranked)} IPs by risk, riskiest first")
+        return ranked
+    
+    def _run_scan(
+        self,
+        ip_process_map: Dict[str, str],
+        cache: Dict[str, Dict],
+        batch_size: int,
+        log_callback: Callable[[str], None],
+        engine: str,
+        fields: Optional[Sequence[str]],
+        checkpoint: ScanCheckpoint,
+        cancel_token: CancelToken,
+        on_result: Optional[Callable[[Dict, bool], None]] = None
+    ) -> List[Dict]:
+        """Look up the given IPs with the chosen engine, checkpointing every result before passing it to on_result"""
+        throttle_stats = self.get_throttle_stats()
+        coalesced_before = lookup_flight.get_stats()["coalesced"]
+        saved = self._lookup_ips(
+            ip_process_map, cache, batch_size, log_callback, engine, fields, checkpoint, cancel_token, on_result
         )
         
-        # Save updated cache
-        if self.cache_manager.save_cache(cache):
-            log_callback(f"💾 Cache updated with {len(cache)} entries")
+        # Report time spent waiting on quota during this scan
+        throttled = self.get_throttle_stats()
+        throttle_events = throttled["throttle_events"] - throttle_stats["throttle_events"]
+        if throttle_events:
+            throttled_seconds = throttled["throttled_seconds"] - throttle_stats["throttled_seconds"]
+            log_callback(f"⏱️ Throttled {throttle_events} times, {throttled_seconds:.0f}s spent waiting on quota")
+        
+        coalesced = lookup_flight.get_stats()["coalesced"] - coalesced_before
+        if coalesced:
+            log_callback(f"🔗 {coalesced} duplicate lookups shared an in-flight request")
         
-        # Save temporary results
-        if self.cache_manager.save_temp_results(results):
-            log_callback("💾 Temporary results saved")
+        if saved:
+            log_callback(f"💾 Cache updated with {checkpoint.saved_entries} new entries ({self.cache_manager.count()} total)")
+            if checkpoint.keep_results:
+                log_callback("💾 Temporary results saved")
+        
+        if checkpoint.manifest:
+            # Kept until every planned IP has a result, so failed lookups can be retried
+            remaining = len(checkpoint.manifest.remaining())
+            if cancel_token.cancelled and remaining:
+                log_callback(f"⏸️ Scan stopped with {remaining} IPs left, resume it to scan the rest")
+                return checkpoint.results
+            if remaining:
+                log_callback(f"⚠️ Scan finished with {remaining} failed lookups, resume it to retry them")
+                return checkpoint.results
+            if saved:
+                checkpoint.manifest.clear()
         
         log_callback("✅ Scan completed successfully")
-        return results
+        return checkpoint.results
+    
+    def _lookup_ips(
+        self,
+        ip_process_map: Dict[str, str],
+        cache: Dict[str, Dict],
+        batch_size: int,
+        log_callback: Callable[[str], None],
+        engine: str,
+        fields: Optional[Sequence[str]],
+        checkpoint: ScanCheckpoint,
+        cancel_token: CancelToken,
+        on_result: Optional[Callable[[Dict, bool], None]] = None,
+        connections: Optional[ConnectionTable] = None
+    ) -> bool:
+        """
+        Run the lookups of a scan or of a monitor batch and close its checkpoint
+        
+        Returns:
+            True if the results were saved to the cache
+        """
+        prioritizer = self._prioritizer
+        if connections is None:
+            connections = self.network_scanner.connections
+        
+        def record(entry: Dict, is_new: bool):
+            ip = entry["IP"]
+            if ip in connections:
+                # "Process Name" holds the primary process, this lists every one; a copy
+                # is annotated, a cached entry is shared with other scans
+                entry = {**entry, "Processes": ", ".join(connections.process_names(ip))}
+            checkpoint.record(entry, is_new)
+            if is_new and prioritizer is not None:
+                # Keeps the malicious prefixes and ASNs current without learning the cache again
+                prioritizer.observe(ip, entry)
+            if on_result:
+                on_result(entry, is_new)
+        
+        if engine == SCAN_ENGINE_ASYNCIO and not is_async_engine_available():
+            log_callback("⚠️ aiohttp is not installed, falling back to the threaded engine")
+            engine = DEFAULT_SCAN_ENGINE
+        
+        projection = get_projection(fields)
+        try:
+            if engine == SCAN_ENGINE_ASYNCIO:
+                asyncio.run(self._scan_ips_async(
+                    ip_process_map, cache, batch_size, log_callback, cancel_token, projection, record
+                ))
+            else:
+                self._scan_ips_threaded(
+                    ip_process_map, cache, batch_size, log_callback, cancel_token, projection, record
+                )
+        finally:
+            # Store whatever was fetched, even if the scan failed midway
+            saved = checkpoint.close()
+        return saved
     
     def _scan_ips_threaded(
         self,
         ip_process_map: Dict[str, str],
         cache: Dict[str, Dict],
         batch_size: int,
-        batch_delay: int,
-        log_callback: Callable[[str], None]
+        log_callback: Callable[[str], None],
+        cancel_token: CancelToken,
+        projection: Optional[FrozenSet[str]] = None,
+        on_result: Optional[Callable[[Dict, bool], None]] = None
     ) -> List[Dict]:
-        """Scan IPs using threading with batching"""
+        """
+        Scan IPs on the persistent worker pool, batch_size lookups in flight at a time
+        
+        Results go to on_result as they complete; they are only collected and
+        returned when there is no on_result.
+        """
         results = []
         cache_lock = threading.Lock()
-        processed_ips = set()
-        processed_ips_lock = threading.Lock()
-        
-        ip_items = list(ip_process_map.items())
-        total_ips = len(ip_items)
-        
-        def worker(ip: str, process_name: str):
-            if self._stop_scanning:
-                return
-                
-            with processed_ips_lock:
-                if ip in processed_ips:
-                    return
-                processed_ips.add(ip)
+        
+        def worker(ip: str, process_name: str) -> Optional[Dict]:
+            if cancel_token.cancelled:
+                return None
             
-            # Check cache first
-            if ip in cache:
-                with cache_lock:
-                    entry = cache[ip]
+            # Check cache first; expired entries are queried again
+            is_new = False
+            with cache_lock:
+                cached = cache.get(ip)
+            if is_fresh(cached) and has_fields(cached, projection):
+                entry = cached
                 log_callback(f"✅ Using cached data for {ip}")
             else:
-                # Query VirusTotal
-                vt_data, _ = self.vt_client.query_ip(ip, log_callback)
+                # Query VirusTotal; the rate limiter paces the requests
+                vt_data, _ = self.vt_client.query_ip(ip, log_callback, projection, cancel_token)
+                if not vt_data and cancel_token.cancelled:
+                    # Not a failure: the IP stays in the scan manifest for a resume
+                    return None
                 if vt_data:
-                    entry = {"IP": ip, "Process Name": process_name, **vt_data}
+                    entry = stamp_entry({"IP": ip, "Process Name": process_name, **vt_data}, cached)
                     with cache_lock:
                         cache[ip] = entry
+                    is_new = True
                     log_callback(f"🆕 Successfully scanned: {ip}")
                 else:
                     entry = {"IP": ip, "Process Name": process_name}
                     log_callback(f"⚠️ Failed to scan: {ip}")
             
-            with cache_lock:
+            if on_result:
+                on_result(entry, is_new)
+            return entry
+        
+        # Sliding window: a new lookup starts as soon as any in-flight one finishes
+        pool = self._get_worker_pool(batch_size)
+        for entry in pool.run(worker, ip_process_map.items(), batch_size, cancel_token):
+            if entry is not None and not on_result:
                 results.append(entry)
         
-        # Process in batches
-        for i in range(0, total_ips, batch_size):
-            if self._stop_scanning:
-                break
-                
-            batch = ip_items[i:i + batch_size]
-            threads = []
-            
-            for ip, proc in batch:
-                if self._stop_scanning:
-                    break
-                t = threading.Thread(target=worker, args=(ip, proc))
-                threads.append(t)
-                t.start()
-            
-            # Wait for batch to complete
-            for t in threads:
-                t.join()
+        return results
+    
+    def _get_worker_pool(self, size: int) -> WorkerPool:
+        """Reuse the worker threads of earlier scans, growing the pool if needed"""
+        if self._worker_pool is None or self._worker_pool.max_workers < size:
+            if self._worker_pool is not None:
+                self._worker_pool.shutdown(wait=False)
+            self._worker_pool = WorkerPool(size, thread_name_prefix="vt-lookup")
+        return self._worker_pool
+    
+    async def _scan_ips_async(
+        self,
+        ip_process_map: Dict[str, str],
+        cache: Dict[str, Dict],
+        batch_size: int,
+        log_callback: Callable[[str], None],
+        cancel_token: CancelToken,
+        projection: Optional[FrozenSet[str]] = None,
+        on_result: Optional[Callable[[Dict, bool], None]] = None
+    ) -> List[Dict]:
+        """Scan IPs on an asyncio event loop with an async HTTP client"""
+        async with AsyncClientPool(self.vt_client, batch_size) as client:
+            return await scan_ips_async(
+                client, ip_process_map, cache, batch_size,
+                log_callback, cancel_token, projection, on_result
+            )
+    
+    def refresh_cache(self, log_callback: Callable[[str], None], max_requests: int = 0) -> int:
+        """
+        Revalidate cached entries close to expiry with leftover quota
+        
+        Args:
+            log_callback: Function to call for logging
+            max_requests: Upper bound on API requests (0 for no limit)
             
-            # Delay between batches (except for last batch)
-            if i + batch_size < total_ips and not self._stop_scanning:
-                log_callback(f"⏳ Waiting {batch_delay}s before next batch...")
-                time.sleep(batch_delay)
+        Returns:
+            Number of entries refreshed
+        """
+        return CacheRefresher(self.vt_client, self.cache_manager).refresh_once(log_callback, max_requests)
+    
+    def get_throttle_stats(self) -> Dict[str, float]:
+        """
+        Get rate-limit counters summed over this scanner's API keys
         
-        return results
+        Returns:
+            Dictionary with the number of 429 responses and the total paused time
+        """
+        return self.vt_client.get_throttle_stats()
+    
+    def get_coalescing_stats(self) -> Dict[str, int]:
+        """
+        Get process-wide request coalescing counters
+        
+        Returns:
+            Dictionary with the number of lookups sent and lookups that shared one
+        """
+        return lookup_flight.get_stats()
     
     def stop_scanning(self):
-        """Stop the current scanning operation"""
-        self._stop_scanning = True
+        """
+        Stop the current scanning operation
+        
+        Quota waits, retry delays and the worker pool wake up immediately;
+        the scan saves its partial results and returns within a second.
+        Lookups still waiting on an HTTP response are abandoned.
+        """
+        self._cancel_token.cancel()
     
     def export_to_csv(
         self,
-        results: List[Dict],
+        results: Iterable[Dict],
         selected_fields: List[str],
         csv_path: str,
         log_callback: Callable[[str], None]
@@ -182,33 +788,75 @@ class IPScanner:
         """
         Export scan results to CSV file
         
+        Rows are written as they are read from results, so a streaming scan
+        can be exported while it runs. Without results, the CSV only holds its header.
+        
         Args:
-            results: List of scan results
+            results: Scan results, e.g. a list or a generator
             selected_fields: Fields to include in CSV
-            csv_path: Path to save CSV file
+            csv_path: Path to save CSV file (gzip-compressed if it ends in .gz)
             log_callback: Function to call for logging
             
         Returns:
             True if successful, False otherwise
         """
-        try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-            
-            with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=selected_fields)
-                writer.writeheader()
-                
-                for row in results:
-                    filtered_row = {k: row.get(k, "") for k in selected_fields}
-                    writer.writerow(filtered_row)
-            
-            log_callback(f"📄 CSV exported to: {csv_path}")
-            return True
+        return self.export_results(results, selected_fields, csv_path, log_callback, fmt=EXPORT_CSV)
+    
+    def export_results(
+        self,
+        results: Iterable[Dict],
+        selected_fields: Optional[List[str]],
+        path: str,
+        log_callback: Callable[[str], None],
+        fmt: Optional[str] = None,
+        rotate_bytes: int = EXPORT_ROTATE_BYTES,
+        partitioned: bool = False
+    ) -> bool:
+        """
+        Export results to CSV or JSON Lines, optionally gzip-compressed, or to Parquet/Arrow
+        
+        Rows are written as they are read from results with bounded
+        buffering. Without results, the file is still written (a CSV with
+        its header, a Parquet/Arrow file with its schema), except that a
+        partitioned dataset gets nothing added.
+        
+        Args:
+            results: Scan results, e.g. a list, a generator or iter_cache()
+            selected_fields: Fields to export; all fields for JSON Lines if None
+            path: Output file; the format and compression follow its name
+                (scan.csv, scan.jsonl, scan.csv.gz, scan.jsonl.gz, scan.parquet, scan.arrow)
+            log_callback: Function to call for logging
+            fmt: "csv", "jsonl", "parquet" or "arrow" to override the format implied by the name
+            rotate_bytes: Split the output into parts of about this size (0 for one file)
+            partitioned: Write a Parquet/Arrow dataset directory partitioned by scan date
             
-        except Exception as e:
-            log_callback(f"❌ Failed to export CSV: {str(e)}")
-            return False
+        Returns:
+            True if successful, False otherwise
+        """
+        return export_results(results, selected_fields, path, log_callback, fmt, rotate_bytes, partitioned)
+    
+    def export_cache(
+        self,
+        selected_fields: Optional[List[str]],
+        path: str,
+        log_callback: Callable[[str], None],
+        fmt: Optional[str] = None,
+        rotate_bytes: int = EXPORT_ROTATE_BYTES,
+        partitioned: bool = False
+    ) -> bool:
+        """
+        Export every cached entry, streamed from the cache backend in batches
+        
+        Takes the same arguments as export_results. Memory use stays flat
+        even for caches of hundreds of thousands of entries.
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        log_callback(f"📦 Exporting {self.cache_manager.store.count()} cached entries...")
+        return self.export_results(
+            self.cache_manager.iter_cache(), selected_fields, path, log_callback, fmt, rotate_bytes, partitioned
+        )
     
     def get_scan_summary(self, results: List[Dict]) -> Dict[str, int]:
         """
@@ -0,0 +1,137 @@
+"""
+Request coalescing so concurrent lookups of the same IP share one API call
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Outcome of a call its caller gave up on, which the callers sharing it must not take as theirs
+_ABANDONED = object()
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one
+
+    The first caller for a key runs the call; callers arriving while it is
+    still in flight wait for it and receive the same result. Threads (do)
+    and coroutines (do_async) share one table of calls in flight, so both
+    engines and every scan in the process coalesce with each other.
+
+    A call whose caller was cancelled meanwhile, e.g. because its scan was
+    stopped, is not shared: its empty result would read as a failed lookup
+    to callers of other scans, so they run the call again themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Calls in flight, shared by threads and coroutines of every event loop
+        self._calls: Dict[Hashable, Future] = {}
+
+        # Counters
+        self.executed = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Future of the call in flight for key, and whether the caller has to run it"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.executed += 1
+            return future, True
+
+    def _rejoin(self) -> None:
+        """Count a waiter whose shared call was abandoned as not coalesced"""
+        with self._lock:
+            self.coalesced -= 1
+
+    def _finish(self, key: Hashable) -> None:
+        with self._lock:
+            del self._calls[key]
+
+    def do(self, key: Hashable, func: Callable[[], Any], cancelled: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Run func for key, or wait for the identical call already in flight
+
+        Args:
+            key: Identity of the call, e.g. the IP address
+            func: Call to run if no identical call is in flight
+            cancelled: Tells whether this caller has been cancelled, in which
+                case the result of its call is not shared
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                result = future.result()
+                if result is not _ABANDONED:
+                    return result
+                self._rejoin()
+                continue
+
+            try:
+                result = func()
+                future.set_result(_ABANDONED if cancelled is not None and cancelled() else result)
+                return result
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                self._finish(key)
+
+    async def do_async(
+        self,
+        key: Hashable,
+        func: Callable[[], Awaitable[Any]],
+        cancelled: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """
+        Coroutine counterpart of do(), sharing its calls
+
+        A lookup on an event loop coalesces with the same lookup on another
+        loop or on a thread of the threaded engine, whichever started first.
+        """
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                # Shielded, so a waiter being cancelled does not cancel the call the others wait for
+                result = await asyncio.shield(asyncio.wrap_future(future))
+                if result is not _ABANDONED:
+                    return result
+                self._rejoin()
+                continue
+
+            try:
+                result = await func()
+                future.set_result(_ABANDONED if cancelled is not None and cancelled() else result)
+                return result
+            except asyncio.CancelledError:
+                # Callers that were not cancelled with this one run the call again
+                future.set_result(_ABANDONED)
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                self._finish(key)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters
+
+        Returns:
+            Dictionary with the number of executed and coalesced calls
+        """
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced}
+
+
+# Shared by every scanner in the process, so a monitor loop and a manual
+# lookup of the same IP never reach VirusTotal twice
+lookup_flight = SingleFlight()
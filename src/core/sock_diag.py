@@ -0,0 +1,150 @@
+"""
+Linux connection reader querying the kernel over NETLINK_SOCK_DIAG
+
+The kernel filters the sockets by state and replies with binary
+inet_diag_msg records, so no socket table is formatted or parsed as text.
+This is what ss uses internally, without the fork/exec.
+"""
+import socket
+import struct
+from typing import Dict, List
+from .proc_net import ProcSocket
+
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+
+# Netlink message types and flags
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x01
+NLM_F_DUMP = 0x300
+
+TCP_ESTABLISHED = 1
+
+# struct nlmsghdr: length, type, flags, sequence number, port id
+_NLMSG_HEADER = struct.Struct("=IHHII")
+# struct inet_diag_req_v2 with its inet_diag_sockid zeroed: family,
+# protocol, extensions, padding, state bitmask, socket id (48 bytes)
+_DIAG_REQUEST = struct.Struct("=BBBxI48x")
+# A whole reply record: nlmsghdr, then struct inet_diag_msg with family,
+# state, timer, retransmits, the socket id (ports and addresses in network
+# byte order, read here as bytes; interface; cookie) and expires, receive
+# queue, send queue, uid and inode
+_DIAG_RECORD = struct.Struct("=IHHIIBBBBBBBB16s16sI8xIIIII")
+
+_RECEIVE_BUFFER = 1 << 20
+
+_MAPPED_PREFIX = b"\0" * 10 + b"\xff\xff"
+
+# Queried families and protocols, and the protocol reported for their sockets
+_QUERIES = (
+    (socket.AF_INET, socket.IPPROTO_TCP, "tcp"),
+    (socket.AF_INET6, socket.IPPROTO_TCP, "tcp"),
+    (socket.AF_INET, socket.IPPROTO_UDP, "udp"),
+    (socket.AF_INET6, socket.IPPROTO_UDP, "udp"),
+)
+
+
+def netlink_available() -> bool:
+    """Check whether this platform has netlink sockets at all"""
+    return hasattr(socket, "AF_NETLINK")
+
+
+def _decode_address(family: int, raw: bytes, cache: Dict[bytes, str]) -> str:
+    if family == socket.AF_INET:
+        ip = socket.inet_ntop(socket.AF_INET, raw[:4])
+    elif raw.startswith(_MAPPED_PREFIX):
+        ip = socket.inet_ntop(socket.AF_INET, raw[12:])
+    else:
+        ip = socket.inet_ntop(socket.AF_INET6, raw)
+    cache[raw] = ip
+    return ip
+
+
+def parse_diag_messages(data, protocol: str, cache: Dict[bytes, str], sockets: List[ProcSocket]) -> bool:
+    """
+    Decode one netlink reply buffer of inet_diag_msg records
+
+    Args:
+        data: Received bytes (or a memoryview of them), one or more netlink messages
+        protocol: Protocol to report for the sockets ("tcp" or "udp")
+        cache: Decoded addresses by their raw bytes, shared across buffers
+        sockets: List the decoded sockets are appended to
+
+    Returns:
+        True once the end of the dump (NLMSG_DONE) was reached
+
+    Raises:
+        OSError: If the kernel answered with an error
+    """
+    record = _DIAG_RECORD
+    record_size = record.size
+    header = _NLMSG_HEADER
+    new_socket = tuple.__new__
+    offset = 0
+    end = len(data)
+    while offset + header.size <= end:
+        if end - offset >= record_size:
+            (length, msg_type, _, _, _, family, _, _, _,
+             local_high, local_low, remote_high, remote_low, local, remote,
+             _, _, _, _, _, inode) = record.unpack_from(data, offset)
+        else:
+            length, msg_type, _, _, _ = header.unpack_from(data, offset)
+        if length < header.size:
+            break
+        if msg_type == NLMSG_DONE:
+            return True
+        if msg_type == NLMSG_ERROR:
+            errno = -struct.unpack_from("=i", data, offset + header.size)[0]
+            if errno:
+                raise OSError(errno, f"sock_diag request failed: {errno}")
+        elif msg_type == SOCK_DIAG_BY_FAMILY and length >= record_size:
+            # ProcSocket without the NamedTuple constructor overhead
+            sockets.append(new_socket(ProcSocket, (
+                protocol,
+                cache.get(local) or _decode_address(family, local, cache), local_high << 8 | local_low,
+                cache.get(remote) or _decode_address(family, remote, cache), remote_high << 8 | remote_low,
+                inode
+            )))
+        # Messages are aligned to 4 bytes
+        offset += (length + 3) & ~3
+    return False
+
+
+def read_established_netlink() -> List[ProcSocket]:
+    """
+    Ask the kernel for every established TCP and UDP socket
+
+    Returns:
+        Established sockets, as read_established() returns them from /proc/net
+
+    Raises:
+        OSError: If netlink or sock_diag is unavailable, e.g. on other
+            platforms, in restricted sandboxes or without the inet_diag module
+    """
+    if not netlink_available():
+        raise OSError("netlink sockets are not available on this platform")
+
+    sockets: List[ProcSocket] = []
+    cache: Dict[bytes, str] = {}
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG) as sock:
+        sock.bind((0, 0))
+        buffer = bytearray(_RECEIVE_BUFFER)
+        view = memoryview(buffer)
+        for sequence, (family, ip_protocol, protocol) in enumerate(_QUERIES, start=1):
+            request = _DIAG_REQUEST.pack(family, ip_protocol, 0, 1 << TCP_ESTABLISHED)
+            header = _NLMSG_HEADER.pack(
+                _NLMSG_HEADER.size + len(request), SOCK_DIAG_BY_FAMILY,
+                NLM_F_REQUEST | NLM_F_DUMP, sequence, 0
+            )
+            sock.sendall(header + request)
+            try:
+                while True:
+                    received = sock.recv_into(buffer)
+                    if not received or parse_diag_messages(view[:received], protocol, cache, sockets):
+                        break
+            except OSError:
+                # Without IPv6 or the udp_diag module only those queries fail
+                if sequence == 1:
+                    raise
+    return sockets
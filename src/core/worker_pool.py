@@ -0,0 +1,128 @@
+"""
+Long-lived worker threads for the threaded scanning engine
+"""
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set
+from .cancellation import CancelToken
+
+
+class WorkerPool:
+    """
+    Fixed set of worker threads reused across scans, fed from a work queue
+
+    Work is fed through a sliding window: at most window calls are in flight
+    and the next one starts as soon as any of them finishes, so one slow
+    lookup never holds back the others.
+
+    The workers are daemon threads: a lookup abandoned by a cancelled scan
+    never keeps the application from exiting.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "scan-worker"):
+        self.max_workers = max(1, max_workers)
+        self.thread_name_prefix = thread_name_prefix
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def _work(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            future, func, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, func: Callable[..., Any], *args) -> Future:
+        """Queue one call, starting worker threads on demand up to max_workers"""
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot submit to a worker pool after shutdown")
+            self._queue.put((future, func, args))
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"{self.thread_name_prefix}-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    def run(
+        self,
+        func: Callable[..., Any],
+        items: Iterable[tuple],
+        window: Optional[int] = None,
+        cancel_token: Optional[CancelToken] = None
+    ) -> Iterator[Any]:
+        """
+        Call func(*item) for every item, yielding results as they complete
+
+        Args:
+            func: Function run on a worker thread
+            items: Argument tuples, consumed lazily as slots free up
+            window: Maximum number of calls in flight (default: max_workers)
+            cancel_token: Stops the run when cancelled: calls not started are
+                dropped and calls still running are abandoned, their results
+                are discarded
+
+        Yields:
+            Return values of func in completion order
+
+        Raises:
+            Exception: The first exception raised by func; calls not started
+                yet are cancelled
+        """
+        window = max(1, min(window or self.max_workers, self.max_workers))
+        pending_items = iter(items)
+        in_flight: Set[Future] = set()
+        exhausted = False
+
+        # Completes on cancellation, waking the wait below
+        cancelled = Future()
+        unregister = cancel_token.on_cancel(lambda: cancelled.set_result(None)) if cancel_token else None
+        try:
+            while not cancelled.done():
+                while not exhausted and len(in_flight) < window:
+                    item = next(pending_items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    in_flight.add(self.submit(func, *item))
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight | {cancelled}, return_when=FIRST_COMPLETED)
+                for future in done - {cancelled}:
+                    in_flight.discard(future)
+                    yield future.result()
+        finally:
+            if unregister:
+                unregister()
+            for future in in_flight:
+                future.cancel()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the worker threads once queued calls have finished
+
+        Args:
+            wait: Block until every worker has exited
+        """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
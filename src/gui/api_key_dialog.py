@@ -22,7 +22,7 @@ class APIKeyDialog:
         """Show the API key dialog"""
         self.popup = ctk.CTkToplevel(self.parent)
         self.popup.title("Set API Key")
-        self.popup.geometry("400x200")
+        self.popup.geometry("460x200")
         self.popup.resizable(False, False)
         self.popup.transient(self.parent)
         self.popup.focus_force()
@@ -81,6 +81,14 @@ class APIKeyDialog:
         )
         ok_button.pack(side="left", padx=10)
         
+        # Add to key ring button
+        add_button = ctk.CTkButton(
+            button_frame, 
+            text="Add Key", 
+            command=self._add_key
+        )
+        add_button.pack(side="left", padx=10)
+        
         # Cancel button
         cancel_button = ctk.CTkButton(
             button_frame, 
@@ -131,6 +139,25 @@ class APIKeyDialog:
         except Exception as e:
             show_error(self.popup, "Error", f"Failed to save API Key: {str(e)}")
     
+    def _add_key(self):
+        """Add the API key to the key ring so requests are spread across keys"""
+        key = self.api_entry.get().strip()
+        
+        if not key:
+            show_error(self.popup, "Error", "API Key cannot be empty.")
+            return
+        
+        try:
+            if not self.encryption_manager.is_api_key_defined():
+                self.encryption_manager.save_api_key(key)
+            self.encryption_manager.add_api_key(key)
+            key_count = len(self.encryption_manager.load_api_keys())
+            show_success(self.popup, "Success", f"API Key added. {key_count} keys in use.")
+            self.update_callback()
+            self.popup.destroy()
+        except Exception as e:
+            show_error(self.popup, "Error", f"Failed to add API Key: {str(e)}")
+    
     def _cancel(self):
         """Cancel the dialog"""
         self.popup.destroy()
@@ -8,13 +8,22 @@ import subprocess
 import platform
 from tkinter import filedialog
 from typing import Dict, List, Callable, Optional
-from src.core.config import DEFAULT_OUTPUT_PATH, DEFAULT_FIELDS, DEFAULT_BATCH_SIZE, DEFAULT_BATCH_DELAY, DEFAULT_MAX_IPS
+from src.core.config import (
+    DEFAULT_OUTPUT_PATH, DEFAULT_FIELDS, DEFAULT_BATCH_SIZE, DEFAULT_MAX_IPS,
+    SCAN_ENGINE_ASYNCIO, SCAN_ENGINE_THREADED, DEFAULT_SCAN_ENGINE,
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_DAY, DEFAULT_REQUESTS_PER_MONTH,
+    SCAN_STOP_TIMEOUT
+)
+from src.core.checkpoint import ScanManifest
+from src.core.columnar import columnar_available
 from src.core.encryption import EncryptionManager
+from src.core.exporters import ResultSink
+from src.core.scan_stream import ScanUpdate, format_progress
 from src.core.scanner import IPScanner
 from src.gui.api_key_dialog import APIKeyDialog
 from src.gui.results_window import ResultsWindow
 from src.gui.utils import force_dark_titlebar
-from src.gui.custom_dialogs import show_error, show_info
+from src.gui.custom_dialogs import show_error, show_info, show_question
 
 
 class MainWindow:
@@ -25,6 +34,8 @@ class MainWindow:
         self.scanner = None
         self.encryption_manager = EncryptionManager()
         self.current_scan_thread = None
+        self.live_results_window = None
+        self._closing = False
         self._setup_gui()
     
     def _setup_gui(self):
@@ -133,6 +144,16 @@ class MainWindow:
         folder_icon = ctk.CTkLabel(ignore_frame, text="📂", cursor="hand2")
         folder_icon.pack(side="left", padx=(5, 0))
         folder_icon.bind("<Button-1>", lambda e: self._open_config_folder())
+        
+        # Scanning engine
+        self.async_engine_var = ctk.BooleanVar(value=DEFAULT_SCAN_ENGINE == SCAN_ENGINE_ASYNCIO)
+        
+        async_check = ctk.CTkCheckBox(
+            parent, 
+            text="Use asyncio engine", 
+            variable=self.async_engine_var
+        )
+        async_check.pack(anchor="w", padx=10, pady=5)
     
     def _create_scan_parameters(self, parent):
         """Create scan parameter controls"""
@@ -154,11 +175,24 @@ class MainWindow:
         self.batch_size_entry.insert(0, str(DEFAULT_BATCH_SIZE))
         self.batch_size_entry.pack(side="left", padx=5)
         
-        # Delay
-        ctk.CTkLabel(line, text="Delay (s):").pack(side="left", padx=(10, 0))
-        self.batch_delay_entry = ctk.CTkEntry(line, width=50)
-        self.batch_delay_entry.insert(0, str(DEFAULT_BATCH_DELAY))
-        self.batch_delay_entry.pack(side="left", padx=5)
+        # API quota
+        quota_line = ctk.CTkFrame(inputs_frame, fg_color="transparent")
+        quota_line.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(quota_line, text="Req/min:").pack(side="left")
+        self.requests_per_minute_entry = ctk.CTkEntry(quota_line, width=50)
+        self.requests_per_minute_entry.insert(0, str(DEFAULT_REQUESTS_PER_MINUTE))
+        self.requests_per_minute_entry.pack(side="left", padx=5)
+        
+        ctk.CTkLabel(quota_line, text="Req/day:").pack(side="left", padx=(10, 0))
+        self.requests_per_day_entry = ctk.CTkEntry(quota_line, width=50)
+        self.requests_per_day_entry.insert(0, str(DEFAULT_REQUESTS_PER_DAY))
+        self.requests_per_day_entry.pack(side="left", padx=5)
+        
+        ctk.CTkLabel(quota_line, text="Req/month:").pack(side="left", padx=(10, 0))
+        self.requests_per_month_entry = ctk.CTkEntry(quota_line, width=60)
+        self.requests_per_month_entry.insert(0, str(DEFAULT_REQUESTS_PER_MONTH))
+        self.requests_per_month_entry.pack(side="left", padx=5)
     
     def _create_field_selection(self, parent):
         """Create field selection controls"""
@@ -191,6 +225,15 @@ class MainWindow:
         )
         self.start_button.pack(side="left", expand=True, fill="x", padx=(0, 5))
         
+        self.resume_button = ctk.CTkButton(
+            scan_buttons_frame, 
+            text="⏯️ Resume Scan", 
+            corner_radius=10, 
+            command=lambda: self._start_scan(resume=True),
+            state="normal" if ScanManifest.exists() else "disabled"
+        )
+        self.resume_button.pack(side="left", expand=True, fill="x", padx=5)
+        
         show_results_button = ctk.CTkButton(
             scan_buttons_frame, 
             text="📊 Show Results", 
@@ -210,6 +253,9 @@ class MainWindow:
             font=("Arial", 14, "bold")
         ).pack(anchor="w", pady=5, padx=5)
         
+        self.progress_label = ctk.CTkLabel(log_section, text="", anchor="w")
+        self.progress_label.pack(anchor="w", padx=10)
+        
         self.log_textbox = ctk.CTkTextbox(
             log_section, 
             wrap="word", 
@@ -228,7 +274,10 @@ class MainWindow:
         """Choose output CSV path"""
         path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")]
+            filetypes=[
+                ("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"),
+                ("Compressed CSV files", "*.csv.gz"), ("Compressed JSON Lines files", "*.jsonl.gz")
+            ] + ([("Parquet files", "*.parquet"), ("Arrow files", "*.arrow")] if columnar_available() else [])
         )
         if path:
             self.output_path_var.set(path)
@@ -251,18 +300,20 @@ class MainWindow:
     def _update_api_indicator(self):
         """Update API key indicator"""
         if self.encryption_manager.is_api_key_defined():
-            self.api_key_indicator.configure(text="✅ API Key Set", text_color="green")
+            key_count = len(self.encryption_manager.load_api_keys())
+            text = "✅ API Key Set" if key_count <= 1 else f"✅ {key_count} API Keys Set"
+            self.api_key_indicator.configure(text=text, text_color="green")
         else:
             self.api_key_indicator.configure(text="🔴 No API Key", text_color="red")
     
-    def _start_scan(self):
-        """Start the scanning process"""
+    def _start_scan(self, resume: bool = False):
+        """Start the scanning process, or resume an interrupted scan"""
         if not self.encryption_manager.is_api_key_defined():
             show_error(self.app, "API Key Missing", "You must set your API Key before starting the scan.")
             return
         
         try:
-            api_key = self.encryption_manager.load_api_key()
+            api_keys = self.encryption_manager.load_api_keys()
         except Exception as e:
             show_error(self.app, "Error", f"Failed to load API Key: {str(e)}")
             return
@@ -271,7 +322,9 @@ class MainWindow:
         try:
             max_ips = int(self.max_ips_entry.get())
             batch_size = int(self.batch_size_entry.get())
-            batch_delay = int(self.batch_delay_entry.get())
+            requests_per_minute = int(self.requests_per_minute_entry.get())
+            requests_per_day = int(self.requests_per_day_entry.get())
+            requests_per_month = int(self.requests_per_month_entry.get())
         except ValueError:
             show_error(self.app, "Error", "All scan parameters must be numeric.")
             return
@@ -280,50 +333,109 @@ class MainWindow:
             show_error(self.app, "Error", "Batch size must be greater than 0.")
             return
         
+        if min(requests_per_minute, requests_per_day, requests_per_month) < 0:
+            show_error(self.app, "Error", "Quota limits cannot be negative (use 0 for no limit).")
+            return
+        
         # Get selected fields
         selected_fields = [f for f, v in self.field_vars.items() if v.get()]
         if not selected_fields:
             show_error(self.app, "Error", "You must select at least one field to export.")
             return
         
+        # A new scan needs the interrupted one out of the way
+        discard = False
+        if not resume and ScanManifest.exists():
+            answer = show_question(
+                self.app, "Interrupted Scan",
+                "An interrupted scan can still be resumed.\n\n"
+                "Discard it and start a new scan? Its results stay in the cache."
+            )
+            if answer != "yes":
+                return
+            discard = True
+        
         # Start scan in separate thread
-        self.scanner = IPScanner(api_key)
+        self.scanner = IPScanner(
+            api_keys,
+            pool_size=batch_size,
+            requests_per_minute=requests_per_minute,
+            requests_per_day=requests_per_day,
+            requests_per_month=requests_per_month
+        )
+        self.live_results_window = None
+        self.progress_label.configure(text="")
+        # Daemon, so a scan that does not stop in time never blocks exiting
         self.current_scan_thread = threading.Thread(
             target=self._run_scan,
-            args=(max_ips, batch_size, batch_delay, selected_fields)
+            args=(max_ips, batch_size, selected_fields, resume, discard),
+            daemon=True
         )
         self.current_scan_thread.start()
     
-    def _run_scan(self, max_ips: int, batch_size: int, batch_delay: int, selected_fields: List[str]):
-        """Run the scan in a separate thread"""
+    def _run_scan(
+        self,
+        max_ips: int,
+        batch_size: int,
+        selected_fields: List[str],
+        resume: bool = False,
+        discard: bool = False
+    ):
+        """Run the scan in a separate thread, showing and exporting results as they arrive"""
         try:
             self.start_button.configure(state="disabled", text="Scanning...")
+            self.resume_button.configure(state="disabled")
             
-            # Perform scan
-            results = self.scanner.scan_network_ips(
-                ignore_cache=self.ignore_var.get(),
-                max_ips=max_ips,
-                batch_size=batch_size,
-                batch_delay=batch_delay,
-                log_callback=self.log
-            )
+            if discard:
+                self.scanner.discard_resumable_scan(self.log)
             
-            if results:
-                # Export to CSV
-                self.scanner.export_to_csv(
-                    results=results,
-                    selected_fields=selected_fields,
-                    csv_path=self.output_path_var.get(),
-                    log_callback=self.log
+            # Perform scan
+            if resume:
+                updates = self.scanner.iter_resume_scan(self.log)
+            else:
+                updates = self.scanner.iter_scan(
+                    ignore_cache=self.ignore_var.get(),
+                    max_ips=max_ips,
+                    batch_size=batch_size,
+                    log_callback=self.log,
+                    engine=SCAN_ENGINE_ASYNCIO if self.async_engine_var.get() else SCAN_ENGINE_THREADED
                 )
-                
-                # Show results window
-                self.app.after(0, lambda: self._show_results_window(results))
+            
+            # Export one row per result as it arrives, in the format of the output file name;
+            # an export error is logged by the sink and the scan is drained all the same
+            sink = ResultSink(self.output_path_var.get(), selected_fields, self.log)
+            try:
+                for update in updates:
+                    sink.write(update.entry)
+                    if not self._closing:
+                        self.app.after(0, lambda u=update: self._show_scan_update(u))
+            finally:
+                # Keep what was scanned so far in the export
+                sink.close()
+            if not self._closing:
+                self.app.after(0, self._finish_live_results)
             
         except Exception as e:
             self.log(f"❌ Scan failed: {str(e)}")
         finally:
-            self.app.after(0, lambda: self.start_button.configure(state="normal", text="🚀 Start Scan"))
+            self.scanner.close()
+            if not self._closing:
+                resume_state = "normal" if ScanManifest.exists() else "disabled"
+                self.app.after(0, lambda: self.start_button.configure(state="normal", text="🚀 Start Scan"))
+                self.app.after(0, lambda: self.resume_button.configure(state=resume_state))
+    
+    def _show_scan_update(self, update: ScanUpdate):
+        """Show one result and the scan progress (main thread)"""
+        self.progress_label.configure(text=f"⏳ {format_progress(update.progress)}")
+        if self.live_results_window is None:
+            self.live_results_window = ResultsWindow(self.app, [], live=True)
+            self.live_results_window.show()
+        self.live_results_window.add_result(update.entry)
+    
+    def _finish_live_results(self):
+        """Sort the live results window once the scan is over (main thread)"""
+        if self.live_results_window is not None:
+            self.live_results_window.finish()
     
     def _show_results_window(self, results: List[Dict]):
         """Show results in a new window"""
@@ -346,6 +458,10 @@ class MainWindow:
     
     def log(self, message: str):
         """Add message to log"""
+        if self._closing:
+            # The window is going away; the main thread may be waiting on the scan
+            return
+        
         def update_log():
             self.log_textbox.configure(state="normal")
             self.log_textbox.insert("end", f"{message}\n")
@@ -359,9 +475,12 @@ class MainWindow:
     
     def _on_close(self):
         """Handle window close event"""
-        # Stop any running scan
+        # Stop any running scan and give it a moment to save its partial results
+        self._closing = True
         if self.scanner:
             self.scanner.stop_scanning()
+        if self.current_scan_thread and self.current_scan_thread.is_alive():
+            self.current_scan_thread.join(timeout=SCAN_STOP_TIMEOUT)
         
         # Clean up temp files
         from src.core.cache_manager import CacheManager
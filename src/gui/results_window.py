@@ -14,14 +14,17 @@ from ..core.ip_blocker import IPBlocker
 class ResultsWindow:
     """Window for displaying scan results"""
     
-    def __init__(self, parent, results: List[Dict]):
+    def __init__(self, parent, results: List[Dict], live: bool = False):
         self.parent = parent
         self.results = results
+        # A live window receives results while the scan runs and is not modal
+        self.live = live
         self.window = None
         self.selected_entry_frame = None
         self.ip_blocker = IPBlocker()
         self.show_cached = ctk.BooleanVar(value=False)
         self.filter_negative_reputation = ctk.BooleanVar(value=False)
+        self.shown_count = 0
         
         # UI components
         self.details_title = None
@@ -43,7 +46,8 @@ class ResultsWindow:
         self.window.lift()
         
         # Delay grab_set to ensure window is visible
-        self.window.after(100, self.window.grab_set)
+        if not self.live:
+            self.window.after(100, self.window.grab_set)
         
         # Apply dark theme and titlebar
         ctk.set_appearance_mode("Dark")
@@ -181,20 +185,47 @@ class ResultsWindow:
         
         # Apply reputation filter if enabled
         if self.filter_negative_reputation.get():
-            filtered_list = []
-            for entry in full_list:
-                reputation_score = entry.get("Reputation Score", "N/A")
-                if isinstance(reputation_score, int) and reputation_score < 0:
-                    filtered_list.append(entry)
-            full_list = filtered_list
+            full_list = [entry for entry in full_list if self._is_negative_reputation(entry)]
             
             # Update title to show filtered count
             self.ip_list_title.configure(text=f"🔴 Malicious IPs Found ({len(full_list)})")
         
         # Create IP entries
+        self.shown_count = len(full_list)
         for entry in sorted(full_list, key=lambda x: x.get("IP", "")):
             self._create_ip_entry(entry)
     
+    def add_result(self, entry: Dict):
+        """Add a result of the running scan, rendering it right away if it is shown"""
+        self.results.append(entry)
+        if not self.is_open() or self.show_cached.get():
+            return
+        
+        if self.filter_negative_reputation.get():
+            if not self._is_negative_reputation(entry):
+                return
+            self.shown_count += 1
+            self.ip_list_title.configure(text=f"🔴 Malicious IPs Found ({self.shown_count})")
+        else:
+            self.shown_count += 1
+            self.ip_list_title.configure(text=f"🌐 IPs Found ({self.shown_count})")
+        self._create_ip_entry(entry)
+    
+    def finish(self):
+        """The scan is over: show its results in the usual sorted order"""
+        self.live = False
+        if self.is_open():
+            self._refresh_list()
+    
+    def is_open(self) -> bool:
+        """Check whether the window is still shown"""
+        return self.window is not None and bool(self.window.winfo_exists())
+    
+    @staticmethod
+    def _is_negative_reputation(entry: Dict) -> bool:
+        reputation_score = entry.get("Reputation Score", "N/A")
+        return isinstance(reputation_score, int) and reputation_score < 0
+    
     def _create_ip_entry(self, entry: Dict):
         """Create an IP entry widget"""
         ip = entry.get("IP", "")
@@ -314,6 +345,7 @@ class ResultsWindow:
         self.details_content.delete("1.0", "end")
         
         # Basic info
+        self.details_content.insert("end", f"Processes: {entry.get('Processes', process_name)}\n")
         self.details_content.insert("end", f"Reputation Score: {entry.get('Reputation Score', 'N/A')}\n")
         self.details_content.insert("end", f"Country: {entry.get('Country', 'N/A')}\n")
         self.details_content.insert("end", f"ASN: {entry.get('ASN', 'N/A')}\n")
@@ -0,0 +1,235 @@
+"""
+Headless (command-line) runner for VirusTotal IP Analyzer
+
+Runs the same scan as the GUI without a display, for servers and scheduled jobs:
+
+    python main.py --headless --engine asyncio --output scan.csv
+
+The output format follows the file name: .csv, .jsonl, optionally gzip-compressed
+with a trailing .gz (scan.jsonl.gz), or .parquet/.arrow with pyarrow installed.
+"""
+import argparse
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import closing
+from typing import List, Optional
+from src.core.config import (
+    DEFAULT_OUTPUT_PATH, DEFAULT_FIELDS, DEFAULT_BATCH_SIZE, DEFAULT_MAX_IPS,
+    SCAN_ENGINES, DEFAULT_SCAN_ENGINE, MONITOR_INTERVAL, MONITOR_DEBOUNCE,
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_DAY, DEFAULT_REQUESTS_PER_MONTH
+)
+from src.core.cache_manager import CacheManager
+from src.core.columnar import detect_columnar_format
+from src.core.encryption import EncryptionManager
+from src.core.exporters import ResultSink, export_results
+from src.core.scanner import IPScanner
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """Create the command-line argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="main.py --headless",
+        description="Scan external IP connections with VirusTotal without the GUI"
+    )
+    parser.add_argument("--api-key", action="append", dest="api_keys", metavar="API_KEY",
+                        help="VirusTotal API key, repeat to spread requests across several keys "
+                             "(default: comma-separated $VT_API_KEY or the saved keys)")
+    parser.add_argument("--engine", choices=SCAN_ENGINES, default=DEFAULT_SCAN_ENGINE,
+                        help="Scanning engine to use")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume the last interrupted scan with its original parameters")
+    parser.add_argument("--discard-interrupted", action="store_true",
+                        help="Discard an interrupted scan (its results stay cached) and start a new one")
+    parser.add_argument("--ignore-cache", action="store_true", help="Ignore already scanned IPs")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="After the scan, revalidate cached IPs close to expiry with leftover quota "
+                             "(in monitor mode: in the background while monitoring)")
+    parser.add_argument("--max-ips", type=int, default=DEFAULT_MAX_IPS,
+                        help="Maximum number of IPs to scan (0 for no limit)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Number of IPs to scan in parallel")
+    parser.add_argument("--requests-per-minute", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="API quota per minute (0 for no limit)")
+    parser.add_argument("--requests-per-day", type=int, default=DEFAULT_REQUESTS_PER_DAY,
+                        help="API quota per day (0 for no limit)")
+    parser.add_argument("--requests-per-month", type=int, default=DEFAULT_REQUESTS_PER_MONTH,
+                        help="API quota per month (0 for no limit)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH,
+                        help="Output path (.csv, .jsonl, .csv.gz, .jsonl.gz, .parquet or .arrow)")
+    parser.add_argument("--fields", nargs="+", metavar="FIELD",
+                        help="Fields to export (default: the common fields for CSV, "
+                             "every field for JSON Lines, typed columns for Parquet/Arrow)")
+    parser.add_argument("--rotate-mb", type=float, default=0,
+                        help="Split the output into files of about this many MB (0 for one file)")
+    parser.add_argument("--export-cache", metavar="PATH",
+                        help="Export every cached entry to PATH and exit without scanning")
+    parser.add_argument("--partition-by-date", action="store_true",
+                        help="Write --output/--export-cache as a Parquet/Arrow dataset directory "
+                             "with one partition per scan date (needs pyarrow)")
+    parser.add_argument("--monitor", action="store_true",
+                        help="Keep running and look up new remote peers as they connect, "
+                             "writing each result to --output as it arrives (CSV or JSON Lines)")
+    parser.add_argument("--interval", type=float, default=MONITOR_INTERVAL,
+                        help="Seconds between two connection snapshots in monitor mode")
+    parser.add_argument("--debounce", type=float, default=MONITOR_DEBOUNCE,
+                        help="Seconds a new peer waits before it is looked up in monitor mode")
+    parser.add_argument("--project-fields", action="store_true",
+                        help="Only parse the exported fields from VirusTotal reports (faster, "
+                             "but cached entries then lack the other fields)")
+    return parser
+
+
+def _resolve_api_keys(args: argparse.Namespace) -> List[str]:
+    """Get the API keys from the arguments, the environment or the encrypted key ring"""
+    if args.api_keys:
+        return args.api_keys
+    if os.getenv("VT_API_KEY"):
+        return [key.strip() for key in os.getenv("VT_API_KEY").split(",") if key.strip()]
+
+    encryption_manager = EncryptionManager()
+    if encryption_manager.is_api_key_defined():
+        return encryption_manager.load_api_keys()
+    return []
+
+
+def _monitor(scanner: IPScanner, args: argparse.Namespace, rotate_bytes: int) -> int:
+    """Look up new peers until interrupted, writing each result as it arrives"""
+    # Results arrive from the worker threads, a few at a time; each one is
+    # written at once so the file can be followed while monitoring
+    write_lock = threading.Lock()
+    sink = ResultSink(args.output, args.fields, print, rotate_bytes=rotate_bytes, buffer_rows=1)
+
+    def on_result(entry, is_new):
+        with write_lock:
+            sink.write(entry)
+
+    try:
+        scanner.monitor(
+            batch_size=args.batch_size,
+            log_callback=print,
+            interval=args.interval,
+            debounce=args.debounce,
+            engine=args.engine,
+            fields=(args.fields or DEFAULT_FIELDS) if args.project_fields else None,
+            on_result=on_result,
+            refresh_cache=args.refresh_cache
+        )
+    except KeyboardInterrupt:
+        scanner.stop_scanning()
+        print("🛑 Monitoring interrupted")
+    finally:
+        with write_lock:
+            sink.close()
+    print(f"📄 {sink.rows} results written to: {args.output}")
+    return 1 if sink.failed else 0
+
+
+def _scan(scanner: IPScanner, args: argparse.Namespace, rotate_bytes: int) -> int:
+    """Run or resume a scan, writing each result to the output as its lookup completes"""
+    if args.resume:
+        updates = scanner.iter_resume_scan(print)
+    elif scanner.has_resumable_scan() and not args.discard_interrupted:
+        print("❌ An interrupted scan is pending. Use --resume to continue it, "
+              "or --discard-interrupted to start a new scan.")
+        return 2
+    else:
+        if args.discard_interrupted and scanner.has_resumable_scan():
+            scanner.discard_resumable_scan(print)
+        updates = scanner.iter_scan(
+            ignore_cache=args.ignore_cache,
+            max_ips=args.max_ips,
+            batch_size=args.batch_size,
+            log_callback=print,
+            engine=args.engine,
+            fields=(args.fields or DEFAULT_FIELDS) if args.project_fields else None
+        )
+
+    # An export error is logged by the sink, the scan still runs to the end and fills the cache
+    sink = ResultSink(args.output, args.fields, print, rotate_bytes=rotate_bytes,
+                      partitioned=args.partition_by_date)
+    summary = Counter()
+    try:
+        with closing(updates):
+            for update in updates:
+                sink.write(update.entry)
+                summary.update(scanner.get_scan_summary([update.entry]))
+    except KeyboardInterrupt:
+        scanner.stop_scanning()
+        print("🛑 Scan interrupted, run again with --resume to continue")
+        return 130
+    finally:
+        # Partial results are exported too
+        sink.close()
+    if sink.failed:
+        return 1
+
+    if args.refresh_cache:
+        try:
+            scanner.refresh_cache(print)
+        except KeyboardInterrupt:
+            print("🛑 Cache refresh interrupted")
+
+    print(
+        f"📊 {summary['total']} IPs: {summary['malicious']} malicious, "
+        f"{summary['suspicious']} suspicious, {summary['clean']} clean"
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run a scan from the command line and return the process exit code"""
+    args = _build_parser().parse_args(argv)
+
+    if args.batch_size <= 0:
+        print("❌ Batch size must be greater than 0.")
+        return 2
+
+    if min(args.requests_per_minute, args.requests_per_day, args.requests_per_month) < 0:
+        print("❌ Quota limits cannot be negative (use 0 for no limit).")
+        return 2
+
+    if args.rotate_mb < 0:
+        print("❌ Rotation size cannot be negative (use 0 for one file).")
+        return 2
+    rotate_bytes = int(args.rotate_mb * 1024 * 1024)
+
+    if args.monitor:
+        if args.interval <= 0 or args.debounce < 0:
+            print("❌ Monitor interval must be greater than 0 and debounce cannot be negative.")
+            return 2
+        if detect_columnar_format(args.output) or args.partition_by_date:
+            print("❌ Monitor mode appends results as they arrive, use a CSV or JSON Lines output.")
+            return 2
+
+    if args.export_cache:
+        # Reads the local cache only, no API key needed
+        cache_manager = CacheManager()
+        print(f"📦 Exporting {cache_manager.store.count()} cached entries...")
+        if not export_results(cache_manager.iter_cache(), args.fields, args.export_cache, print,
+                              rotate_bytes=rotate_bytes, partitioned=args.partition_by_date):
+            print("❌ Cache export failed")
+            return 1
+        return 0
+
+    api_keys = _resolve_api_keys(args)
+    if not api_keys:
+        print("❌ No API key set. Use --api-key, $VT_API_KEY or set one in the GUI.")
+        return 2
+
+    scanner = IPScanner(
+        api_keys,
+        pool_size=args.batch_size,
+        requests_per_minute=args.requests_per_minute,
+        requests_per_day=args.requests_per_day,
+        requests_per_month=args.requests_per_month
+    )
+    with scanner:
+        if args.monitor:
+            return _monitor(scanner, args, rotate_bytes)
+        return _scan(scanner, args, rotate_bytes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request latency of VirusTotal lookups with and without the pooled session
+
+Runs against a local stand-in HTTP server so no API quota is used. The stand-in
+speaks plain HTTP, so the numbers only show the TCP connect savings; against
+virustotal.com the pooled session also skips a TLS handshake per lookup.
+
+Usage: python tests/bench_http_pool.py [requests] [workers]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.api_client import VirusTotalClient  # noqa: E402
+
+PAYLOAD = json.dumps({
+    "data": {
+        "attributes": {
+            "reputation": 0,
+            "country": "US",
+            "asn": 15169,
+            "as_owner": "GOOGLE",
+            "last_analysis_date": 1700000000,
+            "last_analysis_stats": {"malicious": 0, "suspicious": 0, "harmless": 80},
+            "total_votes": {"malicious": 0, "harmless": 3},
+            "last_analysis_results": {
+                f"Engine{i}": {"category": "harmless", "result": "clean"} for i in range(90)
+            },
+        }
+    }
+}).encode()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a canned VirusTotal IP report"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _unpooled_query(base_url: str, ip: str) -> None:
+    """The previous behaviour: a fresh connection for every lookup"""
+    response = requests.get(f"{base_url}/{ip}", headers={"x-apikey": "bench"}, timeout=30)
+    response.json()
+
+
+def _run(label: str, func, count: int, workers: int) -> None:
+    latencies = []
+    lock = threading.Lock()
+
+    def timed(i: int):
+        start = time.perf_counter()
+        func(f"8.8.{i // 256 % 256}.{i % 256}")
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(timed, range(count)))
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    mean_ms = sum(latencies) / len(latencies) * 1000
+    p95_ms = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{label:<10} total {total:6.2f}s   mean {mean_ms:6.2f}ms   p95 {p95_ms:6.2f}ms")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v3/ip_addresses"
+
+    print(f"🔍 {count} lookups, {workers} workers against {base_url}")
+    print("=" * 50)
+
+    _run("unpooled", lambda ip: _unpooled_query(base_url, ip), count, workers)
+
+    with VirusTotalClient("bench", pool_size=workers, base_url=base_url) as client:
+        _run("pooled", lambda ip: client.query_ip(ip, lambda msg: None), count, workers)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark collecting established connections from netlink and /proc/net against parsing ss output
+
+The parsers run on recorded fixtures (tests/fixtures/proc_net_*.txt and
+ss_tupn_established.txt) repeated up to the requested number of sockets, so
+the parsing cost is compared on the same connections; the netlink replies
+are encoded from the /proc/net fixtures. On Linux the live collectors are
+timed as well, including the fork/exec of ss and the socket owner lookup
+with and without the incremental index.
+
+Usage: python tests/bench_proc_net.py [sockets]
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.network_scanner import NetworkScanner  # noqa: E402
+from src.core.proc_net import SocketOwnerIndex, parse_proc_net, read_established  # noqa: E402
+from src.core.sock_diag import (  # noqa: E402
+    SOCK_DIAG_BY_FAMILY, _DIAG_RECORD, parse_diag_messages, read_established_netlink
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PROC_FIXTURES = (("proc_net_tcp.txt", "tcp"), ("proc_net_tcp6.txt", "tcp"), ("proc_net_udp.txt", "udp"))
+SS_FIXTURE = "ss_tupn_established.txt"
+
+
+def _read(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _scale(text: str, sockets: int) -> str:
+    """Repeat the data lines of a table until it holds about this many lines"""
+    header, *lines = text.splitlines()
+    copies = max(1, sockets // max(1, len(lines)))
+    return "\n".join([header] + lines * copies) + "\n"
+
+
+def _diag_reply(sockets) -> bytes:
+    """Encode sockets the way the kernel answers a sock_diag dump"""
+    records = []
+    for sock in sockets:
+        family = socket.AF_INET6 if ":" in sock.local_ip else socket.AF_INET
+        local, remote = (
+            # IPv4-mapped peers of IPv6 sockets were decoded to plain IPv4
+            socket.inet_pton(family, ip if family == socket.AF_INET or ":" in ip else "::ffff:" + ip).ljust(16, b"\0")
+            for ip in (sock.local_ip, sock.remote_ip)
+        )
+        records.append(_DIAG_RECORD.pack(
+            _DIAG_RECORD.size, SOCK_DIAG_BY_FAMILY, 2, 1, 0, family, 1, 0, 0,
+            sock.local_port >> 8, sock.local_port & 0xFF, sock.remote_port >> 8, sock.remote_port & 0xFF,
+            local, remote, 0, 0, 0, 0, 1000, sock.inode
+        ))
+    return b"".join(records)
+
+
+def _time(label: str, func) -> float:
+    per_call = min(timeit.repeat(func, number=1, repeat=5))
+    print(f"{label:<36} {per_call * 1000:8.1f} ms")
+    return per_call
+
+
+def _run_ss(scanner: NetworkScanner):
+    result = subprocess.run("ss -tupn state established", shell=True, capture_output=True, text=True, timeout=30)
+    return scanner._parse_unix_output(result.stdout, lambda _: None, is_ss=True)
+
+
+def main() -> None:
+    sockets = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    scanner = NetworkScanner()
+
+    # Spread the sockets over the tables like the fixtures do
+    proc_texts = [(_read(name), protocol) for name, protocol in PROC_FIXTURES]
+    recorded = sum(len(text.splitlines()) - 1 for text, _ in proc_texts)
+    proc_tables = [
+        (_scale(text, sockets * (len(text.splitlines()) - 1) // recorded), protocol)
+        for text, protocol in proc_texts
+    ]
+    ss_text = _scale(_read(SS_FIXTURE), sockets * (len(_read(SS_FIXTURE).splitlines()) - 1) // recorded)
+
+    def parse_proc():
+        sockets = [sock for text, protocol in proc_tables for sock in parse_proc_net(text, protocol)]
+        return scanner._map_sockets(sockets, {})
+
+    diag_reply = _diag_reply(sock for text, protocol in proc_tables for sock in parse_proc_net(text, protocol))
+
+    def parse_netlink():
+        sockets = []
+        parse_diag_messages(diag_reply, "tcp", {}, sockets)
+        return scanner._map_sockets(sockets, {})
+
+    def parse_ss():
+        return scanner._parse_unix_output(ss_text, lambda _: None, is_ss=True)
+
+    print(f"Recorded fixtures scaled to about {sockets} sockets\n")
+    ss_time = _time("ss text, parse", parse_ss)
+    proc_time = _time("/proc/net tables, parse", parse_proc)
+    netlink_time = _time("netlink replies, parse", parse_netlink)
+    print(f"\nSpeedup of /proc/net parsing: {ss_time / proc_time:.1f}x, netlink: {ss_time / netlink_time:.1f}x")
+
+    if not os.path.exists("/proc/net/tcp"):
+        print("\n/proc/net is not available, skipping the live runs")
+        return
+    inodes = [sock.inode for sock in read_established()]
+    print(f"\nLive host ({len(inodes)} established sockets)")
+    _time("/proc/net, read and parse", read_established)
+    try:
+        _time("netlink sock_diag, query and parse", read_established_netlink)
+    except OSError as e:
+        print(f"netlink sock_diag unavailable: {e}")
+    _time("socket owners, full walk", lambda: SocketOwnerIndex().resolve(inodes))
+    index = SocketOwnerIndex()
+    index.resolve(inodes)
+    _time("socket owners, incremental refresh", lambda: index.resolve(inodes))
+    if shutil.which("ss"):
+        _time("ss, fork/exec and parse", lambda: _run_ss(scanner))
+
+
+if __name__ == "__main__":
+    main()
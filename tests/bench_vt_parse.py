@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark decoding and parsing of a large VirusTotal IP report
+
+Parses tests/fixtures/vt_ip_report.json (a full v3 report with whois, HTTPS
+certificate and 93 engine verdicts) with the standard json module and, when
+installed, orjson, each with all fields and projected to the default export
+fields.
+
+Usage: python tests/bench_vt_parse.py [iterations]
+"""
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.analysis_results as analysis_results  # noqa: E402
+from src.core import api_client  # noqa: E402
+from src.core.api_client import get_projection, parse_vt_response  # noqa: E402
+from src.core.config import DEFAULT_FIELDS  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "vt_ip_report.json")
+
+
+def _run(label: str, decode, projection, body: bytes, iterations: int) -> float:
+    def parse():
+        parse_vt_response(decode(body)["data"], projection)
+
+    per_call = min(timeit.repeat(parse, number=iterations, repeat=5)) / iterations
+    print(f"{label:<32} {per_call * 1e6:8.1f} µs/report")
+    return per_call
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with open(FIXTURE, "rb") as f:
+        body = f.read()
+
+    # Keep the interned strings out of the real tables file
+    analysis_results._tables = analysis_results.StringTables(
+        os.path.join(tempfile.mkdtemp(), "analysis_tables.json")
+    )
+    projection = get_projection(DEFAULT_FIELDS)
+
+    print(f"Report size: {len(body)} bytes, {iterations} iterations\n")
+    baseline = _run("json, all fields", json.loads, None, body, iterations)
+    _run("json, export fields", json.loads, projection, body, iterations)
+
+    if api_client.orjson is None:
+        print("\norjson is not installed, skipping the orjson runs")
+        return
+    _run("orjson, all fields", api_client.orjson.loads, None, body, iterations)
+    fastest = _run("orjson, export fields", api_client.orjson.loads, projection, body, iterations)
+    print(f"\nSpeedup of orjson with projection: {baseline / fastest:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Tests for the compact per-engine analysis results
+"""
+import json
+import threading
+
+import pytest
+
+import src.core.analysis_results as analysis_results
+from src.core.analysis_results import AnalysisResults, StringTables, compact_entry, json_default
+from src.core.freshness import EXPIRES_AT
+
+
+@pytest.fixture(autouse=True)
+def private_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_results, "_tables", StringTables(str(tmp_path / "tables.json")))
+
+
+def test_behaves_like_the_original_dict():
+    original = {"Kaspersky": "harmless (clean)", "ESET": "malicious (malware)", "Avira": "harmless (clean)"}
+    results = AnalysisResults.encode(original.items())
+
+    assert results == original
+    assert results["ESET"] == "malicious (malware)"
+    assert list(results) == ["Kaspersky", "ESET", "Avira"]
+    assert results.get("Sophos", "N/A") == "N/A"
+
+
+def test_round_trips_through_json_as_codes(tmp_path):
+    entry = {"IP": "8.8.8.8", "Analysis Results": AnalysisResults.encode([("ESET", "harmless (clean)")])}
+
+    stored = json.loads(json.dumps(entry, default=json_default))
+    assert stored["Analysis Results"] == [analysis_results.get_tables().table_id, 0, 0]
+
+    # Codes are persisted, so another process decodes them the same way
+    analysis_results._tables = StringTables(str(tmp_path / "tables.json"))
+    assert compact_entry(stored)["Analysis Results"] == {"ESET": "harmless (clean)"}
+
+
+def test_legacy_dict_entries_are_compacted():
+    entry = compact_entry({"Analysis Results": {"ESET": "harmless (clean)"}})
+    assert isinstance(entry["Analysis Results"], AnalysisResults)
+    assert dict(entry["Analysis Results"].items()) == {"ESET": "harmless (clean)"}
+
+
+def test_codes_of_lost_tables_are_fetched_again(tmp_path):
+    entry = {"IP": "8.8.8.8", EXPIRES_AT: 2_000_000_000,
+             "Analysis Results": AnalysisResults.encode([("ESET", "harmless (clean)")])}
+    stored = json.dumps(entry, default=json_default)
+
+    # The tables file was deleted: the codes cannot be trusted
+    analysis_results._tables = StringTables(str(tmp_path / "new_tables.json"))
+    entry = compact_entry(json.loads(stored))
+    assert "Analysis Results" not in entry
+    assert entry[EXPIRES_AT] == 0
+
+
+def test_codes_never_saved_are_rejected():
+    tables = analysis_results.get_tables()
+    assert not tables.is_valid(tables.table_id, [0, 0])
+    AnalysisResults.encode([("ESET", "harmless (clean)")])
+    assert tables.is_valid(tables.table_id, [0, 0])
+    assert not tables.is_valid(tables.table_id, [1, 0])
+
+
+def test_codes_beyond_two_bytes():
+    results = AnalysisResults([70000, 1])
+    assert results.to_codes() == [70000, 1]
+
+
+def test_processes_sharing_the_file_never_reuse_a_code(tmp_path):
+    # Two tables on one file stand for the GUI and a headless monitor
+    path = str(tmp_path / "shared.json")
+    first, second = StringTables(path), StringTables(path)
+    assert first.table_id == second.table_id
+
+    def add(tables, prefix):
+        for i in range(50):
+            tables.code("engines", f"{prefix}{i}")
+
+    threads = [threading.Thread(target=add, args=(tables, prefix)) for tables, prefix in ((first, "a"), (second, "b"))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(path, encoding="utf-8") as f:
+        stored = json.load(f)["engines"]
+    assert len(stored) == len(set(stored)) == 100
+    for tables in (first, second, StringTables(path)):
+        assert all(tables.text("engines", tables.code("engines", text)) == text for text in stored)
+        assert [tables.code("engines", text) for text in stored] == list(range(100))
@@ -0,0 +1,178 @@
+"""
+Tests for the asyncio scanning engine against a local HTTP stub
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core.async_scanner import AsyncClientPool, is_async_engine_available, scan_ips_async
+from src.core.cancellation import CancelToken
+from src.core.key_pool import ClientPool, KeyUsage
+
+pytestmark = pytest.mark.skipif(not is_async_engine_available(), reason="aiohttp is not installed")
+
+REPORT = json.dumps({"data": {"attributes": {
+    "country": "US", "last_analysis_date": 1700000000,
+    "last_analysis_stats": {"malicious": 0, "suspicious": 0, "harmless": 70}
+}}}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers lookups with a clean report
+
+    IPs in throttled get a 429 on their first request; requests for IPs in
+    hanging wait until release is set.
+    """
+    protocol_version = "HTTP/1.1"
+
+    lock = threading.Lock()
+    requests = []
+    in_flight = 0
+    max_in_flight = 0
+    throttled = set()
+    hanging = set()
+    release = threading.Event()
+
+    def do_GET(self):
+        ip = self.path.rsplit("/", 1)[-1]
+        cls = StubHandler
+        with cls.lock:
+            cls.requests.append(ip)
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            if ip in cls.hanging:
+                cls.release.wait(10)
+            else:
+                time.sleep(0.01)
+            if ip in cls.throttled:
+                cls.throttled.discard(ip)
+                self._reply(429, b"{}", {"Retry-After": "0"})
+            else:
+                self._reply(200, REPORT)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    StubHandler.requests = []
+    StubHandler.in_flight = StubHandler.max_in_flight = 0
+    StubHandler.throttled = set()
+    StubHandler.hanging = set()
+    StubHandler.release = threading.Event()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/ip_addresses"
+    StubHandler.release.set()
+    server.shutdown()
+
+
+@pytest.fixture
+def make_pool(tmp_path, base_url):
+    def make(api_keys=("async-key",)):
+        return ClientPool(
+            list(api_keys), requests_per_minute=0, requests_per_day=0, requests_per_month=0,
+            base_url=base_url, usage=KeyUsage(str(tmp_path / "usage.json"))
+        )
+    return make
+
+
+def scan(pool, ips, max_in_flight=4, cancel_token=None, logs=None):
+    async def run():
+        async with AsyncClientPool(pool, max_in_flight) as client:
+            return await scan_ips_async(
+                client, {ip: "curl" for ip in ips}, {}, max_in_flight,
+                (logs if logs is not None else []).append, cancel_token or CancelToken()
+            )
+    return asyncio.run(run())
+
+
+def test_every_ip_is_looked_up_with_bounded_concurrency(make_pool):
+    ips = [f"10.0.0.{i}" for i in range(20)]
+    results = scan(make_pool(), ips, max_in_flight=4)
+
+    assert sorted(r["IP"] for r in results) == sorted(ips)
+    assert all(r["Country"] == "US" and r["Engines Harmless"] == 70 for r in results)
+    assert sorted(StubHandler.requests) == sorted(ips)
+    assert StubHandler.max_in_flight <= 4
+
+
+def test_throttled_lookup_is_retried(make_pool):
+    StubHandler.throttled = {"8.8.8.8"}
+    logs = []
+    [result] = scan(make_pool(("throttled-key",)), ["8.8.8.8"], logs=logs)
+
+    assert result["Country"] == "US"
+    assert StubHandler.requests == ["8.8.8.8", "8.8.8.8"]
+    assert any("Rate limit hit" in message for message in logs)
+
+
+def test_cancelling_stops_lookups_in_flight(make_pool):
+    ips = [f"10.0.1.{i}" for i in range(50)]
+    StubHandler.hanging = set(ips)
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel).start()
+
+    started = time.monotonic()
+    assert scan(make_pool(), ips, max_in_flight=4, cancel_token=token) == []
+    assert time.monotonic() - started < 5
+    # Only the lookups in flight were started, the queued IPs were dropped
+    assert len(StubHandler.requests) <= 4
+
+
+def test_failed_open_closes_the_sessions_already_opened(make_pool):
+    pool = make_pool(("first-key", "second-key"))
+    client = AsyncClientPool(pool, 2)
+    first, second = client.clients
+
+    async def fail():
+        raise OSError("no session")
+    second.__aenter__ = fail
+
+    async def run():
+        async with client:
+            pass
+
+    with pytest.raises(OSError):
+        asyncio.run(run())
+    assert first.session.closed
+
+
+def test_threaded_and_async_lookups_share_one_call(make_pool):
+    pool = make_pool(("shared-key",))
+    StubHandler.hanging = {"8.8.8.8"}
+    threaded = []
+    thread = threading.Thread(target=lambda: threaded.append(pool.query_ip("8.8.8.8", lambda _: None)))
+    thread.start()
+    while not StubHandler.requests:
+        time.sleep(0.01)
+
+    async def lookup():
+        async with AsyncClientPool(pool, 1) as client:
+            return await client.query_ip("8.8.8.8", lambda _: None)
+
+    threading.Timer(0.2, StubHandler.release.set).start()
+    result = asyncio.run(lookup())
+    thread.join()
+
+    assert result == threaded[0] and result[0]["Country"] == "US"
+    assert StubHandler.requests == ["8.8.8.8"]
+    pool.close()
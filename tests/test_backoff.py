@@ -0,0 +1,81 @@
+"""
+Tests for the shared 429 backoff controller
+"""
+import threading
+import time
+
+from src.core.backoff import BackoffController, parse_retry_after
+from src.core.cancellation import CancelToken
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("30") == 30
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_after_pauses_every_worker():
+    clock = FakeClock()
+    backoff = BackoffController(base_delay=10, max_delay=600, clock=clock)
+
+    assert backoff.on_throttled({"Retry-After": "42"}) == 42
+    assert backoff.time_until_resume() == 42
+    clock.now = 40
+    assert backoff.time_until_resume() == 2
+
+
+def test_exponential_backoff_with_jitter():
+    clock = FakeClock()
+    backoff = BackoffController(base_delay=10, max_delay=600, clock=clock)
+
+    delays = []
+    for _ in range(4):
+        delays.append(backoff.on_throttled({}))
+        clock.now += delays[-1]
+    for n, delay in enumerate(delays):
+        assert 10 * 2 ** n / 2 <= delay <= 10 * 2 ** n
+
+    backoff.observe({})
+    assert 5 <= backoff.on_throttled({}) <= 10
+
+
+def test_concurrent_throttles_are_not_double_counted():
+    clock = FakeClock()
+    backoff = BackoffController(clock=clock)
+
+    backoff.on_throttled({"Retry-After": "30"})
+    clock.now = 10
+    backoff.on_throttled({"Retry-After": "30"})
+
+    stats = backoff.get_stats()
+    assert stats["throttle_events"] == 2
+    assert stats["throttled_seconds"] == 40
+
+
+def test_exhausted_quota_header_pauses_before_429():
+    clock = FakeClock()
+    backoff = BackoffController(clock=clock)
+
+    backoff.observe({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "25"})
+    assert backoff.time_until_resume() == 25
+
+
+def test_wait_returns_when_cancelled():
+    clock = FakeClock()
+    backoff = BackoffController(clock=clock)
+    backoff.on_throttled({"Retry-After": "60"})
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+
+    begin = time.monotonic()
+    backoff.wait(token)
+    assert time.monotonic() - begin < 1
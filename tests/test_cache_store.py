@@ -0,0 +1,110 @@
+"""
+Tests for the SQLite cache backend
+"""
+import json
+
+from src.core.analysis_results import compact_entry, json_default
+from src.core.cache_manager import CacheManager
+from src.core.cache_store import SqliteCacheStore
+
+
+def make_entry(ip, malicious=0):
+    return {"IP": ip, "Process Name": "curl", "Engines Malicious": malicious, "Analysis Results": {}}
+
+
+def test_upsert_and_lookup(tmp_path):
+    store = SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None)
+
+    assert store.put_many({"8.8.8.8": make_entry("8.8.8.8"), "1.1.1.1": make_entry("1.1.1.1")})
+    store.put_many({"8.8.8.8": make_entry("8.8.8.8", malicious=3)})
+
+    assert store.count() == 2
+    assert store.contains("1.1.1.1")
+    assert not store.contains("9.9.9.9")
+    assert store.get("8.8.8.8")["Engines Malicious"] == 3
+    assert store.get("9.9.9.9") is None
+
+    store.delete_many(["1.1.1.1"])
+    assert store.ips() == ["8.8.8.8"]
+
+
+def test_json_cache_migrated_once(tmp_path):
+    json_file = tmp_path / "ip_cache.json"
+    json_file.write_text(json.dumps({"8.8.8.8": make_entry("8.8.8.8")}))
+
+    store = SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=str(json_file))
+    assert store.get("8.8.8.8")["Process Name"] == "curl"
+    assert not json_file.exists()
+    assert (tmp_path / "ip_cache.json.migrated").exists()
+    store.close()
+
+    reopened = SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=str(json_file))
+    assert reopened.count() == 1
+
+
+def test_cache_manager_api_on_sqlite(tmp_path):
+    manager = CacheManager(SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None))
+
+    manager.add_to_cache("8.8.8.8", make_entry("8.8.8.8"))
+    manager.add_many({"1.1.1.1": make_entry("1.1.1.1")})
+
+    assert manager.is_ip_cached("8.8.8.8")
+    assert manager.get_cached_ips() == {"8.8.8.8", "1.1.1.1"}
+    assert set(manager.load_cache()) == {"8.8.8.8", "1.1.1.1"}
+
+    manager.save_cache({"1.1.1.1": make_entry("1.1.1.1")})
+    assert manager.get_cached_ips() == {"1.1.1.1"}
+
+
+def test_cache_manager_sees_writes_from_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.cache_manager.CACHE_CHANGE_CHECK_INTERVAL", 0)
+    manager = CacheManager(SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None))
+    manager.add_to_cache("8.8.8.8", make_entry("8.8.8.8"))
+
+    # A second connection stands in for another process writing to the same file
+    other = SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None)
+    other.put_many({"1.1.1.1": make_entry("1.1.1.1")})
+
+    assert manager.is_ip_cached("1.1.1.1")
+    assert manager.get_cached_entry("8.8.8.8")["IP"] == "8.8.8.8"
+
+
+def test_bounded_cache_evicts_least_recently_used(tmp_path):
+    store = SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None)
+    manager = CacheManager(store, max_entries=2, max_bytes=0)
+
+    manager.add_many({"1.1.1.1": make_entry("1.1.1.1"), "8.8.8.8": make_entry("8.8.8.8")})
+    assert manager.get_cached_entry("1.1.1.1") is not None
+    manager.add_to_cache("9.9.9.9", make_entry("9.9.9.9"))
+
+    assert manager.get_cached_ips() == {"1.1.1.1", "9.9.9.9"}
+    assert not store.contains("8.8.8.8")
+    assert manager.get_cached_entry("8.8.8.8") is None
+
+    stats = manager.get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_bounded_cache_respects_byte_budget(tmp_path):
+    # Size of the stored form, analysis results tagged with their table id
+    entry_size = len(json.dumps(compact_entry(make_entry("10.0.0.0")), default=json_default))
+    manager = CacheManager(
+        SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None),
+        max_entries=0, max_bytes=3 * entry_size, policy="lfu"
+    )
+    manager.add_many({f"10.0.0.{i}": make_entry(f"10.0.0.{i}") for i in range(3)})
+    manager.get_cached_entry("10.0.0.0")
+    manager.get_cached_entry("10.0.0.1")
+    manager.add_to_cache("10.0.0.3", make_entry("10.0.0.3"))
+
+    assert manager.get_cached_ips() == {"10.0.0.0", "10.0.0.1", "10.0.0.3"}
+    assert manager.get_cache_stats()["cached_bytes"] <= 3 * entry_size
+
+
+def test_iter_entries_reads_in_batches(tmp_path):
+    store = SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None)
+    ips = [f"10.0.0.{i}" for i in range(25)]
+    store.put_many({ip: make_entry(ip) for ip in ips})
+
+    assert sorted(ip for ip, _ in store.iter_entries(batch_size=10)) == sorted(ips)
+    assert sum(1 for _ in store.iter_entries(batch_size=5)) == 25
@@ -0,0 +1,108 @@
+"""
+Tests for journaling scan results while a scan runs
+"""
+import os
+import subprocess
+import sys
+
+from src.core.cache_manager import CacheManager
+from src.core.cache_store import SqliteCacheStore
+from src.core.checkpoint import (
+    ScanCheckpoint, ScanJournal, ScanManifest, find_orphaned_journals, new_journal_file
+)
+
+
+def make_entry(ip):
+    return {
+        "IP": ip, "Process Name": "curl", "Last Analysis Date": "N/A",
+        "Engines Malicious": 0, "Engines Suspicious": 0, "Engines Harmless": 0, "Analysis Results": {}
+    }
+
+
+def make_manager(tmp_path):
+    manager = CacheManager(SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None))
+    manager.temp_file = str(tmp_path / "temp_scan_results.json")
+    return manager
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = ScanJournal(str(tmp_path / "journal.jsonl"))
+    journal.append(make_entry("8.8.8.8"), True)
+    journal.close()
+    with open(journal.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"entry": {"IP": "1.1.')
+
+    assert [r["entry"]["IP"] for r in journal.replay()] == ["8.8.8.8"]
+
+
+def test_results_reach_the_cache_in_batches(tmp_path):
+    manager = make_manager(tmp_path)
+    journal = ScanJournal(str(tmp_path / "journal.jsonl"), sync_every=2)
+    checkpoint = ScanCheckpoint(manager, journal, compact_every=2)
+
+    checkpoint.record(make_entry("8.8.8.8"), True)
+    assert not manager.is_ip_cached("8.8.8.8")
+    assert len(journal.replay()) == 1
+
+    checkpoint.record(make_entry("1.1.1.1"), False)
+    assert manager.is_ip_cached("8.8.8.8")
+    assert not manager.is_ip_cached("1.1.1.1")
+    assert journal.replay() == []
+    assert len(manager.load_temp_results()) == 2
+
+
+def test_interrupted_scan_is_recovered(tmp_path):
+    journal_file = str(tmp_path / "journal.jsonl")
+    crashed = ScanCheckpoint(make_manager(tmp_path), ScanJournal(journal_file), compact_every=100)
+    crashed.record(make_entry("8.8.8.8"), True)
+    crashed.record(make_entry("9.9.9.9"), True)
+    # The process dies here: nothing was compacted
+
+    manager = make_manager(tmp_path)
+    assert ScanCheckpoint(manager, ScanJournal(journal_file)).recover(lambda message: None) == 2
+    assert manager.get_cached_ips() == {"8.8.8.8", "9.9.9.9"}
+    assert ScanJournal(journal_file).replay() == []
+
+
+def test_manifest_tracks_remaining_ips(tmp_path):
+    manifest_file = str(tmp_path / "manifest.json")
+    manifest = ScanManifest({"8.8.8.8": "curl", "1.1.1.1": "ssh", "9.9.9.9": "git"}, {"batch_size": 2}, manifest_file=manifest_file)
+    checkpoint = ScanCheckpoint(
+        make_manager(tmp_path), ScanJournal(str(tmp_path / "journal.jsonl")), compact_every=100, manifest=manifest
+    )
+    checkpoint.record(make_entry("8.8.8.8"), True)
+    # A failed lookup is retried on resume
+    checkpoint.record({"IP": "1.1.1.1", "Process Name": "ssh"}, False)
+    checkpoint.close()
+
+    resumed = ScanManifest.load(manifest_file)
+    assert resumed.params == {"batch_size": 2}
+    assert list(resumed.remaining()) == ["1.1.1.1", "9.9.9.9"]
+
+
+def test_compaction_appends_only_new_results(tmp_path):
+    manager = make_manager(tmp_path)
+    appended = []
+    append_temp_results = manager.append_temp_results
+    manager.append_temp_results = lambda results: appended.append(len(results)) or append_temp_results(results)
+    checkpoint = ScanCheckpoint(manager, ScanJournal(str(tmp_path / "journal.jsonl")), compact_every=2)
+
+    for i in range(5):
+        checkpoint.record(make_entry(f"10.0.0.{i}"), True)
+    checkpoint.close()
+
+    assert appended == [2, 2, 1]
+    assert [r["IP"] for r in manager.load_temp_results()] == [f"10.0.0.{i}" for i in range(5)]
+
+
+def test_only_journals_of_dead_runs_are_orphaned(tmp_path):
+    journal_dir = str(tmp_path / "journals")
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    dead = os.path.join(journal_dir, f"scan-{exited.pid}-a.jsonl")
+    resumable = os.path.join(journal_dir, f"scan-{exited.pid}-b.jsonl")
+    alive = new_journal_file("monitor", journal_dir)
+    for path in (dead, resumable, alive):
+        open(path, "w").close()
+
+    assert find_orphaned_journals(journal_dir, keep=[resumable], legacy_journal=None) == [dead]
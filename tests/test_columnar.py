@@ -0,0 +1,94 @@
+"""
+Tests for the Parquet/Arrow export
+"""
+from datetime import date, datetime, timezone
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.dataset as pa_dataset  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+from src.core.columnar import write_columnar  # noqa: E402
+from src.core.config import EXPORT_READ_BATCH  # noqa: E402
+from src.core.exporters import ResultSink  # noqa: E402
+
+DAY = 24 * 60 * 60
+FETCHED_AT = int(datetime(2024, 5, 1, 12, tzinfo=timezone.utc).timestamp())
+
+
+def make_entry(i, days_ago=0):
+    return {
+        "IP": f"10.0.0.{i}", "Process Name": "curl", "Reputation Score": "N/A" if i % 2 else -5,
+        "Country": "US" if i % 2 else "DE", "ASN Owner": "EXAMPLE-AS", "Last Analysis Date": "30/04/2024",
+        "Engines Malicious": i, "Engines Suspicious": 0, "Engines Harmless": 60,
+        "Fetched At": FETCHED_AT - days_ago * DAY
+    }
+
+
+def test_typed_columns(tmp_path):
+    path = str(tmp_path / "scan.parquet")
+    assert write_columnar((make_entry(i) for i in range(5)), path, batch_rows=2) == 5
+
+    table = pq.read_table(path)
+    assert table.schema.field("Engines Malicious").type == pa.int64()
+    assert pa.types.is_dictionary(table.schema.field("Country").type)
+    assert pa.types.is_timestamp(table.schema.field("Last Analysis Date").type)
+    assert table.column("Reputation Score").to_pylist() == [-5, None, -5, None, -5]
+    assert table.column("Country").to_pylist() == ["DE", "US", "DE", "US", "DE"]
+
+
+def test_arrow_file_keeps_one_dictionary_across_batches(tmp_path):
+    path = str(tmp_path / "scan.arrow")
+    write_columnar((make_entry(i) for i in range(5)), path, batch_rows=1)
+
+    table = pa.ipc.open_file(path).read_all()
+    assert table.column("Country").to_pylist() == ["DE", "US", "DE", "US", "DE"]
+
+
+def test_partitioned_by_scan_date(tmp_path):
+    path = str(tmp_path / "history.parquet")
+    # Entries fetched on earlier days belong to the scan that exported them
+    write_columnar([make_entry(1), make_entry(2, days_ago=1)], path, partitioned=True, scan_date=date(2024, 5, 1))
+    write_columnar([make_entry(3)], path, partitioned=True, scan_date=date(2024, 5, 2))
+
+    dataset = pa_dataset.dataset(path, format="parquet", partitioning="hive")
+    first = dataset.to_table(columns=["IP", "Fetched At"], filter=pa_dataset.field("scan_date") == "2024-05-01")
+    assert sorted(first.column("IP").to_pylist()) == ["10.0.0.1", "10.0.0.2"]
+    assert pa.types.is_timestamp(first.schema.field("Fetched At").type)
+    assert dataset.to_table(columns=["IP"]).num_rows == 3
+
+
+def test_sink_writes_batches_during_the_scan(tmp_path):
+    path = tmp_path / "scan.parquet"
+    sink = ResultSink(str(path), None, lambda _: None)
+    for i in range(EXPORT_READ_BATCH + 1):
+        sink.write(make_entry(i % 250))
+    # Full batches are on disk already, only the remainder is held
+    assert sink._columnar.rows == EXPORT_READ_BATCH
+    assert sink.close()
+    assert pq.read_table(path).num_rows == EXPORT_READ_BATCH + 1
+
+
+def test_partition_file_appears_when_complete(tmp_path):
+    path = tmp_path / "history"
+    sink = ResultSink(str(path), None, lambda _: None, fmt="parquet", partitioned=True, scan_date=date(2024, 5, 1))
+    for i in range(EXPORT_READ_BATCH):
+        sink.write(make_entry(i % 250))
+    partition = path / "scan_date=2024-05-01"
+    assert [f.name.startswith(".") for f in partition.iterdir()] == [True]
+    assert sink.close()
+    [part] = partition.iterdir()
+    assert not part.name.startswith(".")
+    assert pa_dataset.dataset(str(path), format="parquet", partitioning="hive").count_rows() == EXPORT_READ_BATCH
+
+
+def test_schema_without_entries(tmp_path):
+    path = tmp_path / "scan.parquet"
+    assert write_columnar(iter([]), str(path), fields=["IP", "Engines Malicious"]) == 0
+    table = pq.read_table(path)
+    assert table.num_rows == 0 and table.column_names == ["IP", "Engines Malicious"]
+
+    # A dataset gets no partition without entries
+    assert write_columnar(iter([]), str(tmp_path / "history"), "parquet", partitioned=True) == 0
+    assert not (tmp_path / "history").exists()
@@ -0,0 +1,63 @@
+"""
+Tests for the connection table that keeps every connection of a scan
+"""
+import os
+
+from src.core.connections import Connection, ConnectionTable
+from src.core.network_scanner import NetworkScanner
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def test_keeps_every_connection_per_ip():
+    table = ConnectionTable()
+    table.add("8.8.8.8", "curl", 42, 50000, 443)
+    table.add("1.1.1.1", "dig", 7, 50001, 53, "udp")
+    table.add("8.8.8.8", "firefox", 99, 50002, 443)
+    table.add("8.8.8.8", "firefox", 99, 50003, 8443)
+
+    assert list(table) == ["8.8.8.8", "1.1.1.1"]
+    assert len(table) == 4 and table.ip_count == 2
+    assert table.count("8.8.8.8") == 3 and table.count("9.9.9.9") == 0
+    assert table.connections("1.1.1.1") == [Connection("dig", 7, 50001, 53, "udp")]
+    assert table.remote_ports("8.8.8.8") == [443, 443, 8443]
+    assert table.processes("8.8.8.8") == {"firefox": 2, "curl": 1}
+    # The most connected process, instead of whichever was seen last
+    assert table.to_process_map() == {"8.8.8.8": "firefox", "1.1.1.1": "dig"}
+    assert table.process_names("8.8.8.8") == ["firefox", "curl"]
+
+
+def test_unknown_processes_are_not_listed():
+    table = ConnectionTable()
+    table.add("8.8.8.8")
+    assert table.process_name("8.8.8.8") == "Unknown"
+    table.add("8.8.8.8", "curl")
+    assert table.process_name("8.8.8.8") == "curl"
+    assert table.process_names("8.8.8.8") == ["curl"]
+
+
+def test_ss_output_keeps_processes_sharing_a_peer():
+    scanner = NetworkScanner()
+    with open(os.path.join(FIXTURES, "ss_tupn_established.txt"), "r", encoding="utf-8") as f:
+        ip_process_map = scanner._parse_unix_output(f.read(), lambda _: None, is_ss=True)
+
+    connections = scanner.connections.connections("203.200.203.103")
+    assert [(c.process_name, c.pid) for c in connections] == [("systemd-resolve", 640), ("firefox", 2211), ("sshd", 812)]
+    assert connections[0].local_port == 48583 and connections[0].remote_port == 3478
+    assert ip_process_map["203.200.203.103"] == "systemd-resolve"
+    assert scanner.connections.process_names("203.200.203.103") == ["systemd-resolve", "firefox", "sshd"]
+    assert sum(scanner.connections.count(ip) for ip in ip_process_map) == len(scanner.connections)
+
+
+def test_netstat_output_pids_and_protocols():
+    scanner = NetworkScanner()
+    output = (
+        "Proto Recv-Q Send-Q Local Address Foreign Address State PID/Program name\n"
+        "tcp 0 0 10.0.0.2:5555 8.8.8.8:443 ESTABLISHED 42/curl\n"
+        "tcp6 0 0 10.0.0.2:5556 8.8.8.8:80 ESTABLISHED 43/wget\n"
+        "tcp 0 0 10.0.0.2:5557 1.1.1.1:443 TIME_WAIT -\n"
+    )
+    assert scanner._parse_unix_output(output, lambda _: None) == {"8.8.8.8": "curl"}
+    assert scanner.connections.connections("8.8.8.8") == [
+        Connection("curl", 42, 5555, 443, "tcp"), Connection("wget", 43, 5556, 80, "tcp")
+    ]
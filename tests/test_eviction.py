@@ -0,0 +1,25 @@
+"""
+Tests for the cache eviction policies
+"""
+from src.core.eviction import LFUPolicy
+
+
+def test_lfu_finds_the_next_lowest_count_after_a_removal():
+    policy = LFUPolicy()
+    for key in ("a", "b", "c"):
+        policy.add(key)
+    for _ in range(3):
+        policy.touch("c")
+    policy.touch("b")
+
+    # Counts: a=1, b=2, c=4
+    assert policy.victim() == "a"
+    policy.remove("a")
+    assert policy.victim() == "b"
+    policy.remove("b")
+    assert policy.victim() == "c"
+    policy.add("d")
+    assert policy.victim() == "d"
+    policy.remove("d")
+    policy.remove("c")
+    assert policy.victim() is None
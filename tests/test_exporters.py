@@ -0,0 +1,81 @@
+"""
+Tests for the streaming result exporters
+"""
+import csv
+import gzip
+import json
+
+import src.core.analysis_results as analysis_results
+from src.core.analysis_results import AnalysisResults, StringTables
+from src.core.exporters import ResultSink, create_exporter, detect_format, export_results
+
+
+def make_entry(ip, malicious=0):
+    return {"IP": ip, "Process Name": "curl", "Engines Malicious": malicious}
+
+
+def test_detect_format():
+    assert detect_format("scan.csv") == ("csv", False)
+    assert detect_format("scan.JSONL.gz") == ("jsonl", True)
+
+
+def test_csv_written_incrementally(tmp_path):
+    path = tmp_path / "scan.csv"
+    exporter = create_exporter(str(path), ["IP", "Engines Malicious"], buffer_rows=2)
+
+    exporter.write(make_entry("8.8.8.8"))
+    assert not path.exists()
+    exporter.write(make_entry("1.1.1.1", malicious=3))
+    assert path.read_text().splitlines() == ["IP,Engines Malicious", "8.8.8.8,0", "1.1.1.1,3"]
+
+    exporter.write(make_entry("9.9.9.9"))
+    exporter.close()
+    assert len(path.read_text().splitlines()) == 4
+
+
+def test_jsonl_gzip_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_results, "_tables", StringTables(str(tmp_path / "tables.json")))
+    path = tmp_path / "scan.jsonl.gz"
+    entry = dict(make_entry("8.8.8.8"), **{"Analysis Results": AnalysisResults.encode([("Engine", "clean")])})
+
+    assert export_results(iter([entry]), None, str(path), lambda _: None)
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert rows == [dict(make_entry("8.8.8.8"), **{"Analysis Results": {"Engine": "clean"}})]
+
+
+def test_rotation_repeats_csv_header(tmp_path):
+    path = tmp_path / "scan.csv"
+    with create_exporter(str(path), ["IP"], rotate_bytes=50, buffer_rows=1) as exporter:
+        exporter.write_many(make_entry(f"10.0.0.{i}") for i in range(30))
+
+    assert len(exporter.files) > 1
+    ips = []
+    for part in exporter.files:
+        with open(part, newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ["IP"]
+        ips += [row[0] for row in rows[1:]]
+    assert ips == [f"10.0.0.{i}" for i in range(30)]
+    assert not path.exists()
+
+
+def test_header_without_results(tmp_path):
+    path = tmp_path / "scan.csv"
+    logs = []
+    assert export_results(iter([]), ["IP", "Country"], str(path), logs.append)
+    assert path.read_bytes() == b"IP,Country\r\n"
+    assert "No results" in logs[-1]
+
+
+def test_sink_failure_is_logged_not_raised(tmp_path):
+    logs = []
+    sink = ResultSink(str(tmp_path / "missing" / "scan.csv"), ["IP"], logs.append, buffer_rows=1)
+    (tmp_path / "missing").write_text("a file, not a directory")
+
+    sink.write(make_entry("8.8.8.8"))
+    sink.write(make_entry("1.1.1.1"))
+    assert not sink.close()
+    assert sink.failed
+    assert len([message for message in logs if message.startswith("❌")]) == 1
@@ -0,0 +1,77 @@
+"""
+Tests for verdict-based cache expiry
+"""
+from src.core.cache_manager import CacheManager
+from src.core.cache_refresher import CacheRefresher
+from src.core.cache_store import SqliteCacheStore
+from src.core.freshness import CLEAN_SINCE, EXPIRES_AT, get_expires_at, get_fetched_at, is_fresh, stamp_entry
+
+DAY = 24 * 3600
+
+
+def clean(date="01/02/2024"):
+    return {"Engines Malicious": 0, "Engines Suspicious": 0, "Last Analysis Date": date}
+
+
+def test_malicious_expires_before_clean():
+    malicious = stamp_entry({**clean(), "Engines Malicious": 3}, now=0)
+    fresh_clean = stamp_entry(clean(), now=0)
+
+    assert malicious[EXPIRES_AT] == 6 * 3600
+    assert fresh_clean[EXPIRES_AT] == 7 * DAY
+    assert is_fresh(malicious, now=3600)
+    assert not is_fresh(malicious, now=7 * 3600)
+
+
+def test_longstanding_clean_ips_are_trusted_longer():
+    first = stamp_entry(clean(), now=0)
+    later = stamp_entry(clean(), first, now=31 * DAY)
+
+    assert later[CLEAN_SINCE] == 0
+    assert later[EXPIRES_AT] == 61 * DAY
+
+    # Turning malicious resets the clean streak
+    flagged = stamp_entry({**clean(), "Engines Malicious": 1}, later, now=32 * DAY)
+    assert CLEAN_SINCE not in flagged
+
+
+def test_entries_without_expiry_are_stale():
+    assert not is_fresh(clean())
+    assert not is_fresh(None)
+
+
+def test_cleanup_removes_oldest_fetched(tmp_path):
+    manager = CacheManager(SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None))
+    manager.add_many({
+        # dd/mm/yyyy dates only order correctly once parsed
+        "1.1.1.1": clean("02/01/2024"),
+        "2.2.2.2": clean("01/02/2023"),
+        "3.3.3.3": stamp_entry(clean(), now=1_800_000_000),
+    })
+
+    assert manager.cleanup_cache(max_entries=2) == 1
+    assert manager.get_cached_ips() == {"1.1.1.1", "3.3.3.3"}
+
+
+def test_entries_cached_before_expiry_tracking_get_their_ttl():
+    fetched = stamp_entry(clean(), now=1_700_000_000)
+    del fetched[EXPIRES_AT]
+
+    assert get_expires_at(fetched) == 1_700_000_000 + 7 * DAY
+    assert is_fresh(fetched, now=1_700_000_000 + DAY)
+    # Without a fetch time, the analysis date counts
+    assert get_expires_at(clean()) == get_fetched_at(clean()) + 7 * DAY
+
+
+def test_refresh_candidates_soonest_first(tmp_path):
+    manager = CacheManager(SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None))
+    manager.add_many({
+        "1.1.1.1": stamp_entry(clean(), now=0),
+        "2.2.2.2": stamp_entry({**clean(), "Engines Malicious": 2}, now=0),
+        "3.3.3.3": stamp_entry(clean(), now=30 * DAY),
+        "4.4.4.4": clean("01/01/1970"),
+    })
+    refresher = CacheRefresher(None, manager, lookahead=DAY)
+
+    assert refresher.get_candidates(now=7 * DAY) == ["4.4.4.4", "2.2.2.2", "1.1.1.1"]
+    assert refresher.get_candidates(now=7 * DAY, limit=2) == ["4.4.4.4", "2.2.2.2"]
@@ -0,0 +1,118 @@
+"""
+Tests for spreading lookups across several API keys
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core.key_pool import ClientPool, KeyUsage
+
+REPORT = json.dumps({"data": {"attributes": {"country": "US"}}}).encode()
+QUOTA_EXCEEDED = json.dumps({"error": {"code": "QuotaExceededError"}}).encode()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Rejects key "bad", reports key "spent" as out of quota, answers everything else"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        key = self.headers.get("x-apikey")
+        status, body = {"bad": (401, b"{}"), "spent": (429, QUOTA_EXCEEDED)}.get(key, (200, REPORT))
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/ip_addresses"
+    server.shutdown()
+
+
+def make_pool(keys, base_url, tmp_path, per_minute=2):
+    return ClientPool(
+        keys, requests_per_minute=per_minute, requests_per_day=100, requests_per_month=0,
+        base_url=base_url, usage=KeyUsage(str(tmp_path / "usage.json"))
+    )
+
+
+def test_requests_spread_across_keys(base_url, tmp_path):
+    pool = make_pool(["spread-a", "spread-b"], base_url, tmp_path)
+
+    # Four lookups fit in the burst of two keys at 2 req/min each, so none waits
+    for i in range(4):
+        data, _ = pool.query_ip(f"8.8.8.{i}", lambda msg: None)
+        assert data["Country"] == "US"
+
+    assert [s["requests_today"] for s in pool.get_key_stats()] == [2, 2]
+    pool.close()
+
+
+def test_no_token_reserved_for_a_paused_key(tmp_path):
+    pool = make_pool(["paused-key"], "http://127.0.0.1:9", tmp_path)
+    [client] = pool.clients
+    client.backoff.on_throttled({"Retry-After": "30"})
+
+    # The client reserves its token itself, after the pause
+    assert pool.acquire(pool.clients) == (client, None)
+    assert [client.rate_limiter.reserve() for _ in range(2)] == [0, 0]
+    pool.close()
+
+
+def test_rejected_and_exhausted_keys_are_parked(base_url, tmp_path):
+    pool = make_pool(["bad", "spent", "park-good"], base_url, tmp_path, per_minute=0)
+
+    for i in range(3):
+        data, _ = pool.query_ip(f"8.8.4.{i}", lambda msg: None)
+        assert data["Country"] == "US"
+
+    stats = {s["key"]: s for s in pool.get_key_stats()}
+    assert not stats["...bad"]["usable"]
+    assert not stats["...pent"]["usable"]
+    assert stats["...good"]["requests_today"] == 3
+    pool.close()
+
+
+def test_all_keys_parked(base_url, tmp_path):
+    pool = make_pool(["bad"], base_url, tmp_path)
+    assert pool.query_ip("8.8.8.8", lambda msg: None) == (None, False)
+    assert pool.query_ip("8.8.8.8", lambda msg: None) == (None, False)
+    pool.close()
+
+
+def test_usage_persisted(tmp_path):
+    usage = KeyUsage(str(tmp_path / "usage.json"))
+    for _ in range(3):
+        usage.record("persist-key")
+    usage.save()
+
+    reloaded = KeyUsage(str(tmp_path / "usage.json"))
+    assert reloaded.requests_today("persist-key") == 3
+    assert "persist-key" not in (tmp_path / "usage.json").read_text()
+
+
+def test_concurrent_saves_keep_the_latest_counts(tmp_path, capsys):
+    usage = KeyUsage(str(tmp_path / "usage.json"))
+
+    def record():
+        for _ in range(200):
+            usage.record("busy-key")
+            usage.save()
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert "Failed to save" not in capsys.readouterr().out
+    assert KeyUsage(str(tmp_path / "usage.json")).requests_today("busy-key") == 800
+    assert [f.name for f in tmp_path.iterdir()] == ["usage.json"]
@@ -0,0 +1,111 @@
+"""
+Tests for monitor mode's snapshot diffing and debouncing
+"""
+from src.core.connections import Connection
+from src.core.monitor import ConnectionMonitor
+from src.core.network_scanner import NetworkScanner
+from src.core.proc_net import ProcSocket
+
+
+class FakeSocketIndex:
+    def __init__(self):
+        self.resolved = []
+
+    def resolve(self, inodes):
+        inodes = list(inodes)
+        self.resolved.append(sorted(inodes))
+        return {inode: [(1000 + inode, f"proc{inode}")] for inode in inodes}
+
+
+class FakeNetworkScanner(NetworkScanner):
+    """Serves the sockets of the current snapshot instead of reading the host's"""
+
+    def __init__(self):
+        super().__init__()
+        self.socket_index = FakeSocketIndex()
+        self.sockets = []
+
+    def read_sockets(self, log_callback):
+        return list(self.sockets)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def tcp(remote_ip, remote_port, inode):
+    return ProcSocket("tcp", "192.168.1.10", 40000 + inode, remote_ip, remote_port, inode)
+
+
+def test_only_opened_sockets_are_examined():
+    network = FakeNetworkScanner()
+    monitor = ConnectionMonitor(network, debounce=0, clock=FakeClock())
+    network.sockets = [tcp("8.8.8.8", 443, 1), tcp("127.0.0.1", 80, 2), tcp("1.1.1.1", 53, 3)]
+
+    assert monitor.poll(lambda _: None) == {"8.8.8.8": "proc1", "1.1.1.1": "proc3"}
+    assert monitor.connections.remote_ports("8.8.8.8") == [443]
+    assert monitor.connections.remote_ports("1.1.1.1") == [53]
+
+    # Unchanged sockets are not resolved again, a second socket to a known peer is not new
+    network.sockets.append(tcp("8.8.8.8", 853, 4))
+    assert monitor.poll(lambda _: None) == {}
+    assert network.socket_index.resolved == [[1, 3], [4]]
+    assert monitor.peer_count == 2
+
+
+def test_new_peers_are_debounced():
+    network = FakeNetworkScanner()
+    clock = FakeClock()
+    monitor = ConnectionMonitor(network, debounce=5, clock=clock)
+    network.sockets = [tcp("8.8.8.8", 443, 1)]
+    assert monitor.poll(lambda _: None) == {}
+    assert monitor.next_due() == clock.now + 5
+
+    # The peer reconnects before it is due, it is still reported once, with both connections
+    clock.now += 3
+    network.sockets = [tcp("8.8.8.8", 443, 2)]
+    assert monitor.poll(lambda _: None) == {}
+
+    clock.now += 2
+    assert monitor.poll(lambda _: None) == {"8.8.8.8": "proc1"}
+    assert monitor.connections.process_names("8.8.8.8") == ["proc1", "proc2"]
+    assert [c.pid for c in monitor.connections.connections("8.8.8.8")] == [1001, 1002]
+    assert monitor.next_due() is None
+
+
+def test_reported_peers_expire():
+    network = FakeNetworkScanner()
+    clock = FakeClock()
+    monitor = ConnectionMonitor(network, debounce=0, report_ttl=60, clock=clock)
+    network.sockets = [tcp("8.8.8.8", 443, 1)]
+    assert monitor.poll(lambda _: None) == {"8.8.8.8": "proc1"}
+
+    # Reconnecting within the TTL is not reported again
+    network.sockets = []
+    monitor.poll(lambda _: None)
+    network.sockets = [tcp("8.8.8.8", 443, 2)]
+    assert monitor.poll(lambda _: None) == {}
+
+    clock.now += 61
+    network.sockets = []
+    monitor.poll(lambda _: None)
+    network.sockets = [tcp("8.8.8.8", 443, 3)]
+    assert monitor.poll(lambda _: None) == {"8.8.8.8": "proc3"}
+
+
+def test_falls_back_to_diffing_peers():
+    network = FakeNetworkScanner()
+    network.read_sockets = lambda log_callback: None
+    peers = {"8.8.8.8": "curl"}
+    network.get_external_ips = lambda log_callback: dict(peers)
+    network.connections.add("8.8.8.8", "curl", 42, 50000, 443)
+    monitor = ConnectionMonitor(network, debounce=0, clock=FakeClock())
+
+    assert monitor.poll(lambda _: None) == {"8.8.8.8": "curl"}
+    assert monitor.connections.connections("8.8.8.8") == [Connection("curl", 42, 50000, 443, "tcp")]
+    peers["1.1.1.1"] = "dig"
+    assert monitor.poll(lambda _: None) == {"1.1.1.1": "dig"}
@@ -0,0 +1,87 @@
+"""
+Tests for ranking candidate IPs by risk before spending quota
+"""
+from src.core.connections import ConnectionTable
+from src.core.prioritizer import WEIGHT_MALICIOUS_ASN, WEIGHT_MALICIOUS_PREFIX, ScanPrioritizer, get_prefix
+
+
+def make_entry(malicious=0, suspicious=0, asn=15169):
+    return {
+        "Engines Malicious": malicious, "Engines Suspicious": suspicious,
+        "Last Analysis Date": "01/01/2025", "ASN": asn
+    }
+
+
+def test_prefixes():
+    assert get_prefix("203.0.113.7") == "203.0.113.0/24"
+    assert get_prefix("2001:db8:1:2::1") == "2001:db8:1::/48"
+    assert get_prefix("not an ip") is None
+
+
+def test_untrusted_process_and_unusual_port_come_first():
+    prioritizer = ScanPrioritizer(trusted_processes=["firefox"], common_ports=[443])
+    ips = {"1.1.1.1": "firefox", "2.2.2.2": "firefox", "3.3.3.3": "xmrig"}
+    cache = {ip: make_entry() for ip in ips}
+
+    connections = ConnectionTable()
+    for ip, port in (("1.1.1.1", 443), ("2.2.2.2", 4444), ("3.3.3.3", 443)):
+        connections.add(ip, ips[ip], remote_port=port)
+
+    ranked = prioritizer.rank(ips, cache, connections)
+
+    assert list(ranked) == ["3.3.3.3", "2.2.2.2", "1.1.1.1"]
+    assert ranked["3.3.3.3"] == "xmrig"
+
+
+def test_any_untrusted_process_counts():
+    prioritizer = ScanPrioritizer(trusted_processes=["firefox"], common_ports=[443])
+    ips = {"1.1.1.1": "firefox", "2.2.2.2": "firefox, xmrig"}
+    connections = ConnectionTable()
+    connections.add("1.1.1.1", "firefox", remote_port=443)
+    connections.add("2.2.2.2", "firefox", remote_port=443)
+    connections.add("2.2.2.2", "xmrig", remote_port=443)
+
+    # Two connections instead of one add less than an untrusted process
+    assert list(prioritizer.rank(ips, {}, connections)) == ["2.2.2.2", "1.1.1.1"]
+    assert prioritizer.score("2.2.2.2", "firefox, xmrig", ports=[443, 443], processes=["firefox"]) == 2.0
+
+
+def test_malicious_neighbourhood_raises_priority():
+    prioritizer = ScanPrioritizer(trusted_processes=["curl"])
+    prioritizer.learn({"198.51.100.9": make_entry(malicious=5, asn=64500)})
+    ips = {"8.8.8.8": "curl", "198.51.100.20": "curl", "192.0.2.1": "curl"}
+    cache = {"8.8.8.8": make_entry(), "192.0.2.1": make_entry(asn=64500)}
+
+    # Same /24 beats same AS, which beats a clean history
+    assert list(prioritizer.rank(ips, cache)) == ["198.51.100.20", "192.0.2.1", "8.8.8.8"]
+
+
+def test_malicious_ip_does_not_count_as_its_own_neighbour():
+    prioritizer = ScanPrioritizer(trusted_processes=["curl"])
+    malicious = make_entry(malicious=5, asn=64500)
+    prioritizer.learn({"198.51.100.9": malicious})
+    alone = prioritizer.score("198.51.100.9", "curl", malicious)
+
+    # Only a second malicious IP in the same /24 and AS adds the neighbourhood weights
+    prioritizer.observe("198.51.100.10", make_entry(malicious=1, asn=64500))
+    assert prioritizer.score("198.51.100.9", "curl", malicious) == alone + WEIGHT_MALICIOUS_PREFIX + WEIGHT_MALICIOUS_ASN
+
+
+def test_ties_keep_discovery_order():
+    prioritizer = ScanPrioritizer(trusted_processes=[])
+    ips = {f"8.8.8.{i}": "curl" for i in range(10)}
+
+    assert list(prioritizer.rank(ips, {})) == list(ips)
+
+
+def test_counts_follow_lookups():
+    prioritizer = ScanPrioritizer(trusted_processes=["curl"])
+    prioritizer.learn({"198.51.100.9": make_entry(malicious=5, asn=64500)})
+    prioritizer.observe("198.51.100.10", make_entry(malicious=1, asn=64501))
+    assert prioritizer.malicious_prefixes["198.51.100.0/24"] == 2
+
+    # Looked up again and found clean: it no longer counts
+    prioritizer.observe("198.51.100.9", make_entry(asn=64500))
+    assert prioritizer.malicious_prefixes["198.51.100.0/24"] == 1
+    assert 64500 not in prioritizer.malicious_asns
+    assert 64501 in prioritizer.malicious_asns
@@ -0,0 +1,137 @@
+"""
+Tests for the /proc/net connection reader
+"""
+import os
+import shutil
+
+from src.core.network_scanner import NetworkScanner
+from src.core.proc_net import ProcSocket, SocketOwnerIndex, decode_address, parse_proc_net, read_established
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_decode_address():
+    assert decode_address("0100007F") == "127.0.0.1"
+    assert decode_address("B80D0120000005000000000023000000") == "2001:db8:5::23"
+    # IPv4-mapped IPv6
+    assert decode_address("0000000000000000FFFF00002E2A4D22") == "34.77.42.46"
+
+
+def test_only_established_sockets():
+    sockets = list(parse_proc_net(read_fixture("proc_net_tcp.txt")))
+
+    assert sockets
+    assert len(sockets) < len(read_fixture("proc_net_tcp.txt").splitlines()) - 1
+    first = sockets[0]
+    assert (first.remote_ip, first.remote_port, first.inode) == ("203.200.203.103", 3478, 40001)
+    assert all(sock.protocol == "tcp" and sock.remote_port for sock in sockets)
+
+
+def test_finds_the_peers_ss_reports():
+    scanner = NetworkScanner()
+    ss_map = scanner._parse_unix_output(read_fixture("ss_tupn_established.txt"), lambda _: None, is_ss=True)
+
+    sockets = [
+        sock
+        for name, protocol in (("proc_net_tcp.txt", "tcp"), ("proc_net_tcp6.txt", "tcp"), ("proc_net_udp.txt", "udp"))
+        for sock in parse_proc_net(read_fixture(name), protocol)
+    ]
+    proc_map = scanner._map_sockets(sockets, {})
+
+    # ss shows IPv4-mapped peers as ::ffff:a.b.c.d, which the text parser drops
+    assert set(ss_map) <= set(proc_map)
+    assert not any(ip.startswith("::ffff:") for ip in proc_map)
+
+
+def test_missing_tables_are_skipped(tmp_path):
+    (tmp_path / "net").mkdir()
+    (tmp_path / "net" / "tcp").write_text(read_fixture("proc_net_tcp.txt"))
+
+    assert read_established(str(tmp_path)) == list(parse_proc_net(read_fixture("proc_net_tcp.txt")))
+
+
+def make_process(proc_root, pid, name, inodes, start_time=100):
+    process_dir = proc_root / str(pid)
+    (process_dir / "fd").mkdir(parents=True, exist_ok=True)
+    # comm may contain spaces and parentheses
+    fields = ["S"] + ["0"] * 18 + [str(start_time)] + ["0"] * 5
+    (process_dir / "stat").write_text(f"{pid} ({name} (x)) " + " ".join(fields))
+    (process_dir / "comm").write_text(name + "\n")
+    for fd, inode in enumerate(inodes, start=3):
+        os.symlink(f"socket:[{inode}]", process_dir / "fd" / str(fd))
+    os.symlink("/dev/null", process_dir / "fd" / "0")
+
+
+def test_socket_index_refreshes_incrementally(tmp_path):
+    make_process(tmp_path, 100, "curl", [5001])
+    make_process(tmp_path, 200, "sshd", [6001, 6002])
+    make_process(tmp_path, 300, "cron", [])
+    index = SocketOwnerIndex(str(tmp_path))
+
+    assert index.resolve([5001, 6002]) == {5001: [(100, "curl")], 6002: [(200, "sshd")]}
+    assert index.pids_scanned == 3
+
+    # Nothing changed: no fds are walked
+    index.resolve([5001, 6002])
+    assert index.pids_scanned == 3
+
+    # New socket of a known process: processes holding sockets are searched first
+    os.symlink("socket:[6003]", tmp_path / "200" / "fd" / "9")
+    assert index.resolve([6003]) == {6003: [(200, "sshd")]}
+
+    # PID reused by another process
+    shutil.rmtree(tmp_path / "100")
+    make_process(tmp_path, 100, "wget", [7001], start_time=500)
+    scanned = index.pids_scanned
+    assert index.resolve([7001, 5001]) == {7001: [(100, "wget")]}
+    assert index.pids_scanned == scanned + 3  # the new process, then the other two searched for 5001
+
+    # An unattributable socket is only searched for once
+    scanned = index.pids_scanned
+    index.resolve([5001])
+    assert index.pids_scanned == scanned
+
+
+def test_full_rescans_are_rate_limited(tmp_path):
+    make_process(tmp_path, 100, "curl", [5001])
+    make_process(tmp_path, 200, "sshd", [6001])
+    clock = [0.0]
+    index = SocketOwnerIndex(str(tmp_path), rescan_interval=60, clock=lambda: clock[0])
+    index.resolve([5001, 6001])
+    index.resolve([9999])  # unattributable, costs the first full rescan
+
+    # A socket replacing a closed fd leaves the fd directory as it was
+    fd_dir = tmp_path / "200" / "fd"
+    stat = os.stat(fd_dir)
+    os.remove(fd_dir / "3")
+    os.symlink("socket:[6002]", fd_dir / "3")
+    os.utime(fd_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    scanned = index.pids_scanned
+    assert index.resolve([6002]) == {}
+    assert index.pids_scanned == scanned
+
+    # Still searched for once the interval has passed
+    clock[0] = 60
+    assert index.resolve([6002]) == {6002: [(200, "sshd")]}
+
+
+def test_shared_socket_is_a_connection_of_each_owner(tmp_path):
+    # A server and the worker that inherited its socket
+    make_process(tmp_path, 100, "gunicorn", [5001])
+    make_process(tmp_path, 101, "python3", [5001])
+    scanner = NetworkScanner()
+    scanner.socket_index = SocketOwnerIndex(str(tmp_path))
+    sock = ProcSocket("tcp", "192.168.1.10", 40000, "8.8.8.8", 443, 5001)
+
+    owners = scanner.socket_index.resolve([5001])
+    assert owners == {5001: [(100, "gunicorn"), (101, "python3")]}
+    scanner._map_sockets([sock], owners)
+    connections = scanner.connections.connections("8.8.8.8")
+    assert [(c.pid, c.process_name) for c in connections] == [(100, "gunicorn"), (101, "python3")]
+    assert scanner.connections.process_names("8.8.8.8") == ["gunicorn", "python3"]
@@ -0,0 +1,74 @@
+"""
+Tests for the sliding-window rate limiter
+"""
+from src.core.rate_limiter import SECONDS_PER_DAY, RateLimiter, get_rate_limiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_up_to_per_minute_quota_then_paced():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=4, requests_per_day=0, requests_per_month=0, clock=clock)
+
+    assert [limiter.reserve() for _ in range(4)] == [0, 0, 0, 0]
+    # The next requests wait until the first ones are a minute old
+    assert [limiter.reserve() for _ in range(5)] == [60, 60, 60, 60, 120]
+
+
+def test_tokens_refill_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=4, requests_per_day=0, requests_per_month=0, clock=clock)
+    for _ in range(4):
+        limiter.reserve()
+
+    assert not limiter.try_acquire()
+    clock.now = 59
+    assert not limiter.try_acquire()
+    clock.now = 60
+    assert limiter.try_acquire()
+
+
+def test_daily_quota_caps_minute_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=4, requests_per_day=2, requests_per_month=0, clock=clock)
+
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    clock.now = 60
+    assert not limiter.try_acquire()
+    assert limiter.time_until_available() > 60 * 60
+
+
+def test_zero_limits_disable_limiting():
+    limiter = RateLimiter(requests_per_minute=0, requests_per_day=0, requests_per_month=0)
+    assert all(limiter.reserve() == 0 for _ in range(1000))
+
+
+def test_limiter_shared_per_api_key():
+    first = get_rate_limiter("key-a", 4, 500, 15500)
+    assert get_rate_limiter("key-a", 4, 500, 15500) is first
+    assert get_rate_limiter("key-b", 4, 500, 15500) is not first
+    assert get_rate_limiter("key-a", 10, 500, 15500) is not first
+
+
+def test_no_rolling_period_exceeds_the_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=4, requests_per_day=10, requests_per_month=0, clock=clock)
+    grants = []
+    # Callers arrive at irregular times, some reserving ahead
+    for step in range(40):
+        clock.now = step * 7.0
+        grants.append(clock.now + limiter.reserve())
+        if step % 3 == 0 and limiter.try_acquire():
+            grants.append(clock.now)
+
+    grants.sort()
+    for i, start in enumerate(grants):
+        assert sum(1 for t in grants[i:] if t < start + 60) <= 4
+        assert sum(1 for t in grants[i:] if t < start + SECONDS_PER_DAY) <= 10
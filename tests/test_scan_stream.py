@@ -0,0 +1,48 @@
+"""
+Tests for progress reporting of streaming scans
+"""
+from src.core.scan_stream import ScanProgress, format_duration, format_progress
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_entry(ip):
+    return {
+        "IP": ip, "Last Analysis Date": "N/A",
+        "Engines Malicious": 0, "Engines Suspicious": 0, "Engines Harmless": 0
+    }
+
+
+def test_counts_cache_hits_new_and_failed_lookups():
+    progress = ScanProgress(4, clock=FakeClock())
+    progress.record(make_entry("8.8.8.8"), False)
+    progress.record(make_entry("1.1.1.1"), True)
+    progress.record({"IP": "9.9.9.9", "Process Name": "curl"}, False)
+
+    snapshot = progress.snapshot()
+    assert (snapshot["done"], snapshot["cache_hits"], snapshot["new"], snapshot["failed"]) == (3, 1, 1, 1)
+
+
+def test_eta_ignores_cache_hits():
+    clock = FakeClock()
+    progress = ScanProgress(10, clock=clock)
+    progress.record(make_entry("8.8.8.8"), False)
+    assert progress.eta is None
+
+    clock.now = 30
+    progress.record(make_entry("1.1.1.1"), True)
+    progress.record(make_entry("9.9.9.9"), True)
+    # 15s per lookup, 7 IPs left
+    assert progress.eta == 105
+    assert format_progress(progress.snapshot()) == "3/10 IPs · 1 cached · ETA 1:45"
+
+
+def test_format_duration():
+    assert format_duration(5) == "0:05"
+    assert format_duration(3725) == "1:02:05"
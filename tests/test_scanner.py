@@ -0,0 +1,266 @@
+"""
+Tests for streaming scans through IPScanner
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import src.core.scanner as scanner_module
+from src.core.cache_manager import CacheManager
+from src.core.cache_store import SqliteCacheStore
+from src.core.checkpoint import ScanJournal, ScanManifest, new_journal_file
+from src.core.key_pool import ClientPool, KeyUsage
+from src.core.scanner import IPScanner
+
+
+REPORT = json.dumps({"data": {"attributes": {
+    "country": "US", "last_analysis_date": 1700000000,
+    "last_analysis_stats": {"malicious": 0, "suspicious": 0, "harmless": 70}
+}}}).encode()
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    """Answers every lookup with the same clean report, except for 203.0.113.0/24 which fails"""
+    protocol_version = "HTTP/1.1"
+
+    requested = []
+
+    def do_GET(self):
+        ReportHandler.requested.append(self.path.rsplit("/", 1)[-1])
+        status, body = (500, b"{}") if "/203.0.113." in self.path else (200, REPORT)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_entry(ip):
+    return {"IP": ip, "Process Name": "curl", "Engines Malicious": 0}
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ReportHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/ip_addresses"
+    server.shutdown()
+
+
+@pytest.fixture
+def scanner(tmp_path, monkeypatch, base_url):
+    """Scanner whose cache and key usage live in tmp_path, looking IPs up on a local stub"""
+    def make_manager():
+        manager = CacheManager(SqliteCacheStore(str(tmp_path / "cache.db"), legacy_json_file=None))
+        manager.temp_file = str(tmp_path / "temp_scan_results.json")
+        return manager
+
+    def make_pool(api_keys, **kwargs):
+        kwargs.update(requests_per_minute=0, requests_per_day=0, requests_per_month=0)
+        return ClientPool(api_keys, base_url=base_url, usage=KeyUsage(str(tmp_path / "usage.json")), **kwargs)
+
+    monkeypatch.setattr(scanner_module, "CacheManager", make_manager)
+    monkeypatch.setattr(scanner_module, "ClientPool", make_pool)
+    with IPScanner("key") as scanner:
+        scanner.manifest_file = str(tmp_path / "scan_manifest.json")
+        scanner.journal_dir = str(tmp_path / "journals")
+        yield scanner
+
+
+def find_peers(scanner, peers):
+    scanner.network_scanner.get_external_ips = lambda log_callback: dict(peers)
+
+
+def endless_scan(scanner, finished):
+    """Publishes results until the scan is stopped"""
+    def run(on_result):
+        i = 0
+        while not scanner._cancel_token.cancelled:
+            on_result(make_entry(f"10.0.{i // 256 % 256}.{i % 256}"), True)
+            i += 1
+        finished.set()
+    return run
+
+
+def stream_threads():
+    return [t for t in threading.enumerate() if t.name == "scan-stream"]
+
+
+def test_stream_yields_every_result(scanner):
+    def run(on_result):
+        for i in range(300):
+            on_result(make_entry(f"10.0.0.{i % 256}"), i % 2 == 0)
+
+    updates = list(scanner._stream(run, 300, scanner._cancel_token))
+    assert len(updates) == 300
+    assert updates[-1].progress["done"] == 300
+    assert not scanner._cancel_token.cancelled
+
+
+def test_closing_early_stops_the_scan(scanner):
+    finished = threading.Event()
+    updates = scanner._stream(endless_scan(scanner, finished), 1000, scanner._cancel_token)
+    assert next(updates).entry["IP"] == "10.0.0.0"
+
+    updates.close()
+    assert scanner._cancel_token.cancelled
+    assert finished.is_set()
+    assert not stream_threads()
+
+
+def test_failing_consumer_stops_the_scan(scanner):
+    finished = threading.Event()
+
+    with pytest.raises(RuntimeError):
+        for update in scanner._stream(endless_scan(scanner, finished), 1000, scanner._cancel_token):
+            raise RuntimeError("consumer failed")
+
+    assert scanner._cancel_token.cancelled
+    assert finished.is_set()
+    assert not stream_threads()
+
+
+def test_scan_failure_reaches_the_consumer(scanner):
+    def run(on_result):
+        on_result(make_entry("8.8.8.8"), True)
+        raise ValueError("lookup failed")
+
+    updates = scanner._stream(run, 2, scanner._cancel_token)
+    assert next(updates).entry["IP"] == "8.8.8.8"
+    with pytest.raises(ValueError):
+        next(updates)
+
+
+def test_abandoned_lookup_stays_cancelled_after_a_new_scan_starts(scanner):
+    find_peers(scanner, {"8.8.8.8": "curl"})
+    tokens = []
+    started, release = threading.Event(), threading.Event()
+
+    def query_ip(ip, log_callback, projection=None, cancel_token=None):
+        tokens.append(cancel_token)
+        if len(tokens) == 1:
+            started.set()
+            release.wait(5)
+        return None, False
+    scanner.vt_client.query_ip = query_ip
+
+    first = threading.Thread(target=scanner.scan_network_ips, args=(False, 0, 2, lambda _: None))
+    first.start()
+    assert started.wait(5)
+    scanner.stop_scanning()
+    first.join(5)
+    assert not first.is_alive()
+    scanner.discard_resumable_scan(lambda _: None)
+
+    # The first lookup is still in flight while the next scan runs
+    scanner.scan_network_ips(False, 0, 2, lambda _: None)
+    release.set()
+    abandoned, current = tokens
+    assert abandoned.cancelled and not current.cancelled
+
+
+def test_monitor_batches_update_the_prioritizer(scanner):
+    peers = {"8.8.8.8": "curl"}
+    scanner.network_scanner.read_sockets = lambda log_callback: None
+    scanner.network_scanner.get_external_ips = lambda log_callback: dict(peers)
+    learned = []
+    load_cache = scanner.cache_manager.load_cache
+    scanner.cache_manager.load_cache = lambda: learned.append(1) or load_cache()
+    results = []
+
+    def on_result(entry, is_new):
+        results.append(entry["IP"])
+        if len(results) == 1:
+            peers["1.1.1.1"] = "curl"
+        else:
+            scanner.stop_scanning()
+
+    logs = []
+    assert scanner.monitor(batch_size=2, log_callback=logs.append, interval=0.01, debounce=0,
+                           on_result=on_result) == 2
+    assert results == ["8.8.8.8", "1.1.1.1"]
+    assert scanner.cache_manager.is_ip_cached("1.1.1.1")
+    # The cache is learned once, not once per batch
+    assert learned == [1]
+    assert not any("Scan completed" in message for message in logs)
+
+
+def test_results_list_every_process(scanner):
+    find_peers(scanner, {"8.8.8.8": "firefox"})
+    connections = scanner.network_scanner.connections
+    connections.add("8.8.8.8", "firefox")
+    connections.add("8.8.8.8", "firefox")
+    connections.add("8.8.8.8", "curl")
+
+    [result] = scanner.scan_network_ips(False, 0, 2, lambda message: None)
+    assert result["Process Name"] == "firefox"
+    assert result["Processes"] == "firefox, curl"
+
+
+def test_cached_entry_is_not_annotated_in_place(scanner):
+    find_peers(scanner, {"8.8.8.8": "firefox"})
+    connections = scanner.network_scanner.connections
+    connections.add("8.8.8.8", "firefox")
+    scanner.scan_network_ips(False, 0, 2, lambda message: None)
+    cached = scanner.cache_manager.get_cached_entry("8.8.8.8")
+    processes = cached["Processes"]
+
+    connections.add("8.8.8.8", "curl")
+    connections.add("8.8.8.8", "curl")
+    [result] = scanner.scan_network_ips(False, 0, 2, lambda message: None)
+    assert result["Processes"] == "curl, firefox"
+    assert cached["Processes"] == processes == "firefox"
+    assert scanner.cache_manager.get_cached_entry("8.8.8.8")["Processes"] == "firefox"
+
+
+def test_new_scan_refused_while_one_is_pending(scanner):
+    find_peers(scanner, {"8.8.8.8": "curl"})
+    pending = ScanManifest({"1.1.1.1": "curl", "9.9.9.9": "curl"}, {}, ["1.1.1.1"], scanner.manifest_file)
+    pending.save()
+    logs = []
+
+    assert scanner.scan_network_ips(False, 0, 2, logs.append) == []
+    assert "1 IPs left" in logs[-1]
+    assert ScanManifest.load(scanner.manifest_file).remaining() == {"9.9.9.9": "curl"}
+
+    scanner.discard_resumable_scan(logs.append)
+    assert [r["IP"] for r in scanner.scan_network_ips(False, 0, 2, logs.append)] == ["8.8.8.8"]
+
+
+def test_failed_lookups_keep_the_scan_resumable(scanner):
+    find_peers(scanner, {"8.8.8.8": "curl", "203.0.113.5": "curl"})
+    logs = []
+
+    results = scanner.scan_network_ips(False, 0, 2, logs.append)
+    assert len(results) == 2
+    assert scanner.has_resumable_scan()
+    assert ScanManifest.load(scanner.manifest_file).remaining() == {"203.0.113.5": "curl"}
+
+
+def test_resume_after_a_crash(scanner):
+    # A scan of three IPs died after journaling its first result
+    targets = {"8.8.8.8": "curl", "1.1.1.1": "ssh", "9.9.9.9": "git"}
+    journal = ScanJournal(new_journal_file("scan", scanner.journal_dir))
+    journal.append({
+        "IP": "8.8.8.8", "Process Name": "curl", "Last Analysis Date": "N/A",
+        "Engines Malicious": 0, "Engines Suspicious": 0, "Engines Harmless": 0
+    }, True)
+    journal.close()
+    ScanManifest(targets, {"batch_size": 2}, (), scanner.manifest_file, journal.journal_file).save()
+    ReportHandler.requested = []
+
+    results = scanner.resume_scan(lambda message: None)
+
+    # Results of the interrupted run come first
+    assert results[0]["IP"] == "8.8.8.8"
+    assert {r["IP"] for r in results[1:]} == {"1.1.1.1", "9.9.9.9"}
+    # The journaled result was recovered instead of being looked up again
+    assert sorted(ReportHandler.requested) == ["1.1.1.1", "9.9.9.9"]
+    assert scanner.cache_manager.get_cached_ips() == set(targets)
+    assert not scanner.has_resumable_scan()
+    assert not os.listdir(scanner.journal_dir)
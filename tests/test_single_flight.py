@@ -0,0 +1,101 @@
+"""
+Tests for coalescing concurrent lookups of the same IP
+"""
+import asyncio
+import threading
+
+import pytest
+
+from src.core.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def lookup():
+        calls.append(1)
+        release.wait(5)
+        return {"IP": "8.8.8.8"}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("8.8.8.8", lookup)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    while flight.get_stats()["coalesced"] < 7:
+        pass
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"IP": "8.8.8.8"}] * 8
+    assert flight.get_stats() == {"executed": 1, "coalesced": 7}
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("1.1.1.1", lambda: 1) == 1
+    assert flight.do("1.1.1.1", lambda: 2) == 2
+    assert flight.get_stats() == {"executed": 2, "coalesced": 0}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("1.1.1.1", fail)
+    assert flight.do("1.1.1.1", lambda: "ok") == "ok"
+
+
+def test_cancelled_call_is_not_shared():
+    flight = SingleFlight()
+    release = threading.Event()
+    stopped = threading.Event()
+
+    def cancelled_lookup():
+        # The scan running it is stopped while another scan waits for it
+        release.wait(5)
+        stopped.set()
+        return None
+
+    leader = threading.Thread(target=lambda: flight.do("8.8.8.8", cancelled_lookup, stopped.is_set))
+    leader.start()
+    while "8.8.8.8" not in flight._calls:
+        pass
+    results = []
+    follower = threading.Thread(target=lambda: results.append(flight.do("8.8.8.8", lambda: "result")))
+    follower.start()
+    while flight.get_stats()["coalesced"] < 1:
+        pass
+    release.set()
+    leader.join()
+    follower.join()
+
+    # The other scan looked the IP up itself instead of seeing a failed lookup
+    assert results == ["result"]
+    assert flight.get_stats() == {"executed": 2, "coalesced": 0}
+
+
+def test_async_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def lookup():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async("9.9.9.9", lookup) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.get_stats()["coalesced"] == 4
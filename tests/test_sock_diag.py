@@ -0,0 +1,47 @@
+"""
+Tests for the netlink sock_diag reader
+"""
+import socket
+import struct
+
+import pytest
+
+from src.core.proc_net import ProcSocket
+from src.core.sock_diag import (
+    NLMSG_DONE, NLMSG_ERROR, SOCK_DIAG_BY_FAMILY, _DIAG_RECORD, parse_diag_messages
+)
+
+
+def diag_record(family, local, local_port, remote, remote_port, inode):
+    packed = [socket.inet_pton(family, address).ljust(16, b"\0") for address in (local, remote)]
+    return _DIAG_RECORD.pack(
+        _DIAG_RECORD.size, SOCK_DIAG_BY_FAMILY, 2, 1, 0, family, 1, 0, 0,
+        local_port >> 8, local_port & 0xFF, remote_port >> 8, remote_port & 0xFF,
+        packed[0], packed[1], 0, 0, 0, 0, 1000, inode
+    )
+
+
+def test_decodes_replies():
+    data = (
+        diag_record(socket.AF_INET, "192.0.2.10", 40000, "8.8.8.8", 443, 101)
+        + diag_record(socket.AF_INET6, "2001:db8::1", 40001, "::ffff:1.1.1.1", 853, 102)
+        + struct.pack("=IHHIIi", 20, NLMSG_DONE, 2, 1, 0, 0)
+    )
+    sockets = []
+
+    assert parse_diag_messages(data, "tcp", {}, sockets)
+    assert sockets == [
+        ProcSocket("tcp", "192.0.2.10", 40000, "8.8.8.8", 443, 101),
+        ProcSocket("tcp", "2001:db8::1", 40001, "1.1.1.1", 853, 102),
+    ]
+
+
+def test_reply_without_done_continues():
+    sockets = []
+    assert not parse_diag_messages(diag_record(socket.AF_INET, "192.0.2.10", 1, "8.8.8.8", 2, 3), "udp", {}, sockets)
+    assert sockets[0].protocol == "udp"
+
+
+def test_kernel_error_raises():
+    with pytest.raises(OSError):
+        parse_diag_messages(struct.pack("=IHHIIi", 20, NLMSG_ERROR, 0, 1, 0, -2), "tcp", {}, [])
@@ -0,0 +1,48 @@
+"""
+Tests for parsing VirusTotal IP reports with and without field projection
+"""
+import json
+import os
+
+import pytest
+
+import src.core.analysis_results as analysis_results
+from src.core.analysis_results import StringTables
+from src.core.api_client import RESULT_FIELDS, get_projection, has_fields, parse_vt_response
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "vt_ip_report.json")
+
+
+@pytest.fixture(autouse=True)
+def private_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_results, "_tables", StringTables(str(tmp_path / "tables.json")))
+
+
+@pytest.fixture
+def report():
+    with open(FIXTURE, "rb") as f:
+        return json.load(f)["data"]
+
+
+def test_full_parse(report):
+    result = parse_vt_response(report)
+    assert tuple(result) == RESULT_FIELDS
+    assert result["ASN Owner"] == "EXAMPLE-HOSTING"
+    assert len(result["Analysis Results"]) == 93
+
+
+def test_projection_skips_unneeded_fields(report):
+    projection = get_projection(["IP", "Country"])
+    result = parse_vt_response(report, projection)
+
+    assert "Analysis Results" not in result
+    assert result["Country"] == "US"
+    # Verdict fields are kept for expiry and summaries
+    assert result["Engines Malicious"] == parse_vt_response(report)["Engines Malicious"]
+    assert has_fields(result, projection)
+    assert not has_fields(result, None)
+
+
+def test_projection_of_every_field_is_no_projection():
+    assert get_projection(None) is None
+    assert get_projection(RESULT_FIELDS) is None
@@ -0,0 +1,85 @@
+"""
+Tests for the sliding-window worker pool of the threaded engine
+"""
+import threading
+import time
+
+import pytest
+
+from src.core.cancellation import CancelToken
+from src.core.worker_pool import WorkerPool
+
+
+def test_slow_call_does_not_block_the_window():
+    pool = WorkerPool(2)
+    release = threading.Event()
+
+    def lookup(ip):
+        if ip == "slow":
+            release.wait(5)
+        return ip
+
+    results = []
+    for ip in pool.run(lookup, [("slow",), ("a",), ("b",), ("c",)]):
+        results.append(ip)
+        if len(results) == 3:
+            # Everything else got through the free slot meanwhile
+            assert results == ["a", "b", "c"]
+            release.set()
+    pool.shutdown()
+
+    assert results == ["a", "b", "c", "slow"]
+
+
+def test_window_bounds_calls_in_flight():
+    pool = WorkerPool(8)
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def lookup(i):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        threading.Event().wait(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return i
+
+    assert sorted(pool.run(lookup, [(i,) for i in range(20)], window=3)) == list(range(20))
+    assert peak[0] <= 3
+    pool.shutdown()
+
+
+def test_cancel_abandons_running_calls():
+    pool = WorkerPool(2)
+    token = CancelToken()
+    release = threading.Event()
+    started = []
+
+    def lookup(i):
+        started.append(i)
+        if i == 0:
+            token.cancel()
+        release.wait(5)
+        return i
+
+    begin = time.monotonic()
+    results = list(pool.run(lookup, [(i,) for i in range(5)], window=1, cancel_token=token))
+    assert time.monotonic() - begin < 1
+    release.set()
+    pool.shutdown()
+
+    assert results == []
+    assert started == [0]
+
+
+def test_worker_errors_propagate():
+    pool = WorkerPool(2)
+
+    def lookup(i):
+        raise ValueError(i)
+
+    with pytest.raises(ValueError):
+        list(pool.run(lookup, [(1,), (2,)]))
+    pool.shutdown()